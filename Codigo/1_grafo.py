@@ -4,42 +4,58 @@ Este script baixa a malha viária da área urbana de São Carlos, SP,
 utilizando a biblioteca OSMnx, e a salva em um arquivo no formato GraphML.
 
 Versão corrigida para garantir que o arquivo do grafo seja salvo corretamente.
+
+A geocodificação e o download passam pelo cache do OSM (cache_osm.py): a
+segunda execução não usa a internet, e com OFFLINE = True o script roda
+só com as respostas já guardadas.
 """
 import osmnx as ox
 import matplotlib.pyplot as plt
 from os import path
 
+from cache_osm import cache_padrao
+
 path_arquivos = 'Arquivos'
 
-def extrair_e_salvar_grafo():
+def baixar_grafo(nome_cidade, cache=None):
     """
-    Extrai o grafo da malha viária de São Carlos a partir do seu polígono
-    geográfico e o salva em disco.
+    Baixa a malha viária de dentro do polígono da cidade, projeta para UTM e
+    simplifica (mantendo apenas as interseções). Não grava nada em disco
+    além do cache do OSM ('cache', por padrão cache_osm.cache_padrao()).
+    """
+    cache = cache or cache_padrao()
+
+    # Passo 1: Obter o polígono geográfico preciso da cidade
+    print("Obtendo o polígono geográfico da cidade...")
+    gdf = cache.geocodificar(nome_cidade)
+    poligono = gdf.unary_union
+
+    # Passo 2: Baixar o grafo estritamente de dentro do polígono
+    print("Baixando o grafo da malha viária de dentro do polígono...")
+    G = cache.grafo_poligono(poligono, network_type='drive', simplify=False)
+    print("Grafo bruto baixado com sucesso!")
+
+    # Passo 3: Projetar o grafo para um sistema de coordenadas métricas (UTM)
+    print("Projetando o grafo para o sistema de coordenadas UTM...")
+    G_projetado = ox.project_graph(G)
+
+    # Passo 4: Simplificar o grafo para manter apenas as interseções
+    print("Simplificando o grafo...")
+    G_simplificado = ox.simplify_graph(G_projetado)
+    print("Grafo simplificado com sucesso!")
+    return G_simplificado
+
+def extrair_e_salvar_grafo(nome_cidade="São Carlos, São Paulo, Brazil",
+                           arquivo_saida=path.join(path_arquivos, 'sao_carlos_grafo_preciso.graphml'), cache=None):
+    """
+    Extrai o grafo da malha viária da cidade (por padrão, São Carlos) a
+    partir do seu polígono geográfico e o salva em 'arquivo_saida'.
     """
-    nome_cidade = "São Carlos, São Paulo, Brazil"
-    arquivo_saida = path.join(path_arquivos, 'sao_carlos_grafo_preciso.graphml')
     
     print(f"Definindo a cidade de interesse: {nome_cidade}")
     
     try:
-        # Passo 1: Obter o polígono geográfico preciso da cidade
-        print("Obtendo o polígono geográfico da cidade...")
-        gdf = ox.geocode_to_gdf(nome_cidade)
-        poligono = gdf.unary_union
-        
-        # Passo 2: Baixar o grafo estritamente de dentro do polígono
-        print("Baixando o grafo da malha viária de dentro do polígono...")
-        G = ox.graph_from_polygon(poligono, network_type='drive', simplify=False)
-        print("Grafo bruto baixado com sucesso!")
-        
-        # Passo 3: Projetar o grafo para um sistema de coordenadas métricas (UTM)
-        print("Projetando o grafo para o sistema de coordenadas UTM...")
-        G_projetado = ox.project_graph(G)
-
-        # Passo 4: Simplificar o grafo para manter apenas as interseções
-        print("Simplificando o grafo...")
-        G_simplificado = ox.simplify_graph(G_projetado)
-        print("Grafo simplificado com sucesso!")
+        G_simplificado = baixar_grafo(nome_cidade, cache)
         
         # Passo 5: Salvar o grafo final em disco
         print(f"Salvando o grafo simplificado em '{arquivo_saida}'...")
@@ -66,7 +82,15 @@ def visualizar_grafo(G):
 
 # --- Execução Principal ---
 if __name__ == "__main__":
-    grafo_sc = extrair_e_salvar_grafo()
+    # --- PARÂMETROS ---
+    # Sem internet: usa só as respostas do cache ('Arquivos/cache_osm/' ou
+    # PASTA_RESPOSTAS_OSM, uma cópia de um cache feito com internet)
+    OFFLINE = False
+    PASTA_RESPOSTAS_OSM = None
+
+    cache = cache_padrao(offline=OFFLINE, pasta_respostas=PASTA_RESPOSTAS_OSM)
+    grafo_sc = extrair_e_salvar_grafo(cache=cache)
+    cache.imprimir_estatisticas()
     
     if grafo_sc:
         # A visualização é opcional, mas útil para confirmar que tudo correu bem
@@ -1,51 +1,42 @@
 # -*- coding: utf-8 -*-
-import geopandas as gpd
 import pandas as pd
 import osmnx as ox
 import pickle
 import os
 
+from alocacao_populacao import alocar_populacao
+from dados_censo import carregar_populacao_setores, carregar_setores
+
 Arquivos_path = 'Arquivos'
 
-def integrar_populacao_ao_grafo():
-    # --- 1. CONFIGURAÇÃO DOS ARQUIVOS DE ENTRADA ---
-    ARQUIVO_GRAFO = os.path.join(Arquivos_path, 'sao_carlos_grafo_preciso.graphml')
-    ARQUIVO_SHAPEFILE_SETORES = os.path.join(Arquivos_path, 'SP_Setores_CD2022.shp')
-    ARQUIVO_CSV_POPULACAO = os.path.join(Arquivos_path, 'Agregados_por_setores_basico_BR_20250417.csv')
-    CODIGO_MUNICIPIO_SAO_CARLOS = '3548906'
-    
-    for f in [ARQUIVO_GRAFO, ARQUIVO_SHAPEFILE_SETORES, ARQUIVO_CSV_POPULACAO]:
-        if not os.path.exists(f):
-            print(f"❌ Erro: Arquivo de entrada não encontrado: '{f}'")
-            return
-
-    # --- 2. CARREGAR OS DADOS ---
-    try:
-        print(f"Carregando o grafo de ruas de '{ARQUIVO_GRAFO}'...")
-        G = ox.load_graphml(ARQUIVO_GRAFO)
-        
-        print(f"Carregando o shapefile dos setores de '{ARQUIVO_SHAPEFILE_SETORES}'...")
-        gdf_setores = gpd.read_file(ARQUIVO_SHAPEFILE_SETORES)
-        
-        print(f"Carregando os dados de população de '{ARQUIVO_CSV_POPULACAO}'...")
-        df_pop = pd.read_csv(ARQUIVO_CSV_POPULACAO, sep=';', encoding='latin-1', dtype=str)
-    except Exception as e:
-        print(f"❌ Erro ao carregar os arquivos: {e}")
-        return
+def mapear_populacao_para_nos(G, gdf_setores, df_pop, codigo_municipio, metodo='centroide'):
+    """
+    Une os setores censitários à tabela de população do município e passa a
+    população de cada setor para os nós do grafo:
+    - metodo='centroide': tudo para o nó mais próximo do centróide do setor;
+    - metodo='comprimento' ou 'voronoi': repartida entre os nós do setor
+      (ver alocacao_populacao.py).
+    Com codigo_municipio=None, usa todos os setores da tabela (ex.: o estado).
 
+    Não lê nem grava arquivos. Retorna {nó: população} com todos os nós do
+    grafo (0 onde não há setor), ou None se a união não encontrar setores.
+    """
     # --- 3. LIMPEZA E PREPARAÇÃO DOS DADOS ---
     print("\nLimpando e preparando os dados...")
     
-    # Renomeia as colunas para um padrão ('CD_CENSO')
-    gdf_setores.rename(columns={'CD_SETOR': 'CD_CENSO'}, inplace=True)
-    df_pop.rename(columns={'CD_SETOR': 'CD_CENSO', 'v0001': 'POPULACAO'}, inplace=True)
+    # Renomeia as colunas para um padrão ('CD_CENSO'), sem alterar as tabelas recebidas
+    gdf_setores = gdf_setores.rename(columns={'CD_SETOR': 'CD_CENSO'})
+    df_pop = df_pop.rename(columns={'CD_SETOR': 'CD_CENSO', 'v0001': 'POPULACAO'})
     
     # Filtra apenas as colunas que vamos usar
     df_pop_filtrado = df_pop[['CD_CENSO', 'CD_MUN', 'POPULACAO']].copy()
     df_pop_filtrado['POPULACAO'] = pd.to_numeric(df_pop_filtrado['POPULACAO'], errors='coerce').fillna(0).astype(int)
     
     # Filtra apenas os dados de São Carlos
-    df_pop_sc = df_pop_filtrado[df_pop_filtrado['CD_MUN'] == CODIGO_MUNICIPIO_SAO_CARLOS]
+    if codigo_municipio is None:
+        df_pop_sc = df_pop_filtrado.copy()
+    else:
+        df_pop_sc = df_pop_filtrado[df_pop_filtrado['CD_MUN'] == codigo_municipio].copy()
 
     # --- NOVO: DEBUG E CORREÇÃO DE TIPO DE DADO ---
     print(f"Tipo de dado da coluna 'CD_CENSO' no Shapefile: {gdf_setores['CD_CENSO'].dtype}")
@@ -63,13 +54,16 @@ def integrar_populacao_ao_grafo():
     
     if len(gdf_sc) == 0:
         print("❌ ATENÇÃO: A união dos dados resultou em 0 setores. Verifique se os códigos 'CD_CENSO' nos arquivos são compatíveis.")
-        return
+        return None
         
     print(f"✅ Encontrados e processados {len(gdf_sc)} setores censitários para São Carlos.")
     gdf_sc = gdf_sc.to_crs(G.graph['crs'])
 
     # --- 5. MAPEAMENTO E AGREGAÇÃO ---
     print("Mapeando população dos setores para os nós do grafo...")
+    if metodo != 'centroide':
+        return alocar_populacao(G, gdf_sc.geometry.values, gdf_sc['POPULACAO'].values, metodo)
+
     gdf_sc['centroide'] = gdf_sc['geometry'].centroid
     nos_proximos = ox.nearest_nodes(G, X=gdf_sc['centroide'].x, Y=gdf_sc['centroide'].y)
     gdf_sc['no_mais_proximo'] = nos_proximos
@@ -81,6 +75,42 @@ def integrar_populacao_ao_grafo():
         if node_id not in dict_populacao:
             dict_populacao[node_id] = 0
 
+    return dict_populacao
+
+def integrar_populacao_ao_grafo():
+    # --- 1. CONFIGURAÇÃO DOS ARQUIVOS DE ENTRADA ---
+    ARQUIVO_GRAFO = os.path.join(Arquivos_path, 'sao_carlos_grafo_preciso.graphml')
+    ARQUIVO_SHAPEFILE_SETORES = os.path.join(Arquivos_path, 'SP_Setores_CD2022.shp')
+    ARQUIVO_CSV_POPULACAO = os.path.join(Arquivos_path, 'Agregados_por_setores_basico_BR_20250417.csv')
+    CODIGO_MUNICIPIO_SAO_CARLOS = '3548906'
+    # 'centroide' (todo o setor no nó mais próximo do centróide), 'comprimento'
+    # (repartido entre os nós do setor pelo comprimento de rua) ou 'voronoi'
+    # (pela área de cada célula de Voronoi dentro do setor)
+    METODO_ALOCACAO = 'comprimento'
+    
+    for f in [ARQUIVO_GRAFO, ARQUIVO_SHAPEFILE_SETORES, ARQUIVO_CSV_POPULACAO]:
+        if not os.path.exists(f):
+            print(f"❌ Erro: Arquivo de entrada não encontrado: '{f}'")
+            return
+
+    # --- 2. CARREGAR OS DADOS ---
+    try:
+        print(f"Carregando o grafo de ruas de '{ARQUIVO_GRAFO}'...")
+        G = ox.load_graphml(ARQUIVO_GRAFO)
+        
+        print(f"Carregando o shapefile dos setores de '{ARQUIVO_SHAPEFILE_SETORES}'...")
+        gdf_setores = carregar_setores(ARQUIVO_SHAPEFILE_SETORES, CODIGO_MUNICIPIO_SAO_CARLOS, crs=G.graph['crs'])
+        
+        print(f"Carregando os dados de população de '{ARQUIVO_CSV_POPULACAO}'...")
+        df_pop = carregar_populacao_setores(ARQUIVO_CSV_POPULACAO, CODIGO_MUNICIPIO_SAO_CARLOS)
+    except Exception as e:
+        print(f"❌ Erro ao carregar os arquivos: {e}")
+        return
+
+    dict_populacao = mapear_populacao_para_nos(G, gdf_setores, df_pop, CODIGO_MUNICIPIO_SAO_CARLOS, METODO_ALOCACAO)
+    if dict_populacao is None:
+        return
+
     # --- 6. SALVAR O RESULTADO ---
     ARQUIVO_SAIDA = os.path.join(Arquivos_path, 'populacoes_nos.pkl')
     with open(ARQUIVO_SAIDA, 'wb') as f:
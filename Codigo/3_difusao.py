@@ -5,13 +5,50 @@ de suavização sobre o grafo. Ele "espalha" a população de cada nó para
 seus vizinhos de forma iterativa, criando uma distribuição mais contínua
 e realista, enquanto conserva a população total.
 """
-import osmnx as ox
 import pickle
 import os
-import copy
+import numpy as np
+
+from grafo_compacto import carregar_grafo
+from motor_difusao import construir_operador_difusao, difundir, arredondar_conservando
 
 path_arquivos = 'Arquivos'
 
+def suavizar_populacao(G, populacoes_atuais, numero_de_iteracoes, fator_de_retencao):
+    """
+    Aplica a difusão sobre o dicionário de população, sem ler nem gravar
+    arquivos. Retorna {nó: int} para um fator de retenção, ou uma lista de
+    dicionários (um por fator) quando 'fator_de_retencao' é uma lista.
+    """
+    populacao_total_original = sum(populacoes_atuais.values())
+    fatores = list(np.atleast_1d(fator_de_retencao))
+    print(f"\nIniciando processo de suavização com {numero_de_iteracoes} iterações "
+          f"para {len(fatores)} fator(es) de retenção...")
+
+    # O operador de vizinhança é montado uma única vez; cada iteração vira
+    # um produto matriz esparsa × matriz densa (uma coluna por fator).
+    A, graus, nos = construir_operador_difusao(G)
+    indice = {node: k for k, node in enumerate(nos)}
+    vetor_populacao = np.array([populacoes_atuais.get(node, 0) for node in nos], dtype=np.float64)
+
+    # A primeira iteração percorre os nós na ordem do dicionário carregado;
+    # manter essa ordem faz o resultado bater bit a bit com a versão em laços.
+    ordem_inicial = [indice[node] for node in populacoes_atuais if node in indice]
+    vistos = set(ordem_inicial)
+    ordem_inicial += [k for k in range(len(nos)) if k not in vistos]
+
+    resultado = difundir(A, graus, vetor_populacao, numero_de_iteracoes, fatores, ordem_inicial)
+
+    for k, fator in enumerate(fatores):
+        print(f"Fator {fator}: população total após difusão: {resultado[:, k].sum():,.0f}")
+
+    # Arredonda para inteiros e corrige a diferença no nó mais populoso
+    finais = [arredondar_conservando(nos, resultado[:, k], populacao_total_original)
+              for k in range(len(fatores))]
+    if np.ndim(fator_de_retencao) == 0:
+        return finais[0]
+    return finais
+
 def suavizar_distribuicao_populacional():
     """
     Carrega a população, aplica o algoritmo de difusão e salva o resultado.
@@ -29,6 +66,8 @@ def suavizar_distribuicao_populacional():
     # A fração da população que cada nó "mantém" para si em cada iteração.
     # O restante (1.0 - FATOR_DE_RETENCAO) será dividido entre os vizinhos.
     # Valores entre 0.4 e 0.6 funcionam bem.
+    # Também aceita uma lista (ex.: [0.4, 0.5, 0.6]) para calcular vários
+    # fatores de uma só vez; nesse caso é salvo um arquivo por fator.
     FATOR_DE_RETENCAO = 0.4
 
     # --- 2. CARREGAR OS DADOS ---
@@ -37,7 +76,7 @@ def suavizar_distribuicao_populacional():
         print("❌ Erro: Arquivos de entrada não encontrados.")
         return
 
-    G = ox.load_graphml(ARQUIVO_GRAFO)
+    G = carregar_grafo(ARQUIVO_GRAFO)
     with open(ARQUIVO_POPULACAO_ORIGINAL, 'rb') as f:
         populacoes_atuais = pickle.load(f)
 
@@ -46,63 +85,35 @@ def suavizar_distribuicao_populacional():
     print(f"População total original: {populacao_total_original:,.0f}")
 
     # --- 3. ALGORITMO DE SUAVIZAÇÃO (DIFUSÃO) ---
-    print(f"\nIniciando processo de suavização com {NUMERO_DE_ITERACOES} iterações...")
-
-    for i in range(NUMERO_DE_ITERACOES):
-        # Usamos um novo dicionário para armazenar o resultado desta iteração
-        novas_populacoes = {node: 0.0 for node in G.nodes()}
-        
-        # Para cada nó no grafo...
-        for node, pop in populacoes_atuais.items():
-            if pop == 0:
-                continue
-
-            # O nó mantém uma parte de sua própria população
-            pop_retida = pop * FATOR_DE_RETENCAO
-            novas_populacoes[node] += pop_retida
-            
-            # O restante é espalhado para os vizinhos
-            pop_distribuida = pop * (1.0 - FATOR_DE_RETENCAO)
-            vizinhos = list(G.neighbors(node))
-            
-            if vizinhos:
-                share_por_vizinho = pop_distribuida / len(vizinhos)
-                for vizinho in vizinhos:
-                    novas_populacoes[vizinho] += share_por_vizinho
-        
-        # Atualiza o dicionário para a próxima iteração
-        populacoes_atuais = novas_populacoes
-        print(f"Iteração {i+1} concluída. População total: {sum(populacoes_atuais.values()):,.0f}")
+    resultados = suavizar_populacao(G, populacoes_atuais, NUMERO_DE_ITERACOES, FATOR_DE_RETENCAO)
+    fatores = list(np.atleast_1d(FATOR_DE_RETENCAO))
+    if np.ndim(FATOR_DE_RETENCAO) == 0:
+        resultados = [resultados]
 
     # --- 4. FINALIZAÇÃO E VERIFICAÇÃO ---
-    # Arredonda os valores finais para inteiros
-    populacoes_finais = {node: round(pop) for node, pop in populacoes_atuais.items()}
-    
-    # Ajuste final para garantir que a soma seja EXATAMENTE a mesma
-    populacao_total_final = sum(populacoes_finais.values())
-    diferenca = round(populacao_total_original - populacao_total_final)
-    if diferenca != 0:
-        # Adiciona ou remove a pequena diferença (devido a arredondamentos)
-        # do nó com a maior população para minimizar o impacto.
-        no_mais_populoso = max(populacoes_finais, key=populacoes_finais.get)
-        populacoes_finais[no_mais_populoso] += diferenca
-
-    populacao_total_verificada = sum(populacoes_finais.values())
-
-    print("\n--- Verificação Final ---")
-    print(f"População Original: {populacao_total_original:,.0f}")
-    print(f"População Suavizada: {populacao_total_verificada:,.0f}")
-    
-    if int(populacao_total_original) == int(populacao_total_verificada):
-        print("✅ A conservação da população foi mantida com sucesso!")
-    else:
-        print("⚠️ Atenção: Houve uma pequena perda/ganho de população no processo.")
-
-    # --- 5. SALVAR O RESULTADO ---
-    with open(ARQUIVO_POPULACAO_SAIDA, 'wb') as f:
-        pickle.dump(populacoes_finais, f)
-        
-    print(f"\n✅ Processo concluído! Nova distribuição salva em '{ARQUIVO_POPULACAO_SAIDA}'.")
+    for k, fator in enumerate(fatores):
+        populacoes_finais = resultados[k]
+        populacao_total_verificada = sum(populacoes_finais.values())
+
+        print(f"\n--- Verificação Final (fator de retenção {fator}) ---")
+        print(f"População Original: {populacao_total_original:,.0f}")
+        print(f"População Suavizada: {populacao_total_verificada:,.0f}")
+
+        if int(populacao_total_original) == int(populacao_total_verificada):
+            print("✅ A conservação da população foi mantida com sucesso!")
+        else:
+            print("⚠️ Atenção: Houve uma pequena perda/ganho de população no processo.")
+
+        # --- 5. SALVAR O RESULTADO ---
+        # Com um único fator, mantém o arquivo de sempre; com vários, um arquivo por fator
+        if np.ndim(FATOR_DE_RETENCAO) == 0:
+            arquivo_saida = ARQUIVO_POPULACAO_SAIDA
+        else:
+            arquivo_saida = os.path.join(path_arquivos, f'populacoes_suavizadas_{fator:.2f}.pkl')
+        with open(arquivo_saida, 'wb') as f:
+            pickle.dump(populacoes_finais, f)
+
+        print(f"\n✅ Processo concluído! Nova distribuição salva em '{arquivo_saida}'.")
 
 # --- Execução Principal ---
 if __name__ == "__main__":
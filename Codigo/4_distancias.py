@@ -2,52 +2,82 @@
 """
 Script 4: Pré-cálculo da Matriz de Distâncias
 Este script carrega o grafo, calcula a distância real (caminho mínimo)
-entre TODOS os pares de nós e salva o resultado em um arquivo .pkl.
+entre TODOS os pares de nós e salva o resultado no armazém de distâncias
+(matriz float32 em disco, lida com np.memmap; ver 'armazem_distancias.py').
 Isso evita recalcular distâncias a cada execução do modelo de otimização.
+
+O cálculo de todos os pares é dividido em blocos de origens entre vários
+processos; blocos concluídos ficam salvos em disco, de modo que uma
+execução interrompida pode ser retomada de onde parou.
+
+No modo 'demanda_x_candidatos', calcula apenas as distâncias que os
+modelos de otimização realmente leem (nós de demanda x locais candidatos),
+rodando o Dijkstra só a partir do menor dos dois conjuntos.
 """
-import networkx as nx
-import osmnx as ox
 import pickle
 import os
-import time
+
+from grafo_compacto import carregar_grafo
+from calculo_distancias import calcular_distancias_restritas, calcular_todos_pares_paralelo
 
 path_arquivos = 'Arquivos'
 
 def pre_calcular_distancias():
     # --- 1. CARREGAR O GRAFO ---
     ARQUIVO_GRAFO = os.path.join(path_arquivos, 'sao_carlos_grafo_preciso.graphml')
-    ARQUIVO_SAIDA_DISTANCIAS = os.path.join(path_arquivos, 'matriz_distancias.pkl')
+    CAMINHO_ARMAZEM = os.path.join(path_arquivos, 'matriz_distancias')
+    # A matriz do grafo não-direcionado é simétrica: guardar só metade basta
+    TRIANGULAR = True
+
+    # 'todos_os_pares' ou 'demanda_x_candidatos'
+    MODO = 'todos_os_pares'
+
+    # Processos usados no modo 'todos_os_pares' (padrão: todos os núcleos)
+    NUMERO_DE_PROCESSOS = os.cpu_count()
+
+    # --- Usados apenas no modo 'demanda_x_candidatos' ---
+    # Devem bater com os parâmetros do modelo que vai consumir a matriz.
+    # Para o '5_final.py': populações suavizadas, candidatos com pop >= 200 e
+    # todos os nós do grafo como demanda. Para o '5.1_final_simp.py':
+    # 'populacoes_nos.pkl', POPULACAO_MINIMA_CANDIDATO = 1 e
+    # DEMANDA_APENAS_POPULADA = True (demanda = candidatos = nós com pop > 0).
+    ARQUIVO_POPULACAO = os.path.join(path_arquivos, 'populacoes_suavizadas.pkl')
+    POPULACAO_MINIMA_CANDIDATO = 200
+    DEMANDA_APENAS_POPULADA = False
 
     if not os.path.exists(ARQUIVO_GRAFO):
         print("❌ Erro: Grafo não encontrado.")
         return
 
     print("Carregando grafo...")
-    G = ox.load_graphml(ARQUIVO_GRAFO)
-    
-    # Converter para não-direcionado (permite ir e voltar na mesma rua)
-    # Importante para a matriz ser simétrica e o cálculo ser consistente
-    G_undirected = G.to_undirected()
+    G = carregar_grafo(ARQUIVO_GRAFO)
+    # O cálculo trata o grafo como não-direcionado (permite ir e voltar na
+    # mesma rua), o que deixa a matriz simétrica: ver grafo_para_csr.
+
+    if MODO == 'demanda_x_candidatos':
+        if not os.path.exists(ARQUIVO_POPULACAO):
+            print("❌ Erro: Arquivo de população não encontrado.")
+            return
+        with open(ARQUIVO_POPULACAO, 'rb') as f:
+            populacoes = pickle.load(f)
+
+        candidatos = [node for node, pop in populacoes.items() if pop >= POPULACAO_MINIMA_CANDIDATO and node in G.nodes()]
+        if DEMANDA_APENAS_POPULADA:
+            demanda = [node for node, pop in populacoes.items() if pop > 0 and node in G.nodes()]
+        else:
+            demanda = list(G.nodes())
+
+        print(f"Modo restrito: {len(demanda)} nós de demanda x {len(candidatos)} candidatos.")
+        calcular_distancias_restritas(G, demanda, candidatos, CAMINHO_ARMAZEM)
+        print(f"✅ Matriz de distâncias salva em '{CAMINHO_ARMAZEM}.dat'!")
+        return
     
     # --- 2. CÁLCULO PESADO ---
     print(f"Iniciando cálculo de distâncias para {len(G.nodes())} nós...")
-    print("Isso pode levar alguns minutos. Vá tomar um café...")
-    
-    start_time = time.time()
-    # all_pairs_dijkstra_path_length retorna um gerador, convertemos para dict
-    # Estrutura: {origem: {destino: distancia, destino2: distancia2...}}
-    distancias = dict(nx.all_pairs_dijkstra_path_length(G_undirected, weight='length'))
-    end_time = time.time()
-    
-    tempo_total = end_time - start_time
-    print(f"✅ Cálculo concluído em {tempo_total:.2f} segundos ({tempo_total/60:.2f} minutos).")
+    print("Isso pode levar alguns minutos. Se for interrompido, rode de novo para continuar.")
 
-    # --- 3. SALVAR EM DISCO ---
-    print(f"Salvando matriz de distâncias em '{ARQUIVO_SAIDA_DISTANCIAS}'...")
-    with open(ARQUIVO_SAIDA_DISTANCIAS, 'wb') as f:
-        pickle.dump(distancias, f)
-    
-    print("✅ Arquivo salvo!")
+    calcular_todos_pares_paralelo(G, CAMINHO_ARMAZEM, n_processos=NUMERO_DE_PROCESSOS, triangular=TRIANGULAR)
+    print(f"✅ Matriz de distâncias salva em '{CAMINHO_ARMAZEM}.dat'!")
 
 if __name__ == "__main__":
     pre_calcular_distancias()
\ No newline at end of file
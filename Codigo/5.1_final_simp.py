@@ -12,7 +12,7 @@ Abordagem:
 Isto reduz drasticamente a complexidade, tornando a solução rápida e estável.
 """
 import networkx as nx
-import pulp
+import numpy as np
 import matplotlib.pyplot as plt
 import osmnx as ox
 import pickle
@@ -20,14 +20,24 @@ import time
 import pandas as pd
 import os
 
+from grafo_compacto import carregar_grafo
+from armazem_distancias import abrir_armazem, existe_armazem
+from modelo_matricial import resolver_p_mediana
+from heuristica_p_mediana import gap_percentual, resolver_p_mediana_heuristica
+from cobertura import conjuntos_cobertura, resolver_cobertura
+from renderizacao import exportar_cenarios
+from instrumentacao import RegistroExecucao, etapa
+from avaliacao import avaliar_localizacao, coordenadas_nos
+from robustez import (avaliar_cenarios, cenarios_difusao, cenarios_perturbados, distancias_aos_hospitais,
+                      imprimir_robustez, resumir_robustez, vetor_populacao)
+
 def carregar_distancias():
-    arquivo_dist = os.path.join('Arquivos', 'matriz_distancias.pkl')
-    if not os.path.exists(arquivo_dist):
-        print("Execute o script '3_5_calculo_distancias.py' primeiro.")
+    caminho_armazem = os.path.join('Arquivos', 'matriz_distancias')
+    if not existe_armazem(caminho_armazem):
+        print("Execute o script '4_distancias.py' primeiro.")
         return None
-    print("Carregando matriz de distâncias pré-calculada...")
-    with open(arquivo_dist, 'rb') as f:
-        return pickle.load(f)
+    print("Abrindo matriz de distâncias pré-calculada...")
+    return abrir_armazem(caminho_armazem)
 
 def resolver_otimizacao_simplificada(nos_populacao, populacoes, distancias, n_hospitais):
     """
@@ -38,59 +48,108 @@ def resolver_otimizacao_simplificada(nos_populacao, populacoes, distancias, n_ho
     # No modelo simplificado, os locais candidatos são os próprios centros populacionais.
     locais_candidatos = nos_populacao
     
-    prob = pulp.LpProblem("Localizacao_Hospitais_Simplificada", pulp.LpMinimize)
-    
-    # Variáveis de decisão
-    x = pulp.LpVariable.dicts("Hospital", locais_candidatos, 0, 1, pulp.LpContinuous)
-    y = pulp.LpVariable.dicts("Atende", (nos_populacao, locais_candidatos), 0, 1, pulp.LpContinuous)
-
-    # Função Objetivo: Usa as distâncias REAIS pré-calculadas entre os centros populacionais
-    objetivo = pulp.lpSum([populacoes[i] * distancias[i][j] * y[i][j] for i in nos_populacao for j in locais_candidatos])
-    prob += objetivo
-
-    # Restrições
-    prob += pulp.lpSum([x[j] for j in locais_candidatos]) == n_hospitais, "Num_Hospitais"
-    for i in nos_populacao:
-        prob += pulp.lpSum([y[i][j] for j in locais_candidatos]) == 1, f"Atendimento_Garantido_{i}"
-    for i in nos_populacao:
-        for j in locais_candidatos:
-            prob += y[i][j] <= x[j], f"Logica_Atendimento_{i}_{j}"
+    # Vetor de custos e matriz de restrições montados direto das distâncias
+    # REAIS pré-calculadas entre os centros populacionais
+    D = distancias.submatriz(nos_populacao, locais_candidatos)
+    pesos = np.array([populacoes[i] for i in nos_populacao], dtype=np.float64)
 
     print("A resolver o problema... (Esta etapa agora será muito mais rápida!)")
     start_time = time.time()
-    solver = pulp.PULP_CBC_CMD(msg=True, options=['dualSimplex'])
-    prob.solve(solver)
+    x, objetivo, status = resolver_p_mediana(pesos, D, n_hospitais)
     end_time = time.time()
     
     print(f"Problema resolvido em {end_time - start_time:.2f} segundos.")
-    print("Status:", pulp.LpStatus[prob.status])
+    print("Status:", status)
     
-    if pulp.LpStatus[prob.status] == 'Optimal':
-        return {j: x[j].varValue for j in locais_candidatos}
+    if status == 'Optimal':
+        return {j: float(x[b]) for b, j in enumerate(locais_candidatos)}
     else:
         return None
 
 
-def exportar_resultados_csv(G, resultados):
+def resolver_otimizacao_heuristica(nos_populacao, populacoes, distancias, n_hospitais, calcular_limite_lp=False):
+    """
+    Mesmo problema de resolver_otimizacao_simplificada, resolvido pela
+    heurística gulosa + trocas (sem solver). Devolve o mesmo dicionário,
+    com valores 0/1.
+
+    Com calcular_limite_lp=True, resolve também a relaxação linear e mostra
+    o gap da solução heurística em relação a esse limite inferior.
+    """
+    print("\nResolvendo com a heurística (gulosa + trocas)...")
+    locais_candidatos = nos_populacao
+    D = distancias.submatriz(nos_populacao, locais_candidatos)
+    pesos = np.array([populacoes[i] for i in nos_populacao], dtype=np.float64)
+
+    start_time = time.time()
+    x, objetivo, trocas = resolver_p_mediana_heuristica(pesos, D, n_hospitais)
+    print(f"Heurística concluída em {time.time() - start_time:.2f} segundos.")
+    if x is None:
+        return None
+
+    if calcular_limite_lp:
+        _, limite, status = resolver_p_mediana(pesos, D, n_hospitais, msg=False)
+        if status == 'Optimal':
+            print(f"Limite inferior (relaxação linear): {limite:,.2f} | "
+                  f"gap da heurística: {gap_percentual(objetivo, limite):.3f}%")
+
+    return {j: float(x[b]) for b, j in enumerate(locais_candidatos)}
+
+
+def resolver_cobertura_simplificada(G_completo, nos_populacao, populacoes, n_hospitais, raio,
+                                    modelo='cobertura_maxima', motor='exato'):
+    """
+    Variante de cobertura do modelo simplificado: em vez de minimizar a
+    distância total, maximiza a população a até 'raio' metros de um
+    hospital ('cobertura_maxima', com n_hospitais) ou busca o menor número
+    de hospitais que cobre toda a população ('cobertura_total').
+
+    Não usa a matriz de distâncias: os conjuntos de cobertura saem de um
+    Dijkstra limitado ao raio a partir de cada candidato. Devolve o mesmo
+    dicionário {candidato: x} dos outros motores.
+    """
+    print(f"\nResolvendo o modelo de {modelo.replace('_', ' ')} (raio de {raio:,.0f} m, motor '{motor}')...")
+    locais_candidatos = nos_populacao
+    a = conjuntos_cobertura(G_completo, nos_populacao, locais_candidatos, raio)
+    pesos = np.array([populacoes[i] for i in nos_populacao], dtype=np.float64)
+
+    sem_cobertura = np.diff(a.indptr) == 0
+    if sem_cobertura.any():
+        print(f"⚠️ {sem_cobertura.sum()} centros populacionais ({pesos[sem_cobertura].sum():,.0f} habitantes) "
+              f"não têm nenhum candidato a até {raio:,.0f} m.")
+
+    x, _ = resolver_cobertura(a, pesos, n_hospitais, modelo=modelo, motor=motor)
+    if x is None:
+        return None
+    return {j: float(x[b]) for b, j in enumerate(locais_candidatos)}
+
+
+def exportar_resultados_csv(G, resultados, n_hospitais=None):
     """
-    Exporta os resultados da otimização para um arquivo CSV.
+    Exporta os resultados da otimização para um arquivo CSV, com o hospital
+    atribuído a cada local e a distância até ele pela malha viária (um
+    Dijkstra com várias origens, ver avaliacao.py). Os hospitais são os
+    n_hospitais locais de maior valor; sem n_hospitais, os de valor >= 0.5.
     """
     print("\nExportando resultados para arquivo CSV...")
-    
-    # Prepara os dados para o DataFrame
-    dados_para_csv = []
-    for node_id, probabilidade in resultados.items():
-        dados_no = G.nodes[node_id]
-        dados_para_csv.append({
-            'ID do Cruzamento': node_id,
-            'Posicao_X': dados_no.get('x'),
-            'Posicao_Y': dados_no.get('y'),
-            'Probabilidade': probabilidade
-        })
-        
-    # Cria o DataFrame com o pandas
-    df_resultados = pd.DataFrame(dados_para_csv)
-    
+
+    nos = list(resultados)
+    xy = coordenadas_nos(G, nos)
+    df_resultados = pd.DataFrame({
+        'ID do Cruzamento': nos,
+        'Posicao_X': xy[:, 0],
+        'Posicao_Y': xy[:, 1],
+        'Probabilidade': list(resultados.values()),
+    })
+    if n_hospitais is not None:
+        hospitais = sorted(resultados, key=resultados.get, reverse=True)[:n_hospitais]
+    else:
+        hospitais = [node for node, valor in resultados.items() if valor >= 0.5]
+    if hospitais:
+        atribuidos, distancias = avaliar_localizacao(G, hospitais).atribuicao_de(nos)
+        df_resultados['Hospital Atribuido'] = atribuidos
+        df_resultados['Distancia ao Hospital (m)'] = distancias
+
     # Ordena o DataFrame pela probabilidade, da maior para a menor
     df_resultados = df_resultados.sort_values(by='Probabilidade', ascending=False)
     
@@ -154,13 +213,10 @@ def visualizar_probabilidades(G, resultados, n_hospitais):
 if __name__ == "__main__":
     print("--- Etapa 1: Carregar Dados Reais ---")
     try:
-        G_completo = ox.load_graphml(os.path.join('Arquivos', 'sao_carlos_grafo_preciso.graphml'))
+        G_completo = carregar_grafo(os.path.join('Arquivos', 'sao_carlos_grafo_preciso.graphml'))
         # Use o ficheiro de população que preferir (original ou suavizado)
         with open(os.path.join('Arquivos','populacoes_nos.pkl'), 'rb') as f:
             populacoes_completas = pickle.load(f)
-            # AQUI MUDOU: Carrega distâncias
-            distancias_completas = carregar_distancias()
-            if distancias_completas is None: exit()
         print("Grafo e populações carregados com sucesso!")
     except FileNotFoundError:
         print("Erro: Ficheiros do grafo ou da população não encontrados.")
@@ -174,16 +230,90 @@ if __name__ == "__main__":
     
     # --- PARÂMETROS ---
     NUMERO_DE_HOSPITAIS = 6
+    # 'p_mediana' (distância total), 'cobertura_maxima' (população a até
+    # RAIO_COBERTURA_M de um hospital) ou 'cobertura_total' (menor número de
+    # hospitais que cobre todos; ignora NUMERO_DE_HOSPITAIS)
+    MODELO = 'p_mediana'
+    RAIO_COBERTURA_M = 3000
+    # p-mediana: 'exato' (HiGHS) ou 'heuristica' (gulosa + trocas, para simulações rápidas)
+    # cobertura: 'exato', 'guloso' ou 'lagrangiano' (só cobertura máxima)
+    MOTOR = 'exato'
+    # Só no motor 'heuristica': resolve também a relaxação linear para medir o gap
+    CALCULAR_LIMITE_LP = False
+    # Avalia a localização escolhida em N_CENARIOS_ROBUSTEZ populações
+    # incertas (robustez.py; 0 = não avalia): 'perturbacao' (contagem de cada
+    # nó com erro de DESVIO_POPULACAO) ou 'difusao' (iterações e fator de
+    # retenção sorteados nas faixas abaixo)
+    N_CENARIOS_ROBUSTEZ = 0
+    CENARIOS_ROBUSTEZ = 'perturbacao'
+    DESVIO_POPULACAO = 0.1
+    FAIXA_ITERACOES = (2, 5)
+    FAIXA_RETENCAO = (0.3, 0.6)
+    # Com uma pasta, as figuras são gravadas nela (PNG) em vez de abertas em janelas
+    PASTA_FIGURAS = None
+    # Grava tempo, CPU, memória, tamanho do modelo e estatísticas do solver
+    # em 'Arquivos/registros/' (JSON da execução + histórico em CSV)
+    REGISTRAR_EXECUCAO = True
 
     # --- PROCESSAMENTO ---
+    if MODELO == 'p_mediana':
+        # Os modelos de cobertura não precisam da matriz de distâncias
+        distancias_completas = carregar_distancias()
+        if distancias_completas is None: exit()
+    registro = RegistroExecucao('5.1_final_simp', {
+        'n_hospitais': NUMERO_DE_HOSPITAIS, 'modelo': MODELO, 'raio_cobertura_m': RAIO_COBERTURA_M,
+        'motor': MOTOR, 'calcular_limite_lp': CALCULAR_LIMITE_LP,
+        'n_cenarios_robustez': N_CENARIOS_ROBUSTEZ, 'cenarios_robustez': CENARIOS_ROBUSTEZ,
+    }).iniciar()
     # A otimização é feita apenas no conjunto simplificado de nós
-    resultados = resolver_otimizacao_simplificada(nos_populacao, populacoes_filtradas, distancias_completas, NUMERO_DE_HOSPITAIS)
+    with etapa('resolucao'):
+        if MODELO != 'p_mediana':
+            resultados = resolver_cobertura_simplificada(G_completo, nos_populacao, populacoes_filtradas, NUMERO_DE_HOSPITAIS,
+                                                         RAIO_COBERTURA_M, MODELO, MOTOR)
+            if resultados and MODELO == 'cobertura_total':
+                NUMERO_DE_HOSPITAIS = int(round(sum(resultados.values())))
+        elif MOTOR == 'heuristica':
+            resultados = resolver_otimizacao_heuristica(nos_populacao, populacoes_filtradas, distancias_completas, NUMERO_DE_HOSPITAIS, CALCULAR_LIMITE_LP)
+        else:
+            resultados = resolver_otimizacao_simplificada(nos_populacao, populacoes_filtradas, distancias_completas, NUMERO_DE_HOSPITAIS)
 
     # --- ANÁLISE E EXPORTAÇÃO ---
-    if resultados:
+    if resultados and PASTA_FIGURAS:
+        exportar_cenarios(G_completo, [
+            {'nome': f'{NUMERO_DE_HOSPITAIS}_hospitais_simplificado', 'tipo': 'resultados', 'resultados': resultados,
+             'populacoes': populacoes_filtradas, 'n_hospitais': NUMERO_DE_HOSPITAIS, 'nos': nos_populacao,
+             'titulo': f'Locais Ótimos para {NUMERO_DE_HOSPITAIS} Hospitais (Modelo Simplificado)',
+             'rotulo_cor': 'População no Centro do Setor'},
+            {'nome': f'{NUMERO_DE_HOSPITAIS}_hospitais_probabilidades', 'tipo': 'probabilidades',
+             'resultados': resultados, 'n_hospitais': NUMERO_DE_HOSPITAIS},
+        ], PASTA_FIGURAS)
+    elif resultados:
         # Mostra o primeiro gráfico (resultados finais)
-        visualizar_resultados_simplificados(G_completo, nos_populacao, populacoes_filtradas, resultados, NUMERO_DE_HOSPITAIS)
+        visualizar_resultados_simplificados(G_completo.networkx(), nos_populacao, populacoes_filtradas, resultados, NUMERO_DE_HOSPITAIS)
         # Mostra o segundo gráfico (análise de probabilidades)
-        visualizar_probabilidades(G_completo, resultados, NUMERO_DE_HOSPITAIS)
+        visualizar_probabilidades(G_completo.networkx(), resultados, NUMERO_DE_HOSPITAIS)
+    if resultados:
         # Exporta os dados para um arquivo CSV
-        exportar_resultados_csv(G_completo, resultados)
\ No newline at end of file
+        with etapa('exportacao'):
+            exportar_resultados_csv(G_completo, resultados, n_hospitais=NUMERO_DE_HOSPITAIS)
+    if resultados and N_CENARIOS_ROBUSTEZ:
+        with etapa('robustez'):
+            hospitais = sorted(resultados, key=resultados.get, reverse=True)[:NUMERO_DE_HOSPITAIS]
+            nos = list(G_completo.nodes())
+            distancias_hospitais = distancias_aos_hospitais(G_completo, [hospitais], nos)
+            if CENARIOS_ROBUSTEZ == 'difusao':
+                blocos = cenarios_difusao(G_completo, populacoes_completas, nos, N_CENARIOS_ROBUSTEZ,
+                                          FAIXA_ITERACOES, FAIXA_RETENCAO)
+            else:
+                blocos = cenarios_perturbados(vetor_populacao(populacoes_filtradas, nos), N_CENARIOS_ROBUSTEZ,
+                                              DESVIO_POPULACAO)
+            tabela = avaliar_cenarios(distancias_hospitais, blocos, [f'{NUMERO_DE_HOSPITAIS}_hospitais'],
+                                      raio=RAIO_COBERTURA_M)
+            tabela.to_csv('robustez_cenarios.csv', index=False, sep=';', decimal=',')
+            imprimir_robustez(resumir_robustez(tabela))
+            print("✅ Resultados por cenário exportados para 'robustez_cenarios.csv'")
+
+    registro.finalizar()
+    if REGISTRAR_EXECUCAO:
+        registro.imprimir_resumo()
+        registro.salvar()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Este script resolve o modelo simplificado (centros populacionais) para
+TODOS os números de hospitais de 1 até NUMERO_MAXIMO_DE_HOSPITAIS em uma
+única execução e gera a curva custo x número de hospitais.
+
+O modelo é montado uma vez só; entre um valor de p e o seguinte muda apenas
+a restrição Num_Hospitais e o HiGHS parte da solução anterior.
+
+Saída: 'Arquivos/varredura_hospitais.csv' com, para cada p, o objetivo, a
+distância média por habitante e os nós escolhidos.
+"""
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pickle
+import os
+
+from grafo_compacto import carregar_grafo
+from armazem_distancias import abrir_armazem, existe_armazem
+from modelo_matricial import varrer_p_mediana
+from renderizacao import exportar_cenarios
+
+
+def exportar_varredura_csv(nos_populacao, pesos, resultados, nome_arquivo_saida):
+    """
+    Exporta uma linha por valor de p. Os nós escolhidos são os p candidatos
+    de maior valor de x_j (no modelo contínuo x_j pode ser fracionário).
+    """
+    print("\nExportando resultados da varredura para arquivo CSV...")
+    populacao_total = pesos.sum()
+    dados_para_csv = []
+    for r in resultados:
+        if r['x'] is None:
+            escolhidos, distancia_media = [], None
+        else:
+            ordem = np.argsort(-r['x'], kind='stable')[:r['p']]
+            escolhidos = [nos_populacao[b] for b in ordem]
+            distancia_media = r['objetivo'] / populacao_total
+        dados_para_csv.append({
+            'Numero_de_Hospitais': r['p'],
+            'Status': r['status'],
+            'Objetivo': r['objetivo'],
+            'Distancia_Media_m': distancia_media,
+            'Tempo_s': r['tempo'],
+            'Nos_Escolhidos': ','.join(str(node) for node in escolhidos),
+        })
+
+    df_resultados = pd.DataFrame(dados_para_csv)
+    df_resultados.to_csv(nome_arquivo_saida, index=False, sep=';', decimal=',')
+    print(f"✅ Resultados exportados com sucesso para '{nome_arquivo_saida}'")
+    return df_resultados
+
+
+def visualizar_curva(df_resultados):
+    print("\nGerando a curva custo x número de hospitais...")
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.plot(df_resultados['Numero_de_Hospitais'], df_resultados['Distancia_Media_m'], marker='o')
+    ax.set_xlabel('Número de hospitais')
+    ax.set_ylabel('Distância média por habitante (m)')
+    ax.set_title('Distância Média até o Hospital Mais Próximo x Número de Hospitais', fontsize=14)
+    ax.grid(True, alpha=0.3)
+    plt.show()
+
+
+# --- Execução Principal ---
+if __name__ == "__main__":
+    print("--- Etapa 1: Carregar Dados Reais ---")
+    caminho_armazem = os.path.join('Arquivos', 'matriz_distancias')
+    try:
+        G_completo = carregar_grafo(os.path.join('Arquivos', 'sao_carlos_grafo_preciso.graphml'))
+        with open(os.path.join('Arquivos', 'populacoes_nos.pkl'), 'rb') as f:
+            populacoes_completas = pickle.load(f)
+        if not existe_armazem(caminho_armazem):
+            print("Execute o script '4_distancias.py' primeiro.")
+            exit()
+        distancias_completas = abrir_armazem(caminho_armazem)
+        print("Grafo, populações e distâncias carregados com sucesso!")
+    except FileNotFoundError:
+        print("Erro: Ficheiros do grafo ou da população não encontrados.")
+        exit()
+
+    nos_populacao = [node for node, pop in populacoes_completas.items() if pop > 0 and node in G_completo.nodes()]
+    print(f"\nProblema simplificado de {len(G_completo.nodes())} para {len(nos_populacao)} nós (centros populacionais).")
+
+    # --- PARÂMETROS ---
+    NUMERO_MAXIMO_DE_HOSPITAIS = 15
+    # False = modelo contínuo (como o 5.1_final_simp.py); True = x_j binário
+    MODELO_INTEIRO = False
+    # Com mais de 1 processo, os valores de p são divididos entre eles
+    NUMERO_DE_PROCESSOS = 1
+    ARQUIVO_SAIDA = os.path.join('Arquivos', 'varredura_hospitais.csv')
+    # Com uma pasta, grava o mapa de cada p ('caso_<p>.png'), em paralelo
+    PASTA_FIGURAS = None
+
+    # --- PROCESSAMENTO ---
+    D = distancias_completas.submatriz(nos_populacao, nos_populacao)
+    pesos = np.array([populacoes_completas[i] for i in nos_populacao], dtype=np.float64)
+    valores_p = range(1, min(NUMERO_MAXIMO_DE_HOSPITAIS, len(nos_populacao)) + 1)
+    resultados = varrer_p_mediana(pesos, D, valores_p, inteiro=MODELO_INTEIRO, n_processos=NUMERO_DE_PROCESSOS)
+
+    # --- ANÁLISE E EXPORTAÇÃO ---
+    df_resultados = exportar_varredura_csv(nos_populacao, pesos, resultados, ARQUIVO_SAIDA)
+    if PASTA_FIGURAS:
+        cenarios = [{'nome': f"caso_{r['p']}", 'tipo': 'resultados', 'n_hospitais': r['p'],
+                     'resultados': dict(zip(nos_populacao, r['x'].tolist())), 'populacoes': populacoes_completas}
+                    for r in resultados if r['x'] is not None]
+        exportar_cenarios(G_completo, cenarios, PASTA_FIGURAS, n_processos=NUMERO_DE_PROCESSOS)
+    visualizar_curva(df_resultados)
@@ -4,7 +4,7 @@ Este script resolve o problema de localização de hospitais para São Carlos,
 gera visualizações e exporta os resultados detalhados para um arquivo CSV.
 """
 import networkx as nx
-import pulp
+import numpy as np
 import matplotlib.pyplot as plt
 import osmnx as ox
 import pickle
@@ -12,85 +12,137 @@ import time
 import pandas as pd
 import os
 
+from grafo_compacto import carregar_grafo
+from armazem_distancias import abrir_armazem, existe_armazem
+from modelo_matricial import resolver_p_mediana, resolver_p_mediana_preguicoso, resolver_p_mediana_inteiro
+from agregacao_demanda import agregar_demanda, avaliar_na_demanda_completa
+from localizacao_incremental import ancorar_unidades, distancia_existentes, resolver_localizacao_incremental
+from mapa_hospitais_SC import carregar_unidades
+from renderizacao import exportar_cenarios
+from instrumentacao import RegistroExecucao, etapa
+from avaliacao import avaliar_localizacao, coordenadas_nos, regioes_captacao
+
 def carregar_distancias():
-    arquivo_dist = os.path.join('Arquivos', 'matriz_distancias.pkl')
-    if not os.path.exists(arquivo_dist):
+    caminho_armazem = os.path.join('Arquivos', 'matriz_distancias')
+    if not existe_armazem(caminho_armazem):
         print("❌ Erro: Matriz de distâncias não encontrada.")
-        print("Execute o script '3_5_calculo_distancias.py' primeiro.")
+        print("Execute o script '4_distancias.py' primeiro (ou converta um 'matriz_distancias.pkl'")
+        print("antigo com 'armazem_distancias.py').")
         return None
     
-    print("Carregando matriz de distâncias pré-calculada...")
-    with open(arquivo_dist, 'rb') as f:
-        distancias = pickle.load(f)
-    print("✅ Matriz carregada.")
+    print("Abrindo matriz de distâncias pré-calculada...")
+    distancias = abrir_armazem(caminho_armazem)
+    print(f"✅ Matriz aberta ({distancias.n_linhas} x {distancias.n_colunas}).")
     return distancias
 
-def resolver_localizacao_hospitais(G, populacoes, distancias, n_hospitais, populacao_minima):
+def resolver_localizacao_hospitais(G, populacoes, distancias, n_hospitais, populacao_minima, modo='completo',
+                                   agregacao=None, nos_existentes=None, limite_tempo=None):
+    """
+    Resolve o problema de otimização linear. Retorna {candidato: x_j}, ou
+    None se não houver solução (ver resolver_localizacao_hospitais_com_objetivo,
+    que também devolve o objetivo).
+    """
+    resultados, _ = resolver_localizacao_hospitais_com_objetivo(G, populacoes, distancias, n_hospitais,
+                                                               populacao_minima, modo, agregacao,
+                                                               nos_existentes, limite_tempo)
+    return resultados
+
+def resolver_localizacao_hospitais_com_objetivo(G, populacoes, distancias, n_hospitais, populacao_minima,
+                                                modo='completo', agregacao=None, nos_existentes=None,
+                                                limite_tempo=None):
     """
     Resolve o problema de otimização linear.
+
+    modo='completo' cria todas as restrições y_ij <= x_j de uma vez;
+    modo='preguicoso' só adiciona as que forem violadas, rodada a rodada,
+    chegando ao mesmo ótimo com uma fração da memória;
+    modo='inteiro' resolve com x_j binário (branch-and-bound partindo da
+    heurística, com limite lagrangiano e fixação por custos reduzidos),
+    parando em 'limite_tempo' segundos com a melhor solução encontrada.
+
+    Com uma 'agregacao' (ver agregacao_demanda.py), a demanda são os
+    representantes com as populações somadas, em vez de todos os nós.
+
+    Com 'nos_existentes' (nós das unidades que já existem), elas ficam
+    fixas e n_hospitais é o número de hospitais NOVOS (ver
+    localizacao_incremental.py).
+    Retorna (resultados, objetivo), com resultados = {candidato: x_j}, ou
+    (None, None) se não houver solução.
     """
     print("\nFormulando o problema de otimização...")
     
-    nos_populacao = list(G.nodes())
+    nos_populacao = list(G.nodes()) if agregacao is None else agregacao.representantes
     locais_candidatos = [node for node, pop in populacoes.items() if pop >= populacao_minima and node in G.nodes()]
     
     print(f"Reduzindo o espaço de busca: de {len(nos_populacao)} para {len(locais_candidatos)} locais candidatos (com pop >= {populacao_minima}).")
     
     if not locais_candidatos or len(locais_candidatos) < n_hospitais:
         print("❌ Erro: Não há locais candidatos suficientes com os critérios definidos.")
-        return None
-
-    prob = pulp.LpProblem("Localizacao_Hospitais", pulp.LpMinimize)
-    x = pulp.LpVariable.dicts("Hospital", locais_candidatos, 0, 1, pulp.LpContinuous)
-    y = pulp.LpVariable.dicts("Atende", (nos_populacao, locais_candidatos), 0, 1, pulp.LpContinuous)
+        return None, None
 
-    objetivo = pulp.lpSum([populacoes.get(i, 0) * distancias[i][j] * y[i][j] for i in nos_populacao for j in locais_candidatos])
-    prob += objetivo
-
-    prob += pulp.lpSum([x[j] for j in locais_candidatos]) == n_hospitais, "Num_Hospitais"
-    for i in nos_populacao:
-        prob += pulp.lpSum([y[i][j] for j in locais_candidatos]) == 1, f"Atendimento_Garantido_{i}"
-    for i in nos_populacao:
-        for j in locais_candidatos:
-            prob += y[i][j] <= x[j], f"Logica_Atendimento_{i}_{j}"
+    # Lê do disco apenas o bloco demanda x candidatos que o modelo usa e
+    # monta o modelo diretamente como vetores/matrizes esparsas.
+    D = distancias.submatriz(nos_populacao, locais_candidatos)
+    if agregacao is None:
+        pesos = np.array([populacoes.get(i, 0) for i in nos_populacao], dtype=np.float64)
+    else:
+        pesos = agregacao.pesos
 
     print("Resolvendo o problema... (Isso pode levar alguns minutos)")
     start_time = time.time()
-    solver = pulp.PULP_CBC_CMD(msg=True, options=['dualSimplex'])
-    prob.solve(solver)
+    if nos_existentes:
+        d_existentes = distancia_existentes(G, nos_existentes, nos_populacao)
+        x, objetivo, status = resolver_localizacao_incremental(pesos, D, d_existentes, n_hospitais, modo,
+                                                               inteiro=(modo == 'inteiro'), limite_tempo=limite_tempo)
+    elif modo == 'preguicoso':
+        x, objetivo, status, rodadas = resolver_p_mediana_preguicoso(pesos, D, n_hospitais)
+        print(f"{len(rodadas)} rodadas, {sum(r['linhas_adicionadas'] for r in rodadas)} linhas adicionadas.")
+    elif modo == 'inteiro':
+        x, objetivo, status, limites = resolver_p_mediana_inteiro(pesos, D, n_hospitais, limite_tempo)
+        if limites:
+            print(f"Gap final: {100.0 * limites[-1][3]:.4f}%.")
+    else:
+        x, objetivo, status = resolver_p_mediana(pesos, D, n_hospitais)
     end_time = time.time()
     
     print(f"Problema resolvido em {end_time - start_time:.2f} segundos.")
-    print("Status:", pulp.LpStatus[prob.status])
+    print("Status:", status)
+    if x is None:
+        return None, None
 
-    return {j: x[j].varValue for j in locais_candidatos}
+    return {j: float(x[b]) for b, j in enumerate(locais_candidatos)}, objetivo
 
 # --- NOVA FUNÇÃO ---
-def exportar_resultados_csv(G, resultados):
+def exportar_resultados_csv(G, resultados, nome_arquivo_saida='resultados_probabilidades.csv', n_hospitais=None):
     """
-    Exporta os resultados da otimização para um arquivo CSV.
+    Exporta os resultados da otimização para um arquivo CSV, com o hospital
+    atribuído a cada local e a distância até ele pela malha viária (um
+    Dijkstra com várias origens, ver avaliacao.py). Os hospitais são os
+    n_hospitais locais de maior valor; sem n_hospitais, os de valor >= 0.5.
     """
     print("\nExportando resultados para arquivo CSV...")
-    
-    # Prepara os dados para o DataFrame
-    dados_para_csv = []
-    for node_id, probabilidade in resultados.items():
-        dados_no = G.nodes[node_id]
-        dados_para_csv.append({
-            'ID do Cruzamento': node_id,
-            'Posicao_X': dados_no.get('x'),
-            'Posicao_Y': dados_no.get('y'),
-            'Probabilidade': probabilidade
-        })
-        
-    # Cria o DataFrame com o pandas
-    df_resultados = pd.DataFrame(dados_para_csv)
-    
+
+    nos = list(resultados)
+    xy = coordenadas_nos(G, nos)
+    df_resultados = pd.DataFrame({
+        'ID do Cruzamento': nos,
+        'Posicao_X': xy[:, 0],
+        'Posicao_Y': xy[:, 1],
+        'Probabilidade': list(resultados.values()),
+    })
+    if n_hospitais is not None:
+        hospitais = sorted(resultados, key=resultados.get, reverse=True)[:n_hospitais]
+    else:
+        hospitais = [node for node, valor in resultados.items() if valor >= 0.5]
+    if hospitais:
+        atribuidos, distancias = avaliar_localizacao(G, hospitais).atribuicao_de(nos)
+        df_resultados['Hospital Atribuido'] = atribuidos
+        df_resultados['Distancia ao Hospital (m)'] = distancias
+
     # Ordena o DataFrame pela probabilidade, da maior para a menor
     df_resultados = df_resultados.sort_values(by='Probabilidade', ascending=False)
     
     # Salva em um arquivo CSV
-    nome_arquivo_saida = 'resultados_probabilidades.csv'
     df_resultados.to_csv(nome_arquivo_saida, index=False, sep=';', decimal=',')
     
     print(f"✅ Resultados exportados com sucesso para '{nome_arquivo_saida}'")
@@ -129,7 +181,7 @@ def visualizar_probabilidades(G, resultados, n_hospitais):
 if __name__ == "__main__":
     print("--- Etapa 1: Carregando Dados ---")
     try:
-        G = ox.load_graphml(os.path.join('Arquivos','sao_carlos_grafo_preciso.graphml'))
+        G = carregar_grafo(os.path.join('Arquivos','sao_carlos_grafo_preciso.graphml'))
         with open(os.path.join('Arquivos', 'populacoes_suavizadas.pkl'), 'rb') as f:
             populacoes = pickle.load(f)
         
@@ -147,16 +199,82 @@ if __name__ == "__main__":
     # --- PARÂMETROS ---
     NUMERO_DE_HOSPITAIS = 9
     POPULACAO_MINIMA_CANDIDATO = 200 
+    # 'completo', 'preguicoso' (restrições y_ij <= x_j geradas sob demanda)
+    # ou 'inteiro' (x_j binário, sem arredondamento). Os dois últimos
+    # precisam do pacote highspy.
+    MODO_RESOLUCAO = 'completo'
+    # Tempo máximo do modo 'inteiro' (segundos); None = até provar o ótimo
+    LIMITE_TEMPO_S = 300
+    # Agrega os nós de demanda em representantes (células de TAMANHO_CELULA_M
+    # metros); células maiores = modelo menor e limite de erro maior
+    AGREGAR_DEMANDA = False
+    TAMANHO_CELULA_M = 300
+    # Mantém fixos os hospitais e UPAs que já existem (mapa_hospitais_SC.py)
+    # e escolhe só onde abrir os NUMERO_DE_HOSPITAIS novos
+    FIXAR_EXISTENTES = False
+    # Grava também os polígonos da área de captação de cada hospital
+    # (ex.: 'regioes_captacao.geojson' ou '.gpkg'); None = não grava
+    ARQUIVO_REGIOES_CAPTACAO = None
+    # Com uma pasta, as figuras são gravadas nela (PNG) em vez de abertas em janelas
+    PASTA_FIGURAS = None
+    # Grava tempo, CPU, memória, tamanho do modelo e estatísticas do solver
+    # em 'Arquivos/registros/' (JSON da execução + histórico em CSV)
+    REGISTRAR_EXECUCAO = True
 
     # --- PROCESSAMENTO ---
-    resultados = resolver_localizacao_hospitais(G, populacoes_filtradas, distancias, NUMERO_DE_HOSPITAIS, POPULACAO_MINIMA_CANDIDATO)
+    registro = RegistroExecucao('5_final', {
+        'n_hospitais': NUMERO_DE_HOSPITAIS, 'populacao_minima': POPULACAO_MINIMA_CANDIDATO,
+        'modo': MODO_RESOLUCAO, 'limite_tempo_s': LIMITE_TEMPO_S, 'agregar_demanda': AGREGAR_DEMANDA, 'tamanho_celula_m': TAMANHO_CELULA_M,
+        'fixar_existentes': FIXAR_EXISTENTES,
+    }).iniciar()
+    nos_existentes = None
+    if FIXAR_EXISTENTES:
+        with etapa('existentes'):
+            existentes = ancorar_unidades(G, carregar_unidades())
+            nos_existentes = sorted(set(existentes.values()))
+        print(f"{len(existentes)} unidades existentes fixas em {len(nos_existentes)} nós do grafo.")
+    agregacao = None
+    if AGREGAR_DEMANDA:
+        with etapa('agregacao'):
+            agregacao = agregar_demanda(G, populacoes_filtradas, TAMANHO_CELULA_M)
+    with etapa('resolucao'):
+        resultados, objetivo = resolver_localizacao_hospitais_com_objetivo(G, populacoes_filtradas, distancias, NUMERO_DE_HOSPITAIS, POPULACAO_MINIMA_CANDIDATO, MODO_RESOLUCAO, agregacao, nos_existentes, LIMITE_TEMPO_S)
+    if resultados and nos_existentes:
+        # As unidades existentes entram nos mapas e no CSV como hospitais abertos
+        resultados.update({node: 1.0 for node in nos_existentes})
+        NUMERO_DE_HOSPITAIS += len(nos_existentes)
+    if resultados and agregacao is not None:
+        # A solução do modelo agregado é avaliada na demanda completa
+        hospitais = sorted(resultados, key=resultados.get, reverse=True)[:NUMERO_DE_HOSPITAIS]
+        avaliar_na_demanda_completa(G, agregacao, hospitais, objetivo)
 
     # --- ANÁLISE E EXPORTAÇÃO ---
-    if resultados:
-        # Mostra o primeiro gráfico (resultados finais)
-        visualizar_resultados(G, populacoes_filtradas, resultados, NUMERO_DE_HOSPITAIS)
+    if resultados and PASTA_FIGURAS:
+        exportar_cenarios(G, [
+            {'nome': f'{NUMERO_DE_HOSPITAIS}_hospitais_otimo', 'tipo': 'resultados', 'resultados': resultados,
+             'populacoes': populacoes_filtradas, 'n_hospitais': NUMERO_DE_HOSPITAIS},
+            {'nome': f'{NUMERO_DE_HOSPITAIS}_hospitais_probabilidades', 'tipo': 'probabilidades',
+             'resultados': resultados, 'n_hospitais': NUMERO_DE_HOSPITAIS},
+        ], PASTA_FIGURAS)
+    elif resultados:
+        # Mostra o primeiro gráfico (resultados finais); o grafo do NetworkX
+        # só é montado aqui, para desenhar
+        visualizar_resultados(G.networkx(), populacoes_filtradas, resultados, NUMERO_DE_HOSPITAIS)
         # Mostra o segundo gráfico (análise de probabilidades)
-        visualizar_probabilidades(G, resultados, NUMERO_DE_HOSPITAIS)
+        visualizar_probabilidades(G.networkx(), resultados, NUMERO_DE_HOSPITAIS)
+    if resultados:
         # Exporta os dados para um arquivo CSV
-        exportar_resultados_csv(G, resultados)
+        with etapa('exportacao'):
+            exportar_resultados_csv(G, resultados, n_hospitais=NUMERO_DE_HOSPITAIS)
+        if ARQUIVO_REGIOES_CAPTACAO:
+            with etapa('captacao'):
+                hospitais = sorted(resultados, key=resultados.get, reverse=True)[:NUMERO_DE_HOSPITAIS]
+                avaliacao = avaliar_localizacao(G, hospitais, populacoes_filtradas)
+                regioes_captacao(G, avaliacao).to_file(ARQUIVO_REGIOES_CAPTACAO)
+            print(f"✅ Áreas de captação gravadas em '{ARQUIVO_REGIOES_CAPTACAO}'")
+
+    registro.finalizar()
+    if REGISTRAR_EXECUCAO:
+        registro.imprimir_resumo()
+        registro.salvar()
 
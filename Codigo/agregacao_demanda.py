@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Agregação dos pontos de demanda para reduzir o modelo de p-medianas.
+
+Os nós com população são agrupados em pontos representativos: o grafo
+(projetado em metros) é dividido em células quadradas de lado
+'tamanho_celula'; em cada célula o representante é o nó mais próximo do
+centro de massa populacional. Depois, cada nó de demanda é atribuído ao
+representante mais próximo PELA MALHA VIÁRIA (Dijkstra com várias origens)
+e o representante recebe a soma das populações atribuídas a ele.
+
+Limites de erro (distâncias de rede são simétricas e obedecem à
+desigualdade triangular). Com r_i = d(i, representante de i):
+- para QUALQUER conjunto de hospitais X, |f(X) - f'(X)| <= sum_i w_i r_i,
+  onde f é o custo na demanda completa e f' na agregada (erros de fonte
+  A, B e C de Hillsman & Rhoda ficam todos dentro desse limite);
+- se X' é ótimo para a demanda agregada e X* para a completa,
+  f(X') - f(X*) <= 2 sum_i w_i r_i.
+Depois de resolver, f(X') é calculado exatamente na demanda completa e
+f'(X') - sum_i w_i r_i é um limite inferior para f(X*), o que costuma dar
+um gap bem menor que 2 sum_i w_i r_i.
+"""
+import numpy as np
+
+from avaliacao import avaliar_localizacao
+from calculo_distancias import grafo_para_csr
+
+
+class AgregacaoDemanda:
+    """Resultado da agregação: representantes, pesos e raios de agregação."""
+
+    def __init__(self, representantes, pesos, atribuicao, raios, nos_demanda, populacoes_demanda):
+        self.representantes = representantes
+        self.pesos = pesos
+        self.atribuicao = atribuicao
+        self.raios = raios
+        self.nos_demanda = nos_demanda
+        self.populacoes_demanda = populacoes_demanda
+
+    @property
+    def limite_erro_avaliacao(self):
+        """Limite para |f(X) - f'(X)|, válido para qualquer conjunto de hospitais."""
+        return float(self.populacoes_demanda @ self.raios)
+
+    @property
+    def limite_erro_otimalidade(self):
+        """Limite para f(X') - f(X*) quando X' é ótimo para a demanda agregada."""
+        return 2.0 * self.limite_erro_avaliacao
+
+
+def _representantes_por_celula(G, nos, pesos, tamanho_celula):
+    """Um nó por célula: o mais próximo do centro de massa populacional da célula."""
+    xy = np.array([(G.nodes[node]['x'], G.nodes[node]['y']) for node in nos], dtype=np.float64)
+    celulas = np.floor((xy - xy.min(axis=0)) / tamanho_celula).astype(np.int64)
+    _, celula = np.unique(celulas, axis=0, return_inverse=True)
+    celula = celula.ravel()
+    n_celulas = celula.max() + 1
+
+    total = np.bincount(celula, weights=pesos, minlength=n_celulas)
+    centro = np.column_stack([np.bincount(celula, weights=pesos * xy[:, k], minlength=n_celulas)
+                              for k in range(2)]) / total[:, None]
+
+    # Nó de menor distância ao centro da própria célula
+    distancia_centro = np.hypot(*(xy - centro[celula]).T)
+    ordem = np.lexsort((distancia_centro, celula))
+    primeiro = np.ones(len(ordem), dtype=bool)
+    primeiro[1:] = celula[ordem][1:] != celula[ordem][:-1]
+    return [nos[k] for k in ordem[primeiro]]
+
+
+def _atribuir(G, csr, nos_demanda, representantes):
+    """
+    Atribui cada nó de demanda ao representante mais próximo pela malha
+    (avaliacao.avaliar_localizacao, com os representantes no lugar dos
+    hospitais). Retorna (grupo, raios); nós inalcançáveis ficam no grupo -1.
+    """
+    return avaliar_localizacao(G, representantes, csr=csr, msg=False).posicoes_e_distancias(nos_demanda)
+
+
+def agregar_demanda(G, populacoes, tamanho_celula, peso='length'):
+    """
+    Agrega os nós com população > 0 em representantes.
+
+    'tamanho_celula' (em metros) controla o nível de agregação: células
+    maiores dão menos representantes e um limite de erro maior.
+    """
+    nos_demanda = [node for node, pop in populacoes.items() if pop > 0 and node in G.nodes()]
+    populacoes_demanda = np.array([populacoes[node] for node in nos_demanda], dtype=np.float64)
+    representantes = _representantes_por_celula(G, nos_demanda, populacoes_demanda, tamanho_celula)
+
+    csr = grafo_para_csr(G, peso=peso)
+    grupo, raios = _atribuir(G, csr, nos_demanda, representantes)
+
+    # Nós sem caminho até nenhum representante (outra componente do grafo)
+    # viram representantes deles mesmos
+    isolados = np.flatnonzero(grupo < 0)
+    if len(isolados):
+        print(f"⚠️ Atenção: {len(isolados)} nós de demanda sem caminho até um representante viraram representantes.")
+        representantes = representantes + [nos_demanda[k] for k in isolados]
+        grupo, raios = _atribuir(G, csr, nos_demanda, representantes)
+
+    # Representantes que não receberam nenhuma demanda são descartados
+    pesos = np.bincount(grupo, weights=populacoes_demanda, minlength=len(representantes))
+    usados = np.flatnonzero(pesos > 0)
+    representantes = [representantes[k] for k in usados]
+    atribuicao = {node: representantes[g] for node, g in
+                  zip(nos_demanda, np.searchsorted(usados, grupo).tolist())}
+
+    agregacao = AgregacaoDemanda(representantes, pesos[usados], atribuicao, raios,
+                                 nos_demanda, populacoes_demanda)
+    print(f"Demanda agregada: {len(nos_demanda)} nós -> {len(representantes)} representantes "
+          f"(células de {tamanho_celula:.0f} m).")
+    print(f"Limite de erro na avaliação de qualquer solução: {agregacao.limite_erro_avaliacao:,.2f} "
+          f"({agregacao.limite_erro_avaliacao / populacoes_demanda.sum():.1f} m por habitante).")
+    print(f"Limite de erro de otimalidade: {agregacao.limite_erro_otimalidade:,.2f}")
+    return agregacao
+
+
+def avaliar_na_demanda_completa(G, agregacao, hospitais, limite_inferior_agregado=None, peso='length'):
+    """
+    Custo exato (população x distância ao hospital mais próximo) dos
+    'hospitais' escolhidos no modelo agregado, sobre a demanda COMPLETA.
+
+    Se 'limite_inferior_agregado' for dado (o objetivo ótimo do modelo
+    agregado, ou o da sua relaxação linear), calcula também um limite
+    inferior para o ótimo do modelo completo e o gap da solução.
+
+    Retorna um dicionário com 'custo', 'distancia_media' e, se possível,
+    'limite_inferior' e 'gap_percentual'.
+    """
+    _, d = avaliar_localizacao(G, hospitais, peso=peso, msg=False).posicoes_e_distancias(agregacao.nos_demanda)
+
+    custo = float(agregacao.populacoes_demanda @ d)
+    avaliacao = {'custo': custo, 'distancia_media': custo / agregacao.populacoes_demanda.sum()}
+    print(f"\nCusto da solução na demanda completa: {custo:,.2f} "
+          f"({avaliacao['distancia_media']:.1f} m por habitante).")
+    if limite_inferior_agregado is not None:
+        limite = limite_inferior_agregado - agregacao.limite_erro_avaliacao
+        avaliacao['limite_inferior'] = limite
+        avaliacao['gap_percentual'] = 100.0 * (custo - limite) / custo
+        print(f"Limite inferior para o ótimo completo: {limite:,.2f} | "
+              f"gap comprovado: {avaliacao['gap_percentual']:.2f}%")
+    return avaliacao
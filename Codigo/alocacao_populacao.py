@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Distribuição da população dos setores censitários entre os nós do grafo.
+
+Em vez de entregar toda a população de um setor ao nó mais próximo do seu
+centróide, ela é repartida entre os nós do setor:
+- metodo='comprimento': entre os nós dentro do polígono, proporcional à
+  metade do comprimento das ruas que chegam a cada nó (a "rua servida"
+  pelo nó);
+- metodo='voronoi': proporcional à área da interseção do setor com a
+  célula de Voronoi de cada nó (nós de fora do setor também recebem a
+  parte da sua célula que cai dentro dele).
+Setores sem nenhum nó (ou sem interseção) ficam com o nó mais próximo
+do polígono. Os inteiros são obtidos pelo método dos maiores restos,
+setor a setor, então a população de cada setor é conservada exatamente.
+
+Tudo é feito sobre vetores de geometrias do shapely com índices espaciais
+STRtree, em blocos, o que permite processar os setores de um estado
+inteiro de uma vez.
+"""
+import numpy as np
+import shapely
+
+from calculo_distancias import grafo_para_csr
+
+# Quantidade de pares (setor, célula) cujas interseções são calculadas de
+# uma vez no método 'voronoi'; limita a memória das geometrias temporárias.
+PARES_POR_BLOCO = 200_000
+
+
+def _coordenadas(G):
+    """Retorna (nos, xy) na ordem de G.nodes()."""
+    if hasattr(G, 'ids'):
+        return list(G.ids), np.column_stack([G.x, G.y]).astype(np.float64)
+    nos = list(G.nodes())
+    xy = np.array([(G.nodes[node]['x'], G.nodes[node]['y']) for node in nos], dtype=np.float64)
+    return nos, xy
+
+
+def comprimento_servido(G, peso='length'):
+    """Metade do comprimento das ruas (sem sentido, sem paralelas) que chegam a cada nó."""
+    A, _ = grafo_para_csr(G, peso=peso)
+    return 0.5 * np.asarray(A.sum(axis=1)).ravel()
+
+
+def _pares_comprimento(setores, pontos, pesos_nos):
+    """Pares (setor, nó, peso) para os nós dentro de cada setor."""
+    arvore = shapely.STRtree(setores)
+    no, setor = arvore.query(pontos, predicate='intersects')
+    # Um nó na divisa entre setores fica só com o primeiro deles
+    no, primeiro = np.unique(no, return_index=True)
+    setor = setor[primeiro]
+    pesos = pesos_nos[no]
+
+    # Setores cujos nós não têm ruas (peso total 0) dividem por igual
+    total = np.bincount(setor, weights=pesos, minlength=len(setores))
+    pesos = np.where(total[setor] > 0, pesos, 1.0)
+    return setor, no, pesos
+
+
+def celulas_voronoi_ordenadas(pontos, extend_to):
+    """
+    Célula de Voronoi de cada ponto de 'pontos' (n x 2, sem repetidos), na
+    ordem dos pontos. O 'ordered=True' do shapely só existe a partir da
+    versão 2.1; antes disso as células são casadas com os pontos que
+    contêm, por um STRtree.
+    """
+    multipontos = shapely.multipoints(pontos)
+    try:
+        return shapely.get_parts(shapely.voronoi_polygons(multipontos, extend_to=extend_to, ordered=True))
+    except TypeError:
+        celulas = shapely.get_parts(shapely.voronoi_polygons(multipontos, extend_to=extend_to))
+    celula, ponto = shapely.STRtree(shapely.points(pontos)).query(celulas, predicate='contains')
+    ordenadas = np.empty(len(pontos), dtype=object)
+    ordenadas[ponto] = celulas[celula]
+    return ordenadas
+
+
+def _celulas_voronoi(xy, limites):
+    """Célula de Voronoi de cada ponto (pontos repetidos dividem a mesma célula)."""
+    unicos, inverso = np.unique(xy, axis=0, return_inverse=True)
+    inverso = inverso.ravel()
+    if len(unicos) < 3:
+        # Com menos de 3 pontos distintos não há diagrama; cada um fica com tudo
+        return np.full(len(unicos), shapely.box(*limites)), inverso
+    return celulas_voronoi_ordenadas(unicos, shapely.box(*limites)), inverso
+
+
+def _pares_voronoi(setores, xy):
+    """Pares (setor, nó, área da interseção do setor com a célula do nó)."""
+    limites = np.concatenate([np.minimum(shapely.total_bounds(setores)[:2], xy.min(axis=0)),
+                              np.maximum(shapely.total_bounds(setores)[2:], xy.max(axis=0))])
+    celulas, inverso = _celulas_voronoi(xy, limites)
+
+    arvore = shapely.STRtree(celulas)
+    setor, celula = arvore.query(setores, predicate='intersects')
+    areas = np.empty(len(setor), dtype=np.float64)
+    for inicio in range(0, len(setor), PARES_POR_BLOCO):
+        fim = inicio + PARES_POR_BLOCO
+        areas[inicio:fim] = shapely.area(shapely.intersection(setores[setor[inicio:fim]],
+                                                              celulas[celula[inicio:fim]]))
+    manter = areas > 0
+    setor, celula, areas = setor[manter], celula[manter], areas[manter]
+
+    # Pontos repetidos: cada nó da célula recebe uma fração igual da área
+    ordem = np.argsort(inverso, kind='stable')
+    contagem = np.bincount(inverso, minlength=len(celulas))
+    inicio_celula = np.concatenate([[0], np.cumsum(contagem)])
+    repeticoes = contagem[celula]
+    setor = np.repeat(setor, repeticoes)
+    areas = np.repeat(areas / repeticoes, repeticoes)
+    deslocamento = np.arange(len(setor)) - np.repeat(np.cumsum(repeticoes) - repeticoes, repeticoes)
+    no = ordem[np.repeat(inicio_celula[celula], repeticoes) + deslocamento]
+    return setor, no, areas
+
+
+def _maiores_restos(setor, pesos, populacao_setores):
+    """
+    Divide a população (inteira) de cada setor entre os seus pares, na
+    proporção dos pesos, conservando o total do setor.
+    """
+    total = np.bincount(setor, weights=pesos, minlength=len(populacao_setores))
+    cotas = populacao_setores[setor] * pesos / total[setor]
+    inteiros = np.floor(cotas).astype(np.int64)
+    distribuido = np.bincount(setor, weights=inteiros, minlength=len(populacao_setores))
+    sobra = populacao_setores - distribuido.round().astype(np.int64)
+
+    # Dentro de cada setor, os maiores restos recebem 1 a mais
+    ordem = np.lexsort((-(cotas - inteiros), setor))
+    setor_ordenado = setor[ordem]
+    inicio = np.searchsorted(setor_ordenado, setor_ordenado)
+    posicao = np.arange(len(ordem)) - inicio
+    inteiros[ordem] += posicao < sobra[setor_ordenado]
+    return inteiros
+
+
+def alocar_populacao(G, setores, populacao_setores, metodo='comprimento'):
+    """
+    Reparte a população dos 'setores' (vetor de polígonos no mesmo CRS do
+    grafo) entre os nós de G, que pode ser um grafo do NetworkX ou um
+    GrafoCompacto. 'metodo' é 'comprimento' ou 'voronoi'.
+
+    Retorna {nó: população} com todos os nós do grafo, na ordem de G.nodes(),
+    ou None se o método for desconhecido.
+    """
+    if metodo not in ('comprimento', 'voronoi'):
+        print(f"❌ Erro: Método de alocação desconhecido: '{metodo}'.")
+        return None
+
+    setores = np.asarray(setores, dtype=object)
+    populacao_setores = np.asarray(populacao_setores, dtype=np.int64)
+    nos, xy = _coordenadas(G)
+    pontos = shapely.points(xy)
+
+    if metodo == 'comprimento':
+        setor, no, pesos = _pares_comprimento(setores, pontos, comprimento_servido(G))
+    else:
+        setor, no, pesos = _pares_voronoi(setores, xy)
+
+    # Setores sem nenhum par ficam com o nó mais próximo do polígono
+    vazios = np.flatnonzero(np.bincount(setor, minlength=len(setores)) == 0)
+    if len(vazios):
+        setor_vazio, no_vazio = shapely.STRtree(pontos).query_nearest(setores[vazios])
+        setor_vazio, primeiro = np.unique(setor_vazio, return_index=True)
+        setor = np.concatenate([setor, vazios[setor_vazio]])
+        no = np.concatenate([no, no_vazio[primeiro]])
+        pesos = np.concatenate([pesos, np.ones(len(primeiro))])
+        print(f"{len(vazios)} setores sem nós próprios foram entregues ao nó mais próximo.")
+
+    populacao_nos = np.bincount(no, weights=_maiores_restos(setor, pesos, populacao_setores),
+                                minlength=len(nos)).round().astype(np.int64)
+    return dict(zip(nos, populacao_nos.tolist()))
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Armazém de distâncias em disco (substitui o pickle de dicionários aninhados).
+
+Formato, para um caminho base como 'Arquivos/matriz_distancias':
+- '<base>.dat'          : matriz float32 bruta, aberta com np.memmap;
+- '<base>_linhas.npy'   : IDs dos nós de origem (ordem das linhas);
+- '<base>_colunas.npy'  : IDs dos nós de destino (ordem das colunas);
+- '<base>.json'         : metadados (formato, dimensões e tipo).
+
+No formato 'triangular' (apenas matrizes quadradas e simétricas, como as do
+grafo não-direcionado) só a parte j >= i é guardada, linha a linha, o que
+reduz o arquivo à metade. Pares sem caminho ficam com distância infinita.
+
+Executado diretamente, converte um 'matriz_distancias.pkl' antigo.
+"""
+import json
+import os
+import pickle
+import shutil
+
+import numpy as np
+
+FORMATO_CHEIA = 'cheia'
+FORMATO_TRIANGULAR = 'triangular'
+
+
+def _arquivos(caminho_base):
+    return {
+        'dados': caminho_base + '.dat',
+        'linhas': caminho_base + '_linhas.npy',
+        'colunas': caminho_base + '_colunas.npy',
+        'meta': caminho_base + '.json',
+    }
+
+
+def existe_armazem(caminho_base):
+    return all(os.path.exists(f) for f in _arquivos(caminho_base).values())
+
+
+def _tamanho_dados(formato, n_linhas, n_colunas):
+    if formato == FORMATO_TRIANGULAR:
+        return n_linhas * (n_linhas + 1) // 2
+    return n_linhas * n_colunas
+
+
+class ArmazemDistancias:
+    """
+    Acesso às distâncias gravadas em disco via np.memmap.
+
+    Abrir o armazém só lê os metadados e as tabelas de IDs; as distâncias
+    são lidas do disco sob demanda, nas consultas.
+    """
+
+    def __init__(self, caminho_base, modo='r'):
+        arquivos = _arquivos(caminho_base)
+        with open(arquivos['meta'], 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+
+        self.caminho_base = caminho_base
+        self.formato = meta['formato']
+        self.linhas = np.load(arquivos['linhas'])
+        self.colunas = np.load(arquivos['colunas'])
+        self.n_linhas = len(self.linhas)
+        self.n_colunas = len(self.colunas)
+        self.dados = np.memmap(arquivos['dados'], dtype=meta['dtype'], mode=modo,
+                               shape=(_tamanho_dados(self.formato, self.n_linhas, self.n_colunas),))
+        self._indice_linhas = None
+        self._indice_colunas = None
+
+    @property
+    def shape(self):
+        return (self.n_linhas, self.n_colunas)
+
+    @property
+    def indice_linhas(self):
+        if self._indice_linhas is None:
+            self._indice_linhas = {node: k for k, node in enumerate(self.linhas.tolist())}
+        return self._indice_linhas
+
+    @property
+    def indice_colunas(self):
+        if self._indice_colunas is None:
+            self._indice_colunas = {node: k for k, node in enumerate(self.colunas.tolist())}
+        return self._indice_colunas
+
+    def _posicoes(self, a, b):
+        """Posições no vetor de dados para os índices (linha a, coluna b)."""
+        a = np.asarray(a, dtype=np.int64)
+        b = np.asarray(b, dtype=np.int64)
+        if self.formato == FORMATO_TRIANGULAR:
+            a, b = np.minimum(a, b), np.maximum(a, b)
+            return a * self.n_linhas - a * (a - 1) // 2 + (b - a)
+        return a * self.n_colunas + b
+
+    def distancia(self, i, j):
+        """Distância entre os nós i (origem) e j (destino)."""
+        pos = self._posicoes(self.indice_linhas[i], self.indice_colunas[j])
+        return float(self.dados[pos])
+
+    def linha(self, i):
+        """Distâncias do nó i para todas as colunas, como vetor float64."""
+        return self.ler_linha(self.indice_linhas[i])
+
+    def ler_linha(self, a):
+        """Como linha(), mas recebendo a posição da linha em vez da ID do nó."""
+        if self.formato == FORMATO_CHEIA:
+            inicio = a * self.n_colunas
+            return np.asarray(self.dados[inicio:inicio + self.n_colunas], dtype=np.float64)
+        return np.asarray(self.dados[self._posicoes(a, np.arange(self.n_colunas))], dtype=np.float64)
+
+    def submatriz(self, origens, destinos):
+        """
+        Matriz float64 (len(origens) x len(destinos)) com as distâncias entre
+        as listas de nós dadas. É o que os modelos de otimização consomem no
+        lugar de distancias[i][j].
+        """
+        a = np.array([self.indice_linhas[i] for i in origens], dtype=np.int64)
+        b = np.array([self.indice_colunas[j] for j in destinos], dtype=np.int64)
+        if self.formato == FORMATO_CHEIA:
+            # Lê linha a linha para não criar a matriz de posições inteira
+            resultado = np.empty((len(a), len(b)), dtype=np.float64)
+            for k, linha in enumerate(a):
+                inicio = linha * self.n_colunas
+                resultado[k] = self.dados[inicio:inicio + self.n_colunas][b]
+            return resultado
+        return np.asarray(self.dados[self._posicoes(a[:, None], b[None, :])], dtype=np.float64)
+
+    def escrever_linhas(self, inicio, bloco):
+        """
+        Grava as linhas [inicio, inicio + len(bloco)) a partir de uma matriz
+        densa com todas as colunas. No formato triangular só a parte j >= i
+        de cada linha é guardada.
+        """
+        bloco = np.asarray(bloco, dtype=self.dados.dtype)
+        if self.formato == FORMATO_CHEIA:
+            self.dados[inicio * self.n_colunas:(inicio + len(bloco)) * self.n_colunas] = bloco.ravel()
+            return
+        for k, valores in enumerate(bloco):
+            a = inicio + k
+            pos = self._posicoes(a, a)
+            self.dados[pos:pos + self.n_linhas - a] = valores[a:]
+
+    def flush(self):
+        self.dados.flush()
+
+
+def criar_armazem(caminho_base, linhas, colunas=None, triangular=False, dtype='float32'):
+    """
+    Cria um armazém vazio (preenchido com infinito) e o devolve aberto para
+    escrita. Sem 'colunas', a matriz é quadrada com as mesmas IDs das linhas.
+    """
+    linhas = np.asarray(linhas)
+    colunas = linhas if colunas is None else np.asarray(colunas)
+    if triangular and not np.array_equal(linhas, colunas):
+        raise ValueError("O formato triangular exige uma matriz quadrada (linhas == colunas).")
+
+    formato = FORMATO_TRIANGULAR if triangular else FORMATO_CHEIA
+    arquivos = _arquivos(caminho_base)
+    tamanho = _tamanho_dados(formato, len(linhas), len(colunas))
+
+    np.save(arquivos['linhas'], linhas)
+    np.save(arquivos['colunas'], colunas)
+    dados = np.memmap(arquivos['dados'], dtype=dtype, mode='w+', shape=(tamanho,))
+    dados[:] = np.inf
+    dados.flush()
+    del dados
+    with open(arquivos['meta'], 'w', encoding='utf-8') as f:
+        json.dump({'formato': formato, 'n_linhas': len(linhas),
+                   'n_colunas': len(colunas), 'dtype': dtype}, f, indent=2)
+
+    return ArmazemDistancias(caminho_base, modo='r+')
+
+
+def abrir_armazem(caminho_base, modo='r'):
+    """Abre um armazém existente (custo praticamente nulo)."""
+    return ArmazemDistancias(caminho_base, modo=modo)
+
+
+def copiar_armazem(caminho_origem, caminho_destino):
+    """Copia um armazém inteiro (útil para simular cenários sem alterar o original)."""
+    origem, destino = _arquivos(caminho_origem), _arquivos(caminho_destino)
+    for chave in origem:
+        shutil.copyfile(origem[chave], destino[chave])
+    return ArmazemDistancias(caminho_destino, modo='r+')
+
+
+def converter_pickle(arquivo_pkl, caminho_base, triangular=False):
+    """
+    Converte um 'matriz_distancias.pkl' (dicionário {origem: {destino: d}})
+    para o armazém em disco.
+    """
+    print(f"Carregando '{arquivo_pkl}' (pode demorar)...")
+    with open(arquivo_pkl, 'rb') as f:
+        distancias = pickle.load(f)
+
+    nos = list(distancias.keys())
+    armazem = criar_armazem(caminho_base, nos, triangular=triangular)
+    print(f"Gravando {len(nos)} linhas em '{caminho_base}.dat'...")
+    for a, origem in enumerate(nos):
+        linha = distancias[origem]
+        valores = np.array([linha.get(destino, np.inf) for destino in nos], dtype=np.float64)
+        armazem.escrever_linhas(a, valores[None, :])
+    armazem.flush()
+    print("✅ Conversão concluída!")
+    return armazem
+
+
+if __name__ == "__main__":
+    ARQUIVO_PKL = os.path.join('Arquivos', 'matriz_distancias.pkl')
+    CAMINHO_ARMAZEM = os.path.join('Arquivos', 'matriz_distancias')
+    # A matriz do grafo não-direcionado é simétrica: guardar só metade basta
+    TRIANGULAR = True
+
+    if not os.path.exists(ARQUIVO_PKL):
+        print(f"❌ Erro: Arquivo '{ARQUIVO_PKL}' não encontrado.")
+    else:
+        converter_pickle(ARQUIVO_PKL, CAMINHO_ARMAZEM, triangular=TRIANGULAR)
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Atualização incremental da matriz de distâncias (ruas interditadas,
+ruas novas ou trechos com comprimento alterado).
+
+Em vez de rodar de novo o '4_distancias.py', cada alteração de aresta
+atualiza apenas as linhas afetadas do armazém de distâncias:
+
+- Quando a aresta fica MAIS CURTA (ou é inserida), uma origem s só muda se
+  d(s,u) + w < d(s,v) ou vice-versa; a nova linha é
+  min(d(s,·), d(s,u) + w + d(v,·), d(s,v) + w + d(u,·)).
+- Quando a aresta fica MAIS LONGA (ou é removida), uma origem s só muda se a
+  aresta estava em algum caminho mínimo a partir dela, isto é,
+  |d(s,u) - d(s,v)| = w_antigo. Para essas origens, apenas os destinos cujo
+  caminho mínimo passava pela aresta são recalculados, com um Dijkstra
+  limitado a esse conjunto e iniciado pelos vizinhos não afetados.
+
+Exige a matriz QUADRADA de todos os pares (modo 'todos_os_pares' do
+'4_distancias.py'), que é simétrica porque o grafo é tratado como
+não-direcionado.
+"""
+import heapq
+import os
+import time
+
+import numpy as np
+
+from armazem_distancias import copiar_armazem, existe_armazem
+
+# As distâncias são guardadas em float32; comparações de igualdade de
+# caminhos usam esta folga relativa (errar para mais só custa tempo).
+TOLERANCIA_RELATIVA = 1e-5
+
+
+def _adjacencia_efetiva(G, indice, peso):
+    """
+    Adjacência não-direcionada {a: {b: w}} por posição no armazém; entre
+    arestas paralelas vale a menor, como no G.to_undirected().
+    """
+    adj = {k: {} for k in indice.values()}
+    for u, v, dados in G.edges(data=True):
+        if u == v:
+            continue
+        a, b = indice[u], indice[v]
+        w = float(dados.get(peso, 1.0))
+        if w < adj[a].get(b, np.inf):
+            adj[a][b] = w
+            adj[b][a] = w
+    return adj
+
+
+def _aplicar_no_grafo(G, alteracao, peso):
+    """Replica a alteração no próprio grafo, para mantê-lo coerente com a matriz."""
+    tipo, u, v = alteracao[0], alteracao[1], alteracao[2]
+    arestas = [(a, b, k) for a, b in ((u, v), (v, u)) if G.has_edge(a, b) for k in list(G[a][b])]
+    if tipo == 'inserir' or (tipo == 'alterar' and not arestas):
+        G.add_edge(u, v, **{peso: alteracao[3]})
+    elif tipo == 'remover':
+        for a, b, k in arestas:
+            G.remove_edge(a, b, key=k)
+    elif tipo == 'alterar':
+        for a, b, k in arestas:
+            G[a][b][k][peso] = alteracao[3]
+
+
+def _folga(valores):
+    return TOLERANCIA_RELATIVA * np.maximum(np.abs(valores), 1.0)
+
+
+def _mudou_nas_pontas(nova, s, a, b, du, dv):
+    """
+    A linha s mudou nas colunas a ou b? Toda linha que muda com a
+    alteração da aresta a-b muda em pelo menos uma das duas. No formato
+    triangular, gravar a linha de uma origem também reescreve a coluna dela
+    nas linhas seguintes, que já chegam com os valores novos; por isso a
+    comparação é com du e dv, lidas antes de qualquer escrita.
+    """
+    return bool(np.abs(nova[a] - du[s]) > _folga(du[s]) or np.abs(nova[b] - dv[s]) > _folga(dv[s]))
+
+
+def _reduzir_aresta(armazem, w_novo, a, b, du, dv):
+    """Aresta a-b ficou mais curta: relaxa as linhas das origens afetadas."""
+    afetadas = np.flatnonzero((du + w_novo < dv) | (dv + w_novo < du))
+    alteradas = 0
+    for s in afetadas:
+        antiga = armazem.ler_linha(s)
+        nova = np.minimum(antiga, np.minimum(du[s] + w_novo + dv, dv[s] + w_novo + du))
+        if np.any(nova < antiga) or _mudou_nas_pontas(nova, s, a, b, du, dv):
+            armazem.escrever_linhas(s, nova[None, :])
+            alteradas += 1
+    return alteradas
+
+
+def _aumentar_aresta(armazem, adj, w_antigo, a, b, du, dv):
+    """
+    Aresta a-b ficou mais longa (ou sumiu): para cada origem cujo caminho
+    mínimo usava a aresta, recalcula só os destinos afetados.
+    """
+    afetadas = np.flatnonzero(np.abs(du - dv) >= w_antigo - _folga(np.maximum(du, dv)))
+    alteradas = 0
+    for s in afetadas:
+        linha = armazem.ler_linha(s)
+        folga = _folga(linha)
+        # Destinos cujo caminho mínimo s -> x passava por a-b (em algum sentido)
+        pela_aresta = (np.abs(du[s] + w_antigo + dv - linha) <= folga) | \
+                      (np.abs(dv[s] + w_antigo + du - linha) <= folga)
+        afetados = np.flatnonzero(pela_aresta)
+        if len(afetados) == 0:
+            # Só as colunas já regravadas por outras linhas mudaram
+            alteradas += _mudou_nas_pontas(linha, s, a, b, du, dv)
+            continue
+        conjunto = set(afetados.tolist())
+
+        # Sementes: melhor chegada a cada destino afetado a partir de um
+        # vizinho NÃO afetado (cuja distância continua válida).
+        nova = linha.copy()
+        nova[afetados] = np.inf
+        heap = []
+        for x in conjunto:
+            melhor = np.inf
+            for y, w in adj[x].items():
+                if y not in conjunto and linha[y] + w < melhor:
+                    melhor = linha[y] + w
+            if x == s:
+                melhor = 0.0
+            if melhor < np.inf:
+                nova[x] = melhor
+                heap.append((melhor, x))
+        heapq.heapify(heap)
+
+        # Dijkstra restrito ao conjunto afetado
+        while heap:
+            d, x = heapq.heappop(heap)
+            if d > nova[x]:
+                continue
+            for y, w in adj[x].items():
+                if y in conjunto and d + w < nova[y]:
+                    nova[y] = d + w
+                    heapq.heappush(heap, (d + w, y))
+
+        if np.any(np.abs(nova - linha) > folga):
+            armazem.escrever_linhas(s, nova[None, :])
+            alteradas += 1
+        else:
+            alteradas += _mudou_nas_pontas(nova, s, a, b, du, dv)
+    return alteradas
+
+
+def atualizar_distancias(G, armazem, alteracoes, peso='length'):
+    """
+    Aplica uma lista de alterações de arestas ao grafo e à matriz de
+    distâncias, atualizando apenas as linhas afetadas.
+
+    Cada alteração é uma tupla:
+        ('inserir', u, v, comprimento)  -> nova rua entre u e v
+        ('remover', u, v)               -> rua entre u e v interditada
+        ('alterar', u, v, comprimento)  -> novo comprimento para a rua u-v
+
+    O 'armazem' deve estar aberto para escrita (modo 'r+'); 'G' também é
+    modificado. Retorna uma lista com, para cada alteração, o número de
+    linhas alteradas e o tempo gasto, ou None em caso de erro.
+    """
+    if not np.array_equal(armazem.linhas, armazem.colunas):
+        print("❌ Erro: A atualização incremental exige a matriz quadrada de todos os pares.")
+        return None
+
+    indice = armazem.indice_linhas
+    faltando = [node for node in G.nodes() if node not in indice]
+    if faltando:
+        print(f"❌ Erro: {len(faltando)} nós do grafo não estão na matriz de distâncias.")
+        return None
+
+    adj = _adjacencia_efetiva(G, indice, peso)
+    relatorio = []
+    for alteracao in alteracoes:
+        start_time = time.time()
+        tipo, u, v = alteracao[0], alteracao[1], alteracao[2]
+        if tipo not in ('inserir', 'remover', 'alterar'):
+            print(f"❌ Erro: Tipo de alteração desconhecido: '{tipo}'.")
+            return None
+        a, b = indice[u], indice[v]
+
+        w_antigo = adj[a].get(b, np.inf)
+        _aplicar_no_grafo(G, alteracao, peso)
+        if tipo == 'inserir':
+            w_novo = min(w_antigo, float(alteracao[3]))
+        elif tipo == 'remover':
+            w_novo = np.inf
+        else:
+            w_novo = float(alteracao[3])
+
+        if w_novo < np.inf:
+            adj[a][b] = adj[b][a] = w_novo
+        else:
+            adj[a].pop(b, None)
+            adj[b].pop(a, None)
+
+        # Linhas de u e v ANTES da alteração (a matriz é simétrica)
+        du, dv = armazem.ler_linha(a), armazem.ler_linha(b)
+        if w_novo < w_antigo:
+            alteradas = _reduzir_aresta(armazem, w_novo, a, b, du, dv)
+        elif w_novo > w_antigo:
+            alteradas = _aumentar_aresta(armazem, adj, w_antigo, a, b, du, dv)
+        else:
+            alteradas = 0
+
+        armazem.flush()
+        tempo = time.time() - start_time
+        print(f"{tipo} {u}-{v}: {alteradas} linhas alteradas em {tempo:.2f} segundos.")
+        relatorio.append({'alteracao': alteracao, 'linhas_alteradas': alteradas, 'tempo': tempo})
+
+    return relatorio
+
+
+if __name__ == "__main__":
+    import osmnx as ox
+
+    ARQUIVO_GRAFO = os.path.join('Arquivos', 'sao_carlos_grafo_preciso.graphml')
+    CAMINHO_ARMAZEM = os.path.join('Arquivos', 'matriz_distancias')
+    # O cenário é gravado em uma cópia, preservando a matriz original
+    CAMINHO_CENARIO = os.path.join('Arquivos', 'matriz_distancias_cenario')
+    ARQUIVO_GRAFO_CENARIO = os.path.join('Arquivos', 'sao_carlos_grafo_cenario.graphml')
+
+    # Exemplo: ('remover', u, v), ('inserir', u, v, 350.0), ('alterar', u, v, 120.0)
+    ALTERACOES = []
+
+    if not os.path.exists(ARQUIVO_GRAFO) or not existe_armazem(CAMINHO_ARMAZEM):
+        print("❌ Erro: Grafo ou matriz de distâncias não encontrados.")
+    elif not ALTERACOES:
+        print("Nenhuma alteração definida em ALTERACOES.")
+    else:
+        G = ox.load_graphml(ARQUIVO_GRAFO)
+        armazem = copiar_armazem(CAMINHO_ARMAZEM, CAMINHO_CENARIO)
+        relatorio = atualizar_distancias(G, armazem, ALTERACOES)
+        if relatorio is not None:
+            total = sum(r['linhas_alteradas'] for r in relatorio)
+            print(f"\n✅ {total} linhas atualizadas de {armazem.n_linhas}. Cenário salvo em '{CAMINHO_CENARIO}'.")
+            ox.save_graphml(G, filepath=ARQUIVO_GRAFO_CENARIO)
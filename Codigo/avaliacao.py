@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Avaliação de uma localização sem matriz de distâncias e sem solver.
+
+Dados os nós dos hospitais, um único Dijkstra com várias origens
+(min_only do SciPy, O(E log V)) dá, para cada nó do grafo, a distância
+até o hospital mais próximo e qual é esse hospital. Daí saem a área de
+captação de cada hospital (os nós atribuídos a ele e a população
+somada), o objetivo da p-mediana e, opcionalmente, os polígonos das
+áreas de captação: as células de Voronoi dos nós, unidas por hospital e
+recortadas pelo contorno do grafo.
+"""
+import time
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from scipy.sparse.csgraph import dijkstra
+
+from alocacao_populacao import celulas_voronoi_ordenadas
+from calculo_distancias import grafo_para_csr
+
+
+class AvaliacaoLocalizacao:
+    """
+    Hospital mais próximo e distância de cada nó do grafo.
+
+    'atribuicao' é a posição do hospital em 'hospitais' (-1 nos nós sem
+    caminho até nenhum hospital, com distância inf).
+    """
+
+    def __init__(self, nos, hospitais, atribuicao, distancia, populacao):
+        self.nos = nos
+        self.hospitais = hospitais
+        self.atribuicao = atribuicao
+        self.distancia = distancia
+        self.populacao = populacao
+
+    @property
+    def alcancavel(self):
+        return self.atribuicao >= 0
+
+    @property
+    def objetivo(self):
+        """População x distância ao hospital mais próximo (só nós alcançáveis)."""
+        return float(self.populacao[self.alcancavel] @ self.distancia[self.alcancavel])
+
+    @property
+    def populacao_sem_acesso(self):
+        return float(self.populacao[~self.alcancavel].sum())
+
+    @property
+    def distancia_media(self):
+        alcancada = self.populacao[self.alcancavel].sum()
+        return self.objetivo / alcancada if alcancada > 0 else float('nan')
+
+    @property
+    def captacao(self):
+        """População atribuída a cada hospital (na ordem de 'hospitais')."""
+        return np.bincount(self.atribuicao[self.alcancavel], weights=self.populacao[self.alcancavel],
+                           minlength=len(self.hospitais))
+
+    def hospital_atribuido(self):
+        """Lista com o nó do hospital de cada nó (None sem acesso)."""
+        return [self.hospitais[a] if a >= 0 else None for a in self.atribuicao.tolist()]
+
+    def posicoes_e_distancias(self, nos):
+        """(posição do hospital em 'hospitais' ou -1, distância) de cada nó de 'nos'."""
+        indice = {node: k for k, node in enumerate(self.nos)}
+        posicao = np.array([indice[node] for node in nos], dtype=np.int64)
+        return self.atribuicao[posicao], self.distancia[posicao]
+
+    def atribuicao_de(self, nos):
+        """(hospital, distância) de cada nó de 'nos', sem percorrer o grafo."""
+        atribuicao, distancia = self.posicoes_e_distancias(nos)
+        return [self.hospitais[a] if a >= 0 else None for a in atribuicao.tolist()], distancia
+
+    def tabela(self):
+        """DataFrame com nó, hospital atribuído, distância e população."""
+        return pd.DataFrame({'no': self.nos, 'hospital': self.hospital_atribuido(), 'distancia': self.distancia,
+                             'populacao': self.populacao})
+
+    def resumo_hospitais(self):
+        """DataFrame por hospital: nós e população da captação, distância média e máxima."""
+        ok = self.alcancavel
+        h = len(self.hospitais)
+        atribuicao, distancia, populacao = self.atribuicao[ok], self.distancia[ok], self.populacao[ok]
+        captacao = np.bincount(atribuicao, weights=populacao, minlength=h)
+        custo = np.bincount(atribuicao, weights=populacao * distancia, minlength=h)
+        distancia_maxima = np.zeros(h)
+        np.maximum.at(distancia_maxima, atribuicao[populacao > 0], distancia[populacao > 0])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            distancia_media = custo / captacao
+        return pd.DataFrame({'hospital': self.hospitais, 'nos': np.bincount(atribuicao, minlength=h),
+                             'populacao': captacao, 'distancia_media': distancia_media,
+                             'distancia_maxima': distancia_maxima})
+
+
+def avaliar_localizacao(G, hospitais, populacoes=None, peso='length', csr=None, msg=True):
+    """
+    Atribui cada nó do grafo ao hospital mais próximo pela malha viária.
+
+    'hospitais' são nós do grafo; 'populacoes' ({nó: pop}, opcional) dá os
+    pesos do objetivo e das captações. 'csr' é o (A, nos) de
+    grafo_para_csr, para quem avalia várias vezes no mesmo grafo. Retorna
+    uma AvaliacaoLocalizacao.
+    """
+    start_time = time.time()
+    A, nos = csr if csr is not None else grafo_para_csr(G, peso=peso)
+    indice = {node: k for k, node in enumerate(nos)}
+    hospitais = list(dict.fromkeys(hospitais))
+    fontes = np.array([indice[h] for h in hospitais], dtype=np.int64)
+    distancia, _, origem = dijkstra(A, directed=True, indices=fontes, min_only=True, return_predecessors=True)
+
+    # 'origem' é a posição no grafo do hospital que alcançou cada nó (-9999 sem caminho)
+    posicao = np.full(len(nos), -1, dtype=np.int64)
+    posicao[fontes] = np.arange(len(fontes))
+    atribuicao = np.where(origem >= 0, posicao[np.maximum(origem, 0)], -1)
+    if populacoes is None:
+        populacao = np.zeros(len(nos))
+    else:
+        populacao = np.array([populacoes.get(node, 0) for node in nos], dtype=np.float64)
+
+    avaliacao = AvaliacaoLocalizacao(nos, hospitais, atribuicao, distancia, populacao)
+    if not msg:
+        return avaliacao
+    print(f"Avaliação de {len(hospitais)} hospitais em {len(nos)} nós: {time.time() - start_time:.2f} segundos.")
+    if populacoes is not None:
+        print(f"Custo: {avaliacao.objetivo:,.2f} ({avaliacao.distancia_media:.1f} m por habitante).")
+        if avaliacao.populacao_sem_acesso > 0:
+            print(f"⚠️ {avaliacao.populacao_sem_acesso:,.0f} habitantes sem caminho até nenhum hospital.")
+    return avaliacao
+
+
+def coordenadas_nos(G, nos):
+    """Matriz (n x 2) com x e y de cada nó de 'nos'."""
+    if hasattr(G, 'indice'):
+        posicao = np.array([G.indice[node] for node in nos], dtype=np.int64)
+        return np.column_stack([np.asarray(G.x)[posicao], np.asarray(G.y)[posicao]]).astype(np.float64)
+    return np.array([(G.nodes[node]['x'], G.nodes[node]['y']) for node in nos], dtype=np.float64)
+
+
+def regioes_captacao(G, avaliacao):
+    """
+    Polígonos das áreas de captação: a célula de Voronoi de cada nó,
+    unida às dos outros nós do mesmo hospital e recortada pelo contorno
+    convexo do grafo. Retorna um GeoDataFrame (CRS do grafo) com o
+    hospital, a população e os nós de cada área.
+    """
+    xy = coordenadas_nos(G, avaliacao.nos)
+    contorno = shapely.convex_hull(shapely.multipoints(xy))
+    # Nós com as mesmas coordenadas dividem a célula (fica com o primeiro)
+    unicos, primeiro = np.unique(xy, axis=0, return_index=True)
+    if len(unicos) < 3:
+        celulas = np.full(len(unicos), contorno)
+    else:
+        celulas = shapely.intersection(celulas_voronoi_ordenadas(unicos, contorno), contorno)
+
+    dono = avaliacao.atribuicao[primeiro]
+    resumo = avaliacao.resumo_hospitais()
+    geometrias = [shapely.union_all(celulas[dono == h]) for h in range(len(avaliacao.hospitais))]
+    return gpd.GeoDataFrame({'hospital': resumo['hospital'], 'nos': resumo['nos'],
+                             'populacao': resumo['populacao'], 'distancia_media': resumo['distancia_media']},
+                            geometry=geometrias, crs=G.graph.get('crs'))
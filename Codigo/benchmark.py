@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark das etapas do projeto em grafos sintéticos parecidos com cidades.
+
+Gera, sem internet, malhas em grade (quarteirões de 100 m) e grades
+perturbadas (nós deslocados e diagonais aleatórias, ainda planares) de
+1 mil a 200 mil nós, com populações aleatórias (a maioria dos nós vazia,
+como nos dados do censo). Para cada grafo mede o tempo e o pico de memória
+(RSS) de cada etapa:
+- difusao: operador de vizinhança + difusão + arredondamento (3_difusao);
+- distancias: Dijkstra demanda x candidatos para o armazém (4_distancias);
+- montagem: construção do modelo de p-medianas em matrizes esparsas;
+- resolucao: relaxação linear com restrições geradas sob demanda (5_final);
+- heuristica: gulosa + trocas (5.1_final_simp, MOTOR='heuristica');
+- exportacao: CSV de resultados (5_final).
+
+O modelo usa no máximo 'max_demanda_modelo' nós de demanda e
+'max_candidatos_modelo' candidatos (os mais populosos), para que a
+resolução caiba no tempo de um benchmark em todas as escalas (grades
+regulares são o pior caso da relaxação linear: há empates demais).
+
+O resultado vai para um JSON (ambiente, parâmetros e medidas). Comparado
+com o JSON de uma execução anterior, as etapas que ficaram mais lentas (ou
+gastaram mais memória) que a tolerância são marcadas como regressão.
+"""
+import importlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import networkx as nx
+import numpy as np
+
+from armazem_distancias import abrir_armazem
+from calculo_distancias import calcular_distancias_restritas
+from grafo_compacto import gravar_grafo_compacto
+from heuristica_p_mediana import resolver_p_mediana_heuristica
+from instrumentacao import descrever_ambiente, medir
+from modelo_matricial import construir_modelo_p_mediana, resolver_p_mediana_preguicoso
+from motor_difusao import arredondar_conservando, construir_operador_difusao, difundir
+
+PASTA_BENCHMARKS = os.path.join('Arquivos', 'benchmarks')
+ESPACAMENTO_M = 100.0
+
+
+# --- Grafos sintéticos ---
+
+def grafo_sintetico(n_nos, tipo='grade', semente=0):
+    """
+    MultiDiGraph projetado (metros) com ~n_nos nós em grade de lado
+    ESPACAMENTO_M, com as duas direções de cada rua, como os do OSMnx.
+    tipo='perturbado' desloca os nós até 30% do quarteirão e acrescenta uma
+    diagonal em 20% dos quarteirões (no máximo uma por quarteirão: o grafo
+    continua planar e conexo).
+    """
+    rng = np.random.default_rng(semente)
+    lado = int(np.ceil(np.sqrt(n_nos)))
+    ids = np.arange(lado * lado).reshape(lado, lado)
+    x, y = np.meshgrid(np.arange(lado) * ESPACAMENTO_M, np.arange(lado) * ESPACAMENTO_M)
+    x, y = x.astype(np.float64).ravel(), y.astype(np.float64).ravel()
+
+    pares = [np.column_stack([ids[:, :-1].ravel(), ids[:, 1:].ravel()]),
+             np.column_stack([ids[:-1, :].ravel(), ids[1:, :].ravel()])]
+    if tipo == 'perturbado':
+        x += rng.uniform(-0.3, 0.3, len(x)) * ESPACAMENTO_M
+        y += rng.uniform(-0.3, 0.3, len(y)) * ESPACAMENTO_M
+        quarteiroes = ids[:-1, :-1].ravel()
+        com_diagonal = quarteiroes[rng.random(len(quarteiroes)) < 0.2]
+        pares.append(np.column_stack([com_diagonal, com_diagonal + lado + 1]))
+    elif tipo != 'grade':
+        raise ValueError(f"Tipo de grafo sintético desconhecido: '{tipo}'.")
+    pares = np.concatenate(pares)
+    comprimentos = np.hypot(x[pares[:, 0]] - x[pares[:, 1]], y[pares[:, 0]] - y[pares[:, 1]])
+
+    G = nx.MultiDiGraph(crs='EPSG:31983')
+    G.add_nodes_from((int(k), {'x': float(x[k]), 'y': float(y[k])}) for k in range(len(x)))
+    G.add_edges_from((int(u), int(v), {'length': float(c)}) for (u, v), c in zip(pares, comprimentos))
+    G.add_edges_from((int(v), int(u), {'length': float(c)}) for (u, v), c in zip(pares, comprimentos))
+    return G
+
+
+def populacoes_sinteticas(nos, semente=0, fracao_habitada=0.3):
+    """População aleatória: ~30% dos nós habitados, com cauda longa (lognormal)."""
+    rng = np.random.default_rng(semente + 1)
+    habitados = rng.random(len(nos)) < fracao_habitada
+    valores = np.where(habitados, np.ceil(rng.lognormal(4.0, 1.0, len(nos))), 0).astype(np.int64)
+    return dict(zip(nos, valores.tolist()))
+
+
+# --- Etapas ---
+
+def _executar_escala(n_nos, tipo, parametros, pasta_trabalho):
+    repeticoes = parametros['repeticoes']
+    print(f"\n=== {tipo}, {n_nos:,} nós ===")
+    start_time = time.time()
+    G = grafo_sintetico(n_nos, tipo, parametros['semente'])
+    nos = list(G.nodes())
+    populacoes = populacoes_sinteticas(nos, parametros['semente'])
+    caminho_grafo = os.path.join(pasta_trabalho, f'grafo_{tipo}_{n_nos}')
+    grafo = gravar_grafo_compacto(G, caminho_grafo, populacoes)
+    del G
+    print(f"Grafo sintético: {grafo.n_nos:,} nós, {grafo.n_arestas:,} arestas "
+          f"(gerado em {time.time() - start_time:.2f} s).")
+
+    info = {'tipo': tipo, 'n_nos_pedido': n_nos, 'n_nos': grafo.n_nos, 'n_arestas': grafo.n_arestas}
+    etapas = {}
+
+    def difusao():
+        A, graus, ordem = construir_operador_difusao(grafo)
+        vetor = np.array([populacoes[node] for node in ordem], dtype=np.float64)
+        resultado = difundir(A, graus, vetor, parametros['numero_de_iteracoes'], [parametros['fator_de_retencao']])
+        return arredondar_conservando(ordem, resultado[:, 0], int(vetor.sum()))
+    suavizadas, etapas['difusao'] = medir(difusao, repeticoes)
+
+    # Candidatos: os mais populosos após a difusão; demanda: todos os habitados
+    ordem_pop = sorted(suavizadas, key=suavizadas.get, reverse=True)
+    candidatos = ordem_pop[:min(parametros['n_candidatos'], len(ordem_pop))]
+    demanda = [node for node in ordem_pop if suavizadas[node] > 0]
+    caminho_armazem = os.path.join(pasta_trabalho, f'distancias_{tipo}_{n_nos}')
+    _, etapas['distancias'] = medir(
+        lambda: calcular_distancias_restritas(grafo, demanda, candidatos, caminho_armazem), repeticoes)
+    info.update({'n_demanda': len(demanda), 'n_candidatos': len(candidatos)})
+
+    # O modelo usa só os nós de demanda mais populosos (ver docstring)
+    demanda_modelo = demanda[:parametros['max_demanda_modelo']]
+    candidatos = candidatos[:parametros['max_candidatos_modelo']]
+    D = abrir_armazem(caminho_armazem).submatriz(demanda_modelo, candidatos)
+    pesos = np.array([suavizadas[node] for node in demanda_modelo], dtype=np.float64)
+    n_hospitais = parametros['n_hospitais']
+    modelo, etapas['montagem'] = medir(lambda: construir_modelo_p_mediana(pesos, D, n_hospitais), repeticoes)
+    info['modelo'] = {'n_demanda': len(demanda_modelo), 'n_candidatos': len(candidatos),
+                      'variaveis': int(modelo.n_variaveis), 'restricoes': int(modelo.n_restricoes), 'nao_nulos': int(modelo.A.nnz)}
+    del modelo
+
+    (x, objetivo, status, rodadas), etapas['resolucao'] = medir(
+        lambda: resolver_p_mediana_preguicoso(pesos, D, n_hospitais), repeticoes)
+    etapas['resolucao'].update({'status': status, 'objetivo': objetivo, 'rodadas': len(rodadas)})
+
+    (_, objetivo_heuristica, trocas), etapas['heuristica'] = medir(
+        lambda: resolver_p_mediana_heuristica(pesos, D, n_hospitais), repeticoes)
+    etapas['heuristica'].update({'objetivo': objetivo_heuristica, 'trocas': trocas})
+
+    if x is not None:
+        resultados = {j: float(x[b]) for b, j in enumerate(candidatos)}
+        exportar = importlib.import_module('5_final').exportar_resultados_csv
+        diretorio_atual = os.getcwd()
+        os.chdir(pasta_trabalho)
+        try:
+            _, etapas['exportacao'] = medir(lambda: exportar(grafo, resultados), repeticoes)
+        finally:
+            os.chdir(diretorio_atual)
+
+    for nome, medida in etapas.items():
+        print(f"  {nome:<11} {medida['tempo_s']:9.3f} s   pico {medida['pico_memoria_mb']:9.1f} MB")
+    info['etapas'] = etapas
+    return info
+
+
+def executar_benchmark(escalas, tipos, parametros):
+    """Roda todas as combinações (escala, tipo) e retorna o registro completo."""
+    pasta_trabalho = tempfile.mkdtemp(prefix='benchmark_')
+    try:
+        resultados = [_executar_escala(n, tipo, parametros, pasta_trabalho) for n in escalas for tipo in tipos]
+    finally:
+        shutil.rmtree(pasta_trabalho, ignore_errors=True)
+    return {'ambiente': descrever_ambiente(), 'parametros': parametros, 'resultados': resultados}
+
+
+def comparar(atual, referencia, tolerancia_tempo=0.2, tolerancia_memoria=0.2, tempo_minimo_s=0.05):
+    """
+    Compara dois registros de benchmark, etapa a etapa (mesmo tipo e
+    escala). Uma etapa é regressão se ficou mais que 'tolerancia_*' mais
+    lenta (tempo mediano) ou mais pesada; etapas abaixo de 'tempo_minimo_s'
+    são ruidosas demais e não entram na comparação de tempo.
+    Retorna a lista de regressões.
+    """
+    anteriores = {(r['tipo'], r['n_nos_pedido']): r['etapas'] for r in referencia['resultados']}
+    regressoes = []
+    for r in atual['resultados']:
+        etapas_ref = anteriores.get((r['tipo'], r['n_nos_pedido']))
+        if etapas_ref is None:
+            continue
+        for nome, medida in r['etapas'].items():
+            ref = etapas_ref.get(nome)
+            if ref is None:
+                continue
+            razao_tempo = medida['tempo_s'] / max(ref['tempo_s'], 1e-9)
+            razao_memoria = (medida['pico_memoria_mb'] + 1) / (ref['pico_memoria_mb'] + 1)
+            lento = max(medida['tempo_s'], ref['tempo_s']) >= tempo_minimo_s and razao_tempo > 1 + tolerancia_tempo
+            pesado = razao_memoria > 1 + tolerancia_memoria and medida['pico_memoria_mb'] - ref['pico_memoria_mb'] > 10
+            marca = '⚠️ ' if lento or pesado else '   '
+            print(f"{marca}{r['tipo']:<10} {r['n_nos_pedido']:>8,} {nome:<11} "
+                  f"tempo x{razao_tempo:5.2f}   memória x{razao_memoria:5.2f}")
+            if lento or pesado:
+                regressoes.append({'tipo': r['tipo'], 'n_nos': r['n_nos_pedido'], 'etapa': nome,
+                                   'razao_tempo': razao_tempo, 'razao_memoria': razao_memoria})
+    return regressoes
+
+
+# --- Execução Principal ---
+if __name__ == "__main__":
+    # --- PARÂMETROS ---
+    ESCALAS = [1_000, 10_000, 50_000, 200_000]
+    TIPOS = ['grade', 'perturbado']
+    PARAMETROS = {
+        'semente': 0,
+        'repeticoes': 3,
+        'numero_de_iteracoes': 3,
+        'fator_de_retencao': 0.4,
+        'n_candidatos': 300,
+        'max_demanda_modelo': 300,
+        'max_candidatos_modelo': 50,
+        'n_hospitais': 9,
+    }
+    # JSON de uma execução anterior para detectar regressões (ou None)
+    ARQUIVO_REFERENCIA = None
+    TOLERANCIA = 0.2
+
+    start_time = time.time()
+    registro = executar_benchmark(ESCALAS, TIPOS, PARAMETROS)
+    os.makedirs(PASTA_BENCHMARKS, exist_ok=True)
+    arquivo_saida = os.path.join(PASTA_BENCHMARKS, f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(arquivo_saida, 'w', encoding='utf-8') as f:
+        json.dump(registro, f, indent=2, ensure_ascii=False)
+    print(f"\n✅ Benchmark concluído em {time.time() - start_time:.1f} segundos; resultados em '{arquivo_saida}'.")
+
+    if ARQUIVO_REFERENCIA:
+        with open(ARQUIVO_REFERENCIA, 'r', encoding='utf-8') as f:
+            referencia = json.load(f)
+        print(f"\nComparando com '{ARQUIVO_REFERENCIA}' (tolerância de {TOLERANCIA:.0%})...")
+        regressoes = comparar(registro, referencia, TOLERANCIA, TOLERANCIA)
+        if regressoes:
+            print(f"❌ {len(regressoes)} regressão(ões) encontrada(s).")
+            sys.exit(1)
+        print("✅ Nenhuma regressão.")
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Cache persistente das consultas ao OpenStreetMap (geocodificação e
+download de grafos), para rodar os scripts sem internet.
+
+Cada resposta é gravada em 'Arquivos/cache_osm/' com uma chave calculada
+a partir do que define a consulta: o texto consultado (ou o polígono), o
+'network_type' e o 'simplify'. Geocodificações viram GeoJSON e grafos
+viram GraphML; 'indice.json' lista o que há no cache e quando foi baixado.
+
+Quem responde às faltas é o backend:
+- BackendOSMnx (padrão): consulta o OpenStreetMap pelo OSMnx e grava a
+  resposta no cache;
+- BackendArquivos: substituto offline que só responde com respostas já
+  gravadas numa pasta (por exemplo, um cache copiado de uma máquina com
+  internet para os servidores sem acesso externo). Uma consulta que não
+  está lá gera um LookupError, em vez de uma tentativa de conexão.
+
+As estatísticas de acertos e faltas por tipo de consulta ficam no próprio
+CacheOSM (resumo() / imprimir_estatisticas()).
+"""
+import hashlib
+import json
+import os
+import time
+
+import geopandas as gpd
+import osmnx as ox
+import shapely
+
+PASTA_CACHE_OSM = os.path.join('Arquivos', 'cache_osm')
+EXTENSOES = {'geocodificacao': '.geojson', 'grafo_poligono': '.graphml', 'grafo_lugar': '.graphml'}
+
+
+def _normalizar_consulta(consulta):
+    return ' '.join(str(consulta).split())
+
+
+def _chave(tipo, campos):
+    texto = json.dumps({'tipo': tipo, **campos}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()[:20]
+
+
+def _campos_poligono(poligono):
+    # Coordenadas arredondadas (~1 cm) e anéis em ordem canônica: o mesmo
+    # polígono obtido de duas formas dá a mesma chave
+    poligono = shapely.normalize(shapely.set_precision(poligono, 1e-7))
+    return {'poligono_sha256': hashlib.sha256(shapely.to_wkb(poligono)).hexdigest()}
+
+
+def _gravar_atomico(caminho, gravar):
+    """Grava num arquivo temporário e renomeia: outro processo nunca lê um arquivo pela metade."""
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    gravar(temporario)
+    os.replace(temporario, caminho)
+
+
+class BackendOSMnx:
+    """Consulta o OpenStreetMap (Nominatim e Overpass) pelo OSMnx."""
+
+    nome = 'osmnx'
+
+    def geocodificar(self, consulta):
+        return ox.geocode_to_gdf(consulta)
+
+    def grafo_poligono(self, poligono, network_type, simplify):
+        return ox.graph_from_polygon(poligono, network_type=network_type, simplify=simplify)
+
+    def grafo_lugar(self, lugar, network_type, simplify):
+        return ox.graph_from_place(lugar, network_type=network_type, simplify=simplify)
+
+
+class BackendArquivos:
+    """Substituto offline: responde só com as respostas gravadas em 'pasta'."""
+
+    nome = 'arquivos'
+
+    def __init__(self, pasta=PASTA_CACHE_OSM):
+        self.pasta = pasta
+        self._cache = CacheOSM(pasta, backend=None)
+
+    def geocodificar(self, consulta):
+        return self._cache.geocodificar(consulta)
+
+    def grafo_poligono(self, poligono, network_type, simplify):
+        return self._cache.grafo_poligono(poligono, network_type, simplify)
+
+    def grafo_lugar(self, lugar, network_type, simplify):
+        return self._cache.grafo_lugar(lugar, network_type, simplify)
+
+
+class CacheOSM:
+    """
+    Consultas ao OpenStreetMap com cache em disco. Com backend=None, uma
+    falta gera LookupError (só o que já está na pasta é respondido).
+    """
+
+    def __init__(self, pasta=PASTA_CACHE_OSM, backend='osmnx'):
+        self.pasta = pasta
+        self.backend = BackendOSMnx() if backend == 'osmnx' else backend
+        self.estatisticas = {tipo: {'acertos': 0, 'faltas': 0} for tipo in EXTENSOES}
+
+    def _arquivo(self, tipo, chave):
+        return os.path.join(self.pasta, f"{tipo}_{chave}{EXTENSOES[tipo]}")
+
+    def _obter(self, tipo, campos, consultar):
+        chave = _chave(tipo, campos)
+        arquivo = self._arquivo(tipo, chave)
+        if os.path.exists(arquivo):
+            self.estatisticas[tipo]['acertos'] += 1
+            return _ler(tipo, arquivo)
+
+        self.estatisticas[tipo]['faltas'] += 1
+        if self.backend is None:
+            raise LookupError(f"A consulta {campos} ({tipo}) não está no cache '{self.pasta}' e o modo é offline.")
+        start_time = time.time()
+        resposta = consultar(self.backend)
+        os.makedirs(self.pasta, exist_ok=True)
+        _gravar_atomico(arquivo, lambda caminho: _gravar(tipo, resposta, caminho))
+        self._registrar(chave, tipo, campos, arquivo, time.time() - start_time)
+        # Devolve o que foi gravado: com ou sem internet, a resposta é a mesma
+        return _ler(tipo, arquivo)
+
+    def _registrar(self, chave, tipo, campos, arquivo, segundos):
+        indice = self.indice()
+        indice[chave] = {'tipo': tipo, **campos, 'arquivo': os.path.basename(arquivo),
+                         'backend': getattr(self.backend, 'nome', type(self.backend).__name__),
+                         'data': time.strftime('%Y-%m-%dT%H:%M:%S'), 'tempo_s': round(segundos, 3),
+                         'osmnx': ox.__version__}
+
+        def gravar(caminho):
+            with open(caminho, 'w', encoding='utf-8') as f:
+                json.dump(indice, f, indent=2, ensure_ascii=False)
+
+        _gravar_atomico(os.path.join(self.pasta, 'indice.json'), gravar)
+
+    def indice(self):
+        """Conteúdo de 'indice.json': {chave: consulta, arquivo e data do download}."""
+        arquivo = os.path.join(self.pasta, 'indice.json')
+        if not os.path.exists(arquivo):
+            return {}
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    # --- Consultas ---
+
+    def geocodificar(self, consulta):
+        """Como ox.geocode_to_gdf(consulta)."""
+        consulta = _normalizar_consulta(consulta)
+        return self._obter('geocodificacao', {'consulta': consulta}, lambda b: b.geocodificar(consulta))
+
+    def grafo_poligono(self, poligono, network_type='drive', simplify=True):
+        """Como ox.graph_from_polygon(poligono, network_type=..., simplify=...)."""
+        campos = dict(_campos_poligono(poligono), network_type=network_type, simplify=bool(simplify))
+        return self._obter('grafo_poligono', campos, lambda b: b.grafo_poligono(poligono, network_type, simplify))
+
+    def grafo_lugar(self, lugar, network_type='drive', simplify=True):
+        """Como ox.graph_from_place(lugar, network_type=..., simplify=...)."""
+        lugar = _normalizar_consulta(lugar)
+        campos = {'consulta': lugar, 'network_type': network_type, 'simplify': bool(simplify)}
+        return self._obter('grafo_lugar', campos, lambda b: b.grafo_lugar(lugar, network_type, simplify))
+
+    # --- Estatísticas ---
+
+    def resumo(self):
+        acertos = sum(e['acertos'] for e in self.estatisticas.values())
+        faltas = sum(e['faltas'] for e in self.estatisticas.values())
+        return {'acertos': acertos, 'faltas': faltas,
+                'taxa_acerto': acertos / (acertos + faltas) if acertos + faltas else None,
+                'por_tipo': {tipo: dict(e) for tipo, e in self.estatisticas.items() if e['acertos'] or e['faltas']}}
+
+    def imprimir_estatisticas(self):
+        resumo = self.resumo()
+        if not resumo['por_tipo']:
+            return
+        print(f"\nCache do OSM ('{self.pasta}', backend '{getattr(self.backend, 'nome', 'nenhum')}'): "
+              f"{resumo['acertos']} acertos, {resumo['faltas']} faltas.")
+        for tipo, e in resumo['por_tipo'].items():
+            print(f"  {tipo:<16} {e['acertos']:4d} acertos {e['faltas']:4d} faltas")
+
+
+def _ler(tipo, arquivo):
+    if tipo == 'geocodificacao':
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            dados = json.load(f)
+        return gpd.GeoDataFrame.from_features(dados['features'], crs='EPSG:4326')
+    return ox.load_graphml(arquivo)
+
+
+def _gravar(tipo, resposta, caminho):
+    if tipo == 'geocodificacao':
+        with open(caminho, 'w', encoding='utf-8') as f:
+            f.write(resposta.to_crs(epsg=4326).to_json(drop_id=True))
+    else:
+        ox.save_graphml(resposta, filepath=caminho)
+
+
+# Cache compartilhado pelos scripts de um mesmo processo (as estatísticas se acumulam)
+_padrao = {'cache': None, 'configuracao': None}
+
+
+def cache_padrao(offline=False, pasta=PASTA_CACHE_OSM, pasta_respostas=None):
+    """
+    Cache usado pelos scripts. Com offline=True, as faltas são respondidas
+    só pelo BackendArquivos de 'pasta_respostas' (sem ela, nenhuma falta é
+    respondida).
+    """
+    configuracao = (offline, pasta, pasta_respostas)
+    if _padrao['configuracao'] != configuracao:
+        if not offline:
+            backend = 'osmnx'
+        else:
+            backend = BackendArquivos(pasta_respostas) if pasta_respostas else None
+        _padrao['cache'] = CacheOSM(pasta, backend=backend)
+        _padrao['configuracao'] = configuracao
+    return _padrao['cache']
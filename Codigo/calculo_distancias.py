@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Funções de cálculo de caminhos mínimos usadas pelo '4_distancias.py'.
+
+O grafo do OSMnx é convertido para uma matriz de adjacência esparsa (CSR)
+e os caminhos mínimos são calculados com o Dijkstra do SciPy, que roda em
+código compilado e aceita várias origens de uma vez.
+"""
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import shutil
+import time
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import dijkstra
+
+from armazem_distancias import abrir_armazem, criar_armazem, existe_armazem, FORMATO_TRIANGULAR
+
+# Quantidade de origens processadas por chamada do Dijkstra; limita a
+# memória temporária a TAMANHO_BLOCO x n floats.
+TAMANHO_BLOCO = 256
+
+
+def csr_nao_direcionado(origens, destinos, comprimentos, n):
+    """
+    Monta a matriz de adjacência CSR não-direcionada (n x n) a partir de uma
+    lista de arestas em posições 0..n-1.
+
+    Equivale a G.to_undirected(): cada rua pode ser percorrida nos dois
+    sentidos e, entre arestas paralelas, vale a de menor comprimento.
+    """
+    origens = np.asarray(origens, dtype=np.int64)
+    destinos = np.asarray(destinos, dtype=np.int64)
+    comprimentos = np.asarray(comprimentos, dtype=np.float64)
+
+    # Os dois sentidos de cada aresta; laços (u == v) não encurtam caminhos
+    linhas = np.concatenate([origens, destinos])
+    colunas = np.concatenate([destinos, origens])
+    pesos = np.concatenate([comprimentos, comprimentos])
+    manter = linhas != colunas
+    linhas, colunas, pesos = linhas[manter], colunas[manter], pesos[manter]
+
+    # Entre arestas paralelas fica a menor (o CSR somaria as duplicatas)
+    ordem = np.lexsort((pesos, colunas, linhas))
+    linhas, colunas, pesos = linhas[ordem], colunas[ordem], pesos[ordem]
+    primeira = np.ones(len(linhas), dtype=bool)
+    primeira[1:] = (linhas[1:] != linhas[:-1]) | (colunas[1:] != colunas[:-1])
+
+    # Arestas de comprimento zero continuam sendo arestas no csgraph
+    return sp.csr_matrix((pesos[primeira], (linhas[primeira], colunas[primeira])), shape=(n, n))
+
+
+def grafo_para_csr(G, nos=None, peso='length'):
+    """
+    Converte o grafo em uma matriz de adjacência CSR não-direcionada
+    (ver csr_nao_direcionado). Aceita também um GrafoCompacto
+    (grafo_compacto.py), que já guarda as arestas em CSR.
+
+    Retorna (A, nos), onde 'nos' define a ordem das linhas/colunas.
+    """
+    if hasattr(G, 'matriz_adjacencia') and nos is None and peso == 'length':
+        return G.matriz_adjacencia(), list(G.ids)
+
+    if nos is None:
+        nos = list(G.nodes())
+    indice = {node: k for k, node in enumerate(nos)}
+
+    origens, destinos, comprimentos = [], [], []
+    for u, v, dados in G.edges(data=True):
+        origens.append(indice[u])
+        destinos.append(indice[v])
+        comprimentos.append(float(dados.get(peso, 1.0)))
+
+    return csr_nao_direcionado(origens, destinos, comprimentos, len(nos)), nos
+
+
+def calcular_distancias_restritas(G, demanda, candidatos, caminho_base, peso='length'):
+    """
+    Calcula apenas as distâncias demanda x candidatos e as grava como uma
+    matriz retangular no armazém (linhas = demanda, colunas = candidatos).
+
+    Como o grafo é tratado como não-direcionado, d(i, j) = d(j, i) e o
+    Dijkstra roda somente a partir do MENOR dos dois conjuntos: o custo cai
+    de O(N²) para O(N·min(|demanda|, |candidatos|)) em tempo e memória.
+    """
+    A, nos = grafo_para_csr(G, peso=peso)
+    indice = {node: k for k, node in enumerate(nos)}
+    idx_demanda = np.array([indice[i] for i in demanda], dtype=np.int64)
+    idx_candidatos = np.array([indice[j] for j in candidatos], dtype=np.int64)
+
+    a_partir_dos_candidatos = len(idx_candidatos) <= len(idx_demanda)
+    if a_partir_dos_candidatos:
+        fontes, alvos = idx_candidatos, idx_demanda
+    else:
+        fontes, alvos = idx_demanda, idx_candidatos
+    print(f"Dijkstra a partir dos {len(fontes)} nós de "
+          f"{'candidatos' if a_partir_dos_candidatos else 'demanda'} "
+          f"(matriz {len(idx_demanda)} x {len(idx_candidatos)})...")
+
+    start_time = time.time()
+    resultado = np.empty((len(fontes), len(alvos)), dtype=np.float32)
+    for inicio in range(0, len(fontes), TAMANHO_BLOCO):
+        bloco = fontes[inicio:inicio + TAMANHO_BLOCO]
+        resultado[inicio:inicio + len(bloco)] = dijkstra(A, directed=True, indices=bloco)[:, alvos]
+    if a_partir_dos_candidatos:
+        resultado = resultado.T
+
+    armazem = criar_armazem(caminho_base, list(demanda), list(candidatos))
+    armazem.escrever_linhas(0, resultado)
+    armazem.flush()
+    print(f"✅ Distâncias restritas calculadas em {time.time() - start_time:.2f} segundos.")
+    return armazem
+
+
+# --- Cálculo paralelo e retomável de todos os pares ---
+
+# Estado de cada processo trabalhador, preenchido uma única vez pelo
+# inicializador do pool (o grafo chega como três vetores do CSR, e não como
+# um grafo do NetworkX serializado a cada tarefa).
+_trabalhador = {}
+
+
+def _inicializar_trabalhador(indptr, indices, dados, n, caminho_base, pasta_checkpoints):
+    _trabalhador['A'] = sp.csr_matrix((dados, indices, indptr), shape=(n, n))
+    _trabalhador['armazem'] = abrir_armazem(caminho_base, modo='r+')
+    _trabalhador['pasta_checkpoints'] = pasta_checkpoints
+
+
+def _arquivo_checkpoint(pasta_checkpoints, inicio, fim):
+    return os.path.join(pasta_checkpoints, f'bloco_{inicio:09d}_{fim:09d}.ok')
+
+
+def _manifesto_checkpoints(A, triangular, tamanho_bloco):
+    """Identifica o cálculo: só se retoma com o mesmo grafo (arestas e pesos) e os mesmos blocos."""
+    impressao = hashlib.sha256()
+    for vetor in (A.indptr, A.indices, A.data):
+        impressao.update(np.ascontiguousarray(vetor).tobytes())
+    return {'grafo_sha256': impressao.hexdigest(), 'triangular': bool(triangular),
+            'tamanho_bloco': int(tamanho_bloco)}
+
+
+def _ler_manifesto(pasta_checkpoints):
+    try:
+        with open(os.path.join(pasta_checkpoints, 'manifesto.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _calcular_bloco(intervalo):
+    """Calcula as linhas [inicio, fim), grava no armazém e marca o bloco como concluído."""
+    inicio, fim = intervalo
+    bloco = dijkstra(_trabalhador['A'], directed=True, indices=np.arange(inicio, fim))
+    armazem = _trabalhador['armazem']
+    armazem.escrever_linhas(inicio, bloco)
+    armazem.flush()
+    # O marcador só é criado depois que as linhas estão no disco
+    open(_arquivo_checkpoint(_trabalhador['pasta_checkpoints'], inicio, fim), 'w').close()
+    return fim - inicio
+
+
+def _formatar_tempo(segundos):
+    minutos, segundos = divmod(int(segundos), 60)
+    horas, minutos = divmod(minutos, 60)
+    return f"{horas:d}h{minutos:02d}m{segundos:02d}s"
+
+
+def calcular_todos_pares_paralelo(G, caminho_base, n_processos=None, triangular=True,
+                                  tamanho_bloco=TAMANHO_BLOCO, peso='length'):
+    """
+    Calcula as distâncias entre TODOS os pares de nós distribuindo as origens
+    em blocos entre 'n_processos' processos (padrão: todos os núcleos).
+
+    Cada bloco concluído é gravado direto no armazém em disco e marcado em
+    '<caminho_base>_checkpoints/'. Se a execução for interrompida, rodar de
+    novo retoma dos blocos que faltam; a pasta de checkpoints é apagada ao
+    final, indicando que a matriz está completa.
+    """
+    if n_processos is None:
+        n_processos = os.cpu_count() or 1
+
+    A, nos = grafo_para_csr(G, peso=peso)
+    n = len(nos)
+    pasta_checkpoints = caminho_base + '_checkpoints'
+
+    # --- Retomar uma execução interrompida, se for compatível ---
+    # (mesmos nós, mesmas arestas e pesos, mesmo formato e tamanho de bloco)
+    manifesto = _manifesto_checkpoints(A, triangular, tamanho_bloco)
+    retomar = False
+    if os.path.isdir(pasta_checkpoints) and existe_armazem(caminho_base):
+        existente = abrir_armazem(caminho_base)
+        retomar = (np.array_equal(existente.linhas, np.asarray(nos))
+                   and (existente.formato == FORMATO_TRIANGULAR) == triangular
+                   and _ler_manifesto(pasta_checkpoints) == manifesto)
+        del existente
+        if not retomar:
+            print("Checkpoints de um cálculo diferente (grafo, formato ou blocos): recomeçando do zero.")
+    if not retomar:
+        shutil.rmtree(pasta_checkpoints, ignore_errors=True)
+        os.makedirs(pasta_checkpoints)
+        criar_armazem(caminho_base, nos, triangular=triangular)
+        with open(os.path.join(pasta_checkpoints, 'manifesto.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifesto, f, indent=2)
+
+    blocos = [(inicio, min(inicio + tamanho_bloco, n)) for inicio in range(0, n, tamanho_bloco)]
+    pendentes = [b for b in blocos if not os.path.exists(_arquivo_checkpoint(pasta_checkpoints, *b))]
+    linhas_pendentes = sum(fim - inicio for inicio, fim in pendentes)
+    if retomar:
+        print(f"Retomando: {len(blocos) - len(pendentes)} de {len(blocos)} blocos já estavam prontos.")
+    print(f"Calculando {linhas_pendentes} linhas em {len(pendentes)} blocos com {n_processos} processo(s)...")
+
+    start_time = time.time()
+    linhas_feitas = 0
+    initargs = (A.indptr, A.indices, A.data, n, caminho_base, pasta_checkpoints)
+    with mp.Pool(n_processos, initializer=_inicializar_trabalhador, initargs=initargs) as pool:
+        for linhas in pool.imap_unordered(_calcular_bloco, pendentes):
+            linhas_feitas += linhas
+            decorrido = time.time() - start_time
+            restante = decorrido / linhas_feitas * (linhas_pendentes - linhas_feitas)
+            print(f"\r  {linhas_feitas}/{linhas_pendentes} linhas "
+                  f"({100 * linhas_feitas / linhas_pendentes:.1f}%) | "
+                  f"decorrido {_formatar_tempo(decorrido)} | ETA {_formatar_tempo(restante)}",
+                  end='', flush=True)
+    print()
+
+    shutil.rmtree(pasta_checkpoints, ignore_errors=True)
+    tempo_total = time.time() - start_time
+    print(f"✅ Cálculo concluído em {tempo_total:.2f} segundos ({tempo_total/60:.2f} minutos).")
+    return abrir_armazem(caminho_base)
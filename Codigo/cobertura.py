@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+"""
+Modelos de cobertura: quanta população fica a até 'raio' metros (pela
+malha viária) de um hospital.
+
+Em vez da matriz de distâncias completa, só os conjuntos de cobertura são
+calculados: um Dijkstra por candidato (ou por nó de demanda, o que for
+menor) interrompido no raio ('limit' do SciPy), que visita só a
+vizinhança de cada origem. O resultado é uma matriz de incidência esparsa
+a (demanda x candidatos), com a_ij = 1 se d(i, j) <= raio.
+
+Dois modelos:
+- cobertura máxima (MCLP): com p hospitais, maximizar a população
+  coberta;
+      max sum_i w_i z_i   s.a.  z_i <= sum_j a_ij x_j,  sum_j x_j = p
+- cobertura total (LSCP): o menor número de hospitais que cobre toda a
+  demanda alcançável;
+      min sum_j x_j       s.a.  sum_j a_ij x_j >= 1
+
+Cada um pode ser resolvido de forma exata (HiGHS, via scipy.optimize.milp)
+ou por heurística: gulosa (os dois) e relaxação lagrangiana com
+subgradiente (cobertura máxima), que também dá um limite superior para
+medir o gap da solução.
+"""
+import time
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.optimize import Bounds, LinearConstraint, milp
+from scipy.sparse.csgraph import dijkstra
+
+from calculo_distancias import grafo_para_csr
+from instrumentacao import NOMES_STATUS, anotar, estatisticas_milp, tamanho_modelo
+
+# Valores (origens x nós) de cada chamada do Dijkstra; limita a memória
+# temporária a ~2^22 floats.
+VALORES_POR_BLOCO = 2 ** 22
+
+
+def conjuntos_cobertura(G, demanda, candidatos, raio, peso='length'):
+    """
+    Matriz de incidência esparsa (CSR, bool) demanda x candidatos com
+    a_ij = True se a distância pela malha (sem sentido) for <= raio.
+    """
+    A, nos = grafo_para_csr(G, peso=peso)
+    indice = {node: k for k, node in enumerate(nos)}
+    idx_demanda = np.array([indice[i] for i in demanda], dtype=np.int64)
+    idx_candidatos = np.array([indice[j] for j in candidatos], dtype=np.int64)
+
+    # Distâncias são simétricas: o Dijkstra parte do menor dos dois conjuntos
+    a_partir_dos_candidatos = len(idx_candidatos) <= len(idx_demanda)
+    fontes, alvos = (idx_candidatos, idx_demanda) if a_partir_dos_candidatos else (idx_demanda, idx_candidatos)
+    posicao_alvo = np.full(A.shape[0], -1, dtype=np.int64)
+    posicao_alvo[alvos] = np.arange(len(alvos))
+
+    start_time = time.time()
+    linhas, colunas = [], []
+    tamanho_bloco = max(1, VALORES_POR_BLOCO // max(A.shape[0], 1))
+    for inicio in range(0, len(fontes), tamanho_bloco):
+        bloco = fontes[inicio:inicio + tamanho_bloco]
+        distancias = dijkstra(A, directed=True, indices=bloco, limit=raio)
+        f, no = np.nonzero(np.isfinite(distancias))
+        k = posicao_alvo[no]
+        linhas.append(inicio + f[k >= 0])
+        colunas.append(k[k >= 0])
+    linhas = np.concatenate(linhas) if linhas else np.array([], dtype=np.int64)
+    colunas = np.concatenate(colunas) if colunas else np.array([], dtype=np.int64)
+    if a_partir_dos_candidatos:
+        linhas, colunas = colunas, linhas
+
+    a = sp.csr_matrix((np.ones(len(linhas), dtype=bool), (linhas, colunas)),
+                      shape=(len(idx_demanda), len(idx_candidatos)))
+    print(f"✅ Conjuntos de cobertura (raio {raio:,.0f} m) calculados em {time.time() - start_time:.2f} segundos: "
+          f"{a.nnz:,} pares demanda-candidato.")
+    return a
+
+
+def _populacao_coberta(a, pesos, abertas):
+    if len(abertas) == 0:
+        return 0.0
+    coberta = np.asarray(a[:, abertas].sum(axis=1)).ravel() > 0
+    return float(pesos[coberta].sum())
+
+
+def _vetor_x(m, abertas):
+    x = np.zeros(m)
+    x[list(abertas)] = 1.0
+    return x
+
+
+# --- Cobertura máxima ---
+
+def _melhorar_trocas(a, at, pesos, abertas, max_rodadas=100):
+    """
+    Busca local: troca um hospital aberto pelo candidato que mais aumenta a
+    população coberta, enquanto houver troca que melhore.
+    Retorna (abertas, população coberta).
+    """
+    abertas = list(abertas)
+    vezes_coberta = np.asarray(a[:, abertas].sum(axis=1)).ravel()
+    for _ in range(max_rodadas):
+        melhor_troca = None
+        for posicao, j in enumerate(abertas):
+            demandas_j = at.indices[at.indptr[j]:at.indptr[j + 1]]
+            so_por_j = demandas_j[vezes_coberta[demandas_j] == 1]
+            perda = pesos[so_por_j].sum()
+            # Ganho de cada candidato k: o que ficaria descoberto sem j e k cobre
+            descobertas = (vezes_coberta == 0).astype(np.float64)
+            descobertas[so_por_j] = 1.0
+            ganho = at @ (pesos * descobertas)
+            ganho[abertas] = -np.inf
+            k = int(np.argmax(ganho))
+            if ganho[k] - perda > 1e-9 and (melhor_troca is None or ganho[k] - perda > melhor_troca[0]):
+                melhor_troca = (ganho[k] - perda, posicao, k)
+        if melhor_troca is None:
+            break
+        _, posicao, k = melhor_troca
+        j = abertas[posicao]
+        vezes_coberta[at.indices[at.indptr[j]:at.indptr[j + 1]]] -= 1
+        vezes_coberta[at.indices[at.indptr[k]:at.indptr[k + 1]]] += 1
+        abertas[posicao] = k
+    return abertas, float(pesos[vezes_coberta > 0].sum())
+
+
+def cobertura_maxima_gulosa(a, pesos, n_hospitais):
+    """
+    Abre, um a um, o candidato que cobre mais população ainda descoberta.
+    Retorna (x, população coberta).
+    """
+    a = sp.csr_matrix(a, dtype=np.float64)
+    at = a.T.tocsr()
+    pesos = np.asarray(pesos, dtype=np.float64)
+    coberta = np.zeros(a.shape[0], dtype=bool)
+    ganho = at @ pesos
+    abertas = []
+    for _ in range(min(n_hospitais, a.shape[1])):
+        ganho[abertas] = -np.inf
+        j = int(np.argmax(ganho))
+        abertas.append(j)
+        demandas = at.indices[at.indptr[j]:at.indptr[j + 1]]
+        novas = demandas[~coberta[demandas]]
+        coberta[novas] = True
+        # Quem também cobria as demandas recém-cobertas perde esse ganho
+        ganho -= a[novas].T @ pesos[novas]
+    return _vetor_x(a.shape[1], abertas), float(pesos[coberta].sum())
+
+
+def cobertura_maxima_lagrangiana(a, pesos, n_hospitais, max_iteracoes=300, passo_inicial=2.0, tolerancia=1e-4):
+    """
+    Relaxação lagrangiana das restrições z_i <= sum_j a_ij x_j com
+    multiplicadores 0 <= u_i <= w_i, otimizada por subgradiente. Para cada
+    u, o problema relaxado se resolve abrindo os p candidatos de maior
+    sum_i a_ij u_i, o que também dá uma solução viável.
+
+    Parte da solução gulosa e, no fim, melhora a melhor solução encontrada
+    com trocas. Retorna (x, população coberta, limite superior).
+    """
+    a = sp.csr_matrix(a, dtype=np.float64)
+    at = a.T.tocsr()
+    pesos = np.asarray(pesos, dtype=np.float64)
+    m = a.shape[1]
+    p = min(n_hospitais, m)
+
+    x, melhor = cobertura_maxima_gulosa(a, pesos, p)
+    abertas_melhor = np.flatnonzero(x)
+    limite = float(pesos.sum())
+    u = pesos / 2.0
+    passo = passo_inicial
+    sem_melhora = 0
+
+    for _ in range(max_iteracoes):
+        valor_u = at @ u
+        abertas = np.argpartition(-valor_u, p - 1)[:p]
+        limite_u = float((pesos - u).sum() + valor_u[abertas].sum())
+        if limite_u < limite - 1e-9:
+            limite, sem_melhora = limite_u, 0
+        else:
+            sem_melhora += 1
+            if sem_melhora >= 20:
+                passo, sem_melhora = passo / 2.0, 0
+
+        vezes_coberta = np.asarray(a[:, abertas].sum(axis=1)).ravel()
+        valor = float(pesos[vezes_coberta > 0].sum())
+        if valor > melhor:
+            melhor, abertas_melhor = valor, abertas
+
+        if limite - melhor <= tolerancia * max(limite, 1.0) or passo < 1e-6:
+            break
+        # Subgradiente da relaxação: 1 - (quantas vezes i é coberta)
+        g = 1.0 - vezes_coberta
+        norma = float(g @ g)
+        if norma == 0:
+            break
+        u = np.clip(u + passo * (limite_u - melhor) / norma * g, 0.0, pesos)
+
+    abertas_melhor, melhor = _melhorar_trocas(a, at, pesos, abertas_melhor)
+    return _vetor_x(m, abertas_melhor), melhor, max(limite, melhor)
+
+
+def cobertura_maxima_exata(a, pesos, n_hospitais, limite_tempo=None, msg=False):
+    """
+    Resolve o MCLP com o HiGHS (x binário, z contínuo em [0, 1]).
+    Retorna (x, população coberta, status).
+    """
+    a = sp.csr_matrix(a, dtype=np.float64)
+    pesos = np.asarray(pesos, dtype=np.float64)
+    n, m = a.shape
+
+    # Variáveis: x_j (m) seguidos de z_i (n); minimiza -sum_i w_i z_i
+    c = np.concatenate([np.zeros(m), -pesos])
+    restricoes = sp.vstack([
+        sp.hstack([-a, sp.identity(n, format='csr')]),         # z_i - sum_j a_ij x_j <= 0
+        sp.hstack([sp.csr_matrix(np.ones((1, m))), sp.csr_matrix((1, n))]),  # sum_j x_j = p
+    ]).tocsr()
+    limite_inf = np.concatenate([np.full(n, -np.inf), [n_hospitais]])
+    limite_sup = np.concatenate([np.zeros(n), [n_hospitais]])
+    opcoes = {'disp': msg}
+    if limite_tempo is not None:
+        opcoes['time_limit'] = limite_tempo
+
+    resultado = milp(c=c, constraints=LinearConstraint(restricoes, limite_inf, limite_sup),
+                     bounds=Bounds(np.zeros(m + n), np.ones(m + n)),
+                     integrality=np.concatenate([np.ones(m), np.zeros(n)]), options=opcoes)
+    status = NOMES_STATUS.get(resultado.status, 'Undefined')
+    anotar(modelo=tamanho_modelo(m + n, n + 1, restricoes.nnz), solver=dict(estatisticas_milp(resultado), status=status))
+    if resultado.x is None:
+        return None, None, status
+    x = np.round(resultado.x[:m]) + 0.0
+    return x, _populacao_coberta(a, pesos, np.flatnonzero(x)), status
+
+
+# --- Cobertura total ---
+
+def cobertura_total_gulosa(a):
+    """
+    Guloso de Chvátal para o LSCP: abre o candidato que cobre mais demandas
+    ainda descobertas, até cobrir todas as alcançáveis; no fim, fecha os
+    que ficaram redundantes. Retorna x.
+    """
+    a = sp.csr_matrix(a, dtype=np.float64)
+    at = a.T.tocsr()
+    alcancaveis = np.diff(a.indptr) > 0
+    coberta = ~alcancaveis
+    ganho = at @ alcancaveis.astype(np.float64)
+    abertas = []
+    while not coberta.all():
+        ganho[abertas] = -np.inf
+        j = int(np.argmax(ganho))
+        abertas.append(j)
+        demandas = at.indices[at.indptr[j]:at.indptr[j + 1]]
+        novas = demandas[~coberta[demandas]]
+        coberta[novas] = True
+        ganho -= np.asarray(a[novas].sum(axis=0)).ravel()
+
+    # Retira, dos últimos para os primeiros, os que não cobrem nada sozinhos
+    vezes_coberta = np.asarray(a[:, abertas].sum(axis=1)).ravel()
+    for j in reversed(list(abertas)):
+        demandas = at.indices[at.indptr[j]:at.indptr[j + 1]]
+        if np.all(vezes_coberta[demandas] > 1):
+            vezes_coberta[demandas] -= 1
+            abertas.remove(j)
+    return _vetor_x(a.shape[1], abertas)
+
+
+def cobertura_total_exata(a, limite_tempo=None, msg=False):
+    """
+    Resolve o LSCP com o HiGHS para as demandas alcançáveis por algum
+    candidato. Retorna (x, status).
+    """
+    a = sp.csr_matrix(a, dtype=np.float64)
+    a = a[np.diff(a.indptr) > 0]
+    n, m = a.shape
+    opcoes = {'disp': msg}
+    if limite_tempo is not None:
+        opcoes['time_limit'] = limite_tempo
+
+    resultado = milp(c=np.ones(m), constraints=LinearConstraint(a, np.ones(n), np.full(n, np.inf)),
+                     bounds=Bounds(np.zeros(m), np.ones(m)), integrality=np.ones(m), options=opcoes)
+    status = NOMES_STATUS.get(resultado.status, 'Undefined')
+    anotar(modelo=tamanho_modelo(m, n, a.nnz), solver=dict(estatisticas_milp(resultado), status=status))
+    if resultado.x is None:
+        return None, status
+    return np.round(resultado.x) + 0.0, status
+
+
+def resolver_cobertura(a, pesos, n_hospitais=None, modelo='cobertura_maxima', motor='exato', limite_tempo=None):
+    """
+    Resolve um dos modelos sobre a matriz de incidência 'a':
+    - modelo='cobertura_maxima' (usa 'n_hospitais') ou 'cobertura_total';
+    - motor='exato', 'guloso' ou 'lagrangiano' (só cobertura máxima).
+
+    Retorna (x, população coberta) ou (None, None) se não houver solução.
+    """
+    pesos = np.asarray(pesos, dtype=np.float64)
+    populacao_total = float(pesos.sum())
+    start_time = time.time()
+
+    if modelo == 'cobertura_maxima':
+        if motor == 'exato':
+            x, coberta, status = cobertura_maxima_exata(a, pesos, n_hospitais, limite_tempo)
+            if x is None:
+                print(f"❌ Erro: O solver terminou com status '{status}'.")
+                return None, None
+            if status != 'Optimal':
+                print(f"⚠️ Limite de tempo atingido: usando a melhor solução encontrada (status '{status}').")
+        elif motor == 'lagrangiano':
+            x, coberta, limite = cobertura_maxima_lagrangiana(a, pesos, n_hospitais)
+            gap = 100.0 * (limite - coberta) / max(limite, 1e-12)
+            print(f"Limite superior (lagrangiano): {limite:,.0f} | gap: {gap:.3f}%")
+            anotar(solver={'metodo': 'lagrangiano', 'objetivo': coberta, 'limite_dual': limite, 'gap': gap / 100})
+        elif motor == 'guloso':
+            x, coberta = cobertura_maxima_gulosa(a, pesos, n_hospitais)
+        else:
+            print(f"❌ Erro: Motor desconhecido: '{motor}'.")
+            return None, None
+    elif modelo == 'cobertura_total':
+        if motor == 'exato':
+            x, status = cobertura_total_exata(a, limite_tempo)
+            if x is None:
+                print(f"❌ Erro: O solver terminou com status '{status}'.")
+                return None, None
+            if status != 'Optimal':
+                print(f"⚠️ Limite de tempo atingido: usando a melhor solução encontrada (status '{status}').")
+        elif motor == 'guloso':
+            x = cobertura_total_gulosa(a)
+        else:
+            print(f"❌ Erro: Motor desconhecido para a cobertura total: '{motor}'.")
+            return None, None
+        coberta = _populacao_coberta(sp.csr_matrix(a), pesos, np.flatnonzero(x))
+    else:
+        print(f"❌ Erro: Modelo desconhecido: '{modelo}'.")
+        return None, None
+
+    print(f"{int(x.sum())} hospitais cobrem {coberta:,.0f} de {populacao_total:,.0f} habitantes "
+          f"({100.0 * coberta / max(populacao_total, 1e-12):.2f}%) em {time.time() - start_time:.2f} segundos.")
+    return x, coberta
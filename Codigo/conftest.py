@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+Instâncias pequenas para os testes (rodar de dentro de 'Codigo':
+python -m pytest -q), montadas sobre os grafos sintéticos do benchmark,
+sem depender dos arquivos de São Carlos.
+"""
+import numpy as np
+import pytest
+from scipy.sparse.csgraph import dijkstra
+
+from benchmark import grafo_sintetico, populacoes_sinteticas
+from calculo_distancias import grafo_para_csr
+
+
+@pytest.fixture
+def instancia_p_mediana():
+    """
+    Função (n_nos, n_candidatos, semente=0) -> (pesos, D) de uma p-mediana
+    em que todos os nós são demanda e os candidatos são sorteados.
+    """
+    def montar(n_nos, n_candidatos, semente=0):
+        G = grafo_sintetico(n_nos, tipo='perturbado', semente=semente)
+        A, nos = grafo_para_csr(G)
+        populacoes = populacoes_sinteticas(nos, semente=semente)
+        pesos = np.array([populacoes[node] for node in nos], dtype=np.float64)
+        candidatos = np.random.default_rng(semente).choice(len(nos), n_candidatos, replace=False)
+        return pesos, dijkstra(A, directed=True, indices=candidatos).T
+    return montar
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Leitura dos dados do Censo 2022 (IBGE) só com o que o projeto usa.
+
+O CSV 'Agregados_por_setores_basico_BR_*.csv' tem todos os setores do
+Brasil e centenas de colunas, mas só precisamos de 'CD_SETOR', 'CD_MUN' e
+'v0001' (população) dos setores de um município. O arquivo é lido em
+blocos pelo leitor de CSV do Arrow (ou pelo pandas, em blocos, se o pyarrow
+não estiver instalado), só com essas três colunas, e cada bloco é filtrado
+pelo município antes do próximo ser lido: a memória usada é a de um bloco
+mais a do resultado.
+
+O shapefile dos setores ('SP_Setores_CD2022.shp') tem o estado inteiro.
+Primeiro só a coluna 'CD_SETOR' do .dbf é lida (sem geometrias); os setores
+do município são os que começam com o código dele, e só as geometrias
+desses registros são lidas, com acesso direto pelo índice do .shx.
+
+Em vez de um código, pode ser passada uma lista de municípios (ex.: o
+modo em lote, lote_municipios.py): os arquivos continuam sendo lidos uma
+única vez, e o resultado tem os setores de todos eles.
+
+Os resultados podem ser guardados em Parquet (GeoParquet para os setores,
+já reprojetados), um arquivo por município (ou lista) e por CRS; as
+execuções seguintes os leem em milissegundos. O cache guarda a impressão digital
+(tamanho e data) do arquivo de origem e é refeito quando ele muda.
+"""
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+try:
+    import pyogrio
+except ImportError:
+    pyogrio = None
+
+PASTA_CACHE = os.path.join('Arquivos', 'cache_censo')
+COLUNAS_POPULACAO = ['CD_SETOR', 'CD_MUN', 'v0001']
+# Tamanho dos blocos lidos de cada vez (bytes no Arrow, linhas no pandas)
+TAMANHO_BLOCO_BYTES = 64 << 20
+TAMANHO_BLOCO_LINHAS = 200_000
+
+
+def _impressao_arquivo(caminho):
+    info = os.stat(caminho)
+    return [info.st_size, info.st_mtime_ns]
+
+
+def _nome_municipios(codigo_municipio):
+    """Parte do nome do cache: o código, 'todos' ou um hash da lista de códigos."""
+    if codigo_municipio is None:
+        return 'todos'
+    if isinstance(codigo_municipio, str):
+        return codigo_municipio
+    codigos = ','.join(sorted(codigo_municipio))
+    return 'lote_' + hashlib.sha256(codigos.encode('utf-8')).hexdigest()[:12]
+
+
+def _ler_csv_arrow(arquivo_csv, colunas, codigo_municipio):
+    leitor = pa_csv.open_csv(
+        arquivo_csv,
+        read_options=pa_csv.ReadOptions(encoding='latin-1', block_size=TAMANHO_BLOCO_BYTES),
+        parse_options=pa_csv.ParseOptions(delimiter=';'),
+        convert_options=pa_csv.ConvertOptions(include_columns=colunas,
+                                              column_types={c: pa.string() for c in colunas},
+                                              strings_can_be_null=True))
+    blocos = []
+    for bloco in leitor:
+        if isinstance(codigo_municipio, str):
+            bloco = bloco.filter(pc.equal(bloco.column('CD_MUN'), codigo_municipio))
+        elif codigo_municipio is not None:
+            bloco = bloco.filter(pc.is_in(bloco.column('CD_MUN'), value_set=pa.array(list(codigo_municipio))))
+        if bloco.num_rows:
+            blocos.append(bloco)
+    return pa.Table.from_batches(blocos, schema=leitor.schema)
+
+
+def _ler_csv_pandas(arquivo_csv, colunas, codigo_municipio):
+    blocos = []
+    for bloco in pd.read_csv(arquivo_csv, sep=';', encoding='latin-1', dtype=str, usecols=colunas,
+                             chunksize=TAMANHO_BLOCO_LINHAS):
+        if isinstance(codigo_municipio, str):
+            bloco = bloco[bloco['CD_MUN'] == codigo_municipio]
+        elif codigo_municipio is not None:
+            bloco = bloco[bloco['CD_MUN'].isin(list(codigo_municipio))]
+        blocos.append(bloco)
+    return pd.concat(blocos, ignore_index=True)[colunas]
+
+
+def carregar_populacao_setores(arquivo_csv, codigo_municipio, usar_cache=True, pasta_cache=PASTA_CACHE):
+    """
+    Lê 'CD_SETOR', 'CD_MUN' e 'v0001' (como texto, igual a dtype=str) dos
+    setores do município 'codigo_municipio' (uma lista de códigos = todos
+    esses municípios; None = todos os setores).
+
+    Com 'usar_cache' (e o pyarrow instalado), o resultado é guardado em
+    '<pasta_cache>/populacao_<codigo>.parquet' e reaproveitado enquanto o
+    CSV não mudar. Retorna um DataFrame.
+    """
+    colunas = list(COLUNAS_POPULACAO)
+    usar_cache = usar_cache and pa is not None
+    impressao = _impressao_arquivo(arquivo_csv)
+    arquivo_cache = os.path.join(pasta_cache, f"populacao_{_nome_municipios(codigo_municipio)}.parquet")
+
+    if usar_cache and os.path.exists(arquivo_cache):
+        metadados = pq.read_schema(arquivo_cache).metadata or {}
+        origem = json.loads(metadados.get(b'origem', b'{}'))
+        if origem == {'arquivo': os.path.basename(arquivo_csv), 'impressao': impressao}:
+            print(f"Lendo a população do cache '{arquivo_cache}'...")
+            return pq.read_table(arquivo_cache).to_pandas()
+
+    print(f"Lendo as colunas {colunas} de '{arquivo_csv}' em blocos...")
+    if pa is None:
+        return _ler_csv_pandas(arquivo_csv, colunas, codigo_municipio)
+
+    tabela = _ler_csv_arrow(arquivo_csv, colunas, codigo_municipio)
+    if usar_cache:
+        os.makedirs(pasta_cache, exist_ok=True)
+        origem = json.dumps({'arquivo': os.path.basename(arquivo_csv), 'impressao': impressao})
+        pq.write_table(tabela.replace_schema_metadata({'origem': origem}), arquivo_cache)
+        print(f"✅ Cache da população salvo em '{arquivo_cache}'.")
+    return tabela.to_pandas()
+
+
+def _nome_crs(crs):
+    return 'original' if crs is None else str(crs).replace(':', '').replace('/', '_').replace(' ', '')
+
+
+def _do_municipio(cd_setor, codigo_municipio):
+    """Máscara dos setores do(s) município(s): o código do setor começa com o do município (7 dígitos)."""
+    cd_setor = cd_setor.astype(str)
+    if isinstance(codigo_municipio, str):
+        return cd_setor.str.startswith(codigo_municipio)
+    return cd_setor.str[:7].isin(list(codigo_municipio))
+
+
+def _ler_setores(arquivo_shp, codigo_municipio, bbox):
+    import geopandas as gpd
+
+    if pyogrio is None:
+        gdf = gpd.read_file(arquivo_shp, bbox=bbox)
+        if codigo_municipio is not None:
+            gdf = gdf[_do_municipio(gdf['CD_SETOR'], codigo_municipio)].reset_index(drop=True)
+        return gdf
+
+    if codigo_municipio is None:
+        return pyogrio.read_dataframe(arquivo_shp, bbox=bbox)
+
+    codigos = pyogrio.read_dataframe(arquivo_shp, columns=['CD_SETOR'], read_geometry=False, bbox=bbox,
+                                     fid_as_index=True)
+    fids = codigos.index[_do_municipio(codigos['CD_SETOR'], codigo_municipio)].to_numpy()
+    if len(fids) == 0:
+        return gpd.GeoDataFrame(columns=['CD_SETOR', 'geometry'], geometry='geometry',
+                                crs=pyogrio.read_info(arquivo_shp)['crs'])
+    return pyogrio.read_dataframe(arquivo_shp, fids=fids)
+
+
+def carregar_setores(arquivo_shp, codigo_municipio, crs=None, bbox=None, usar_cache=True, pasta_cache=PASTA_CACHE):
+    """
+    Lê os polígonos dos setores censitários do município 'codigo_municipio'
+    (uma lista de códigos = todos esses municípios; None = todos),
+    opcionalmente só os que tocam 'bbox' (no CRS do
+    shapefile), e os reprojeta para 'crs' (None = mantém o do arquivo).
+
+    Com 'usar_cache' (e o pyarrow instalado), o resultado é guardado em
+    '<pasta_cache>/setores_<codigo>_<crs>.parquet'. Retorna um GeoDataFrame.
+    """
+    import geopandas as gpd
+
+    usar_cache = usar_cache and pa is not None and bbox is None
+    impressao = _impressao_arquivo(arquivo_shp)
+    arquivo_cache = os.path.join(pasta_cache,
+                                 f"setores_{_nome_municipios(codigo_municipio)}_{_nome_crs(crs)}.parquet")
+    origem = {'arquivo': os.path.basename(arquivo_shp), 'impressao': impressao}
+
+    if usar_cache and os.path.exists(arquivo_cache) and os.path.exists(arquivo_cache + '.json'):
+        with open(arquivo_cache + '.json', 'r', encoding='utf-8') as f:
+            if json.load(f) == origem:
+                print(f"Lendo os setores do cache '{arquivo_cache}'...")
+                return gpd.read_parquet(arquivo_cache)
+
+    print(f"Lendo os setores de '{arquivo_shp}'...")
+    gdf = _ler_setores(arquivo_shp, codigo_municipio, bbox)
+    if crs is not None and len(gdf):
+        gdf = gdf.to_crs(crs)
+    print(f"{len(gdf)} setores lidos.")
+
+    if usar_cache:
+        os.makedirs(pasta_cache, exist_ok=True)
+        gdf.to_parquet(arquivo_cache)
+        with open(arquivo_cache + '.json', 'w', encoding='utf-8') as f:
+            json.dump(origem, f)
+        print(f"✅ Cache dos setores salvo em '{arquivo_cache}'.")
+    return gdf
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+Formato binário compacto do grafo de ruas (substitui reler o GraphML).
+
+Formato, para um caminho base como 'Arquivos/sao_carlos_grafo_preciso_compacto':
+- '<base>_indptr.npy', '<base>_destinos.npy', '<base>_comprimentos.npy',
+  '<base>_chaves.npy'  : arestas (direcionadas, com as paralelas) em CSR,
+                         agrupadas pelo nó de origem;
+- '<base>_geom_inicio.npy', '<base>_geom_xy.npy' : vértices das geometrias
+                         das arestas (só usados para desenhar);
+- '<base>_nos_id.npy', '<base>_nos_x.npy', '<base>_nos_y.npy',
+  '<base>_nos_populacao.npy', '<base>_nos_populacao_suavizada.npy'
+                       : tabela de nós, uma coluna por arquivo;
+- '<base>.json'        : metadados (atributos do grafo, como o CRS, e a
+                         impressão digital dos arquivos de origem).
+
+Os vetores são abertos com np.load(mmap_mode='r'): abrir o grafo custa
+milissegundos. Um grafo do NetworkX só é reconstruído (e guardado) quando
+algum código realmente precisa de um, em geral para desenhar o mapa.
+"""
+import json
+import os
+import pickle
+
+import numpy as np
+import scipy.sparse as sp
+
+from calculo_distancias import csr_nao_direcionado
+
+COLUNAS_ARESTAS = ('indptr', 'destinos', 'comprimentos', 'chaves', 'geom_inicio', 'geom_xy')
+COLUNAS_NOS = ('id', 'x', 'y', 'populacao', 'populacao_suavizada')
+
+
+def _arquivos(caminho_base):
+    arquivos = {c: f'{caminho_base}_{c}.npy' for c in COLUNAS_ARESTAS}
+    arquivos.update({f'nos_{c}': f'{caminho_base}_nos_{c}.npy' for c in COLUNAS_NOS})
+    arquivos['meta'] = caminho_base + '.json'
+    return arquivos
+
+
+def _impressao_arquivo(caminho):
+    if caminho is None or not os.path.exists(caminho):
+        return None
+    info = os.stat(caminho)
+    return [info.st_size, info.st_mtime_ns]
+
+
+class TabelaNos:
+    """
+    Visão dos nós com a mesma interface de leitura de G.nodes do NetworkX:
+    'node in G.nodes()', 'for node in G.nodes()', 'G.nodes[node]["x"]' e
+    'G.nodes(data=True)' funcionam sem montar um grafo do NetworkX.
+    """
+
+    def __init__(self, grafo):
+        self._grafo = grafo
+
+    def __call__(self, data=False):
+        if not data:
+            return self
+        return ((node, self[node]) for node in self)
+
+    def __iter__(self):
+        return iter(self._grafo.ids)
+
+    def __len__(self):
+        return self._grafo.n_nos
+
+    def __contains__(self, node):
+        return node in self._grafo.indice
+
+    def __getitem__(self, node):
+        k = self._grafo.indice[node]
+        return {'x': float(self._grafo.x[k]), 'y': float(self._grafo.y[k])}
+
+
+class GrafoCompacto:
+    """Grafo de ruas lido do formato compacto (vetores em np.memmap)."""
+
+    def __init__(self, caminho_base):
+        arquivos = _arquivos(caminho_base)
+        with open(arquivos['meta'], 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+
+        self.caminho_base = caminho_base
+        self.graph = self.meta['atributos_grafo']
+        for coluna in COLUNAS_ARESTAS:
+            setattr(self, coluna, np.load(arquivos[coluna], mmap_mode='r'))
+        self.ids = np.load(arquivos['nos_id']).tolist()
+        self.x = np.load(arquivos['nos_x'], mmap_mode='r')
+        self.y = np.load(arquivos['nos_y'], mmap_mode='r')
+        self.populacao = np.load(arquivos['nos_populacao'], mmap_mode='r')
+        self.populacao_suavizada = np.load(arquivos['nos_populacao_suavizada'], mmap_mode='r')
+        self._indice = None
+        self._networkx = None
+
+    @property
+    def n_nos(self):
+        return len(self.ids)
+
+    @property
+    def n_arestas(self):
+        return len(self.destinos)
+
+    @property
+    def indice(self):
+        if self._indice is None:
+            self._indice = {node: k for k, node in enumerate(self.ids)}
+        return self._indice
+
+    @property
+    def nodes(self):
+        return TabelaNos(self)
+
+    def origens(self):
+        """Posição do nó de origem de cada aresta (o inverso de indptr)."""
+        return np.repeat(np.arange(self.n_nos), np.diff(self.indptr))
+
+    def matriz_adjacencia(self):
+        """Adjacência CSR não-direcionada ponderada pelo comprimento ('length')."""
+        return csr_nao_direcionado(self.origens(), self.destinos, self.comprimentos, self.n_nos)
+
+    def operador_difusao(self):
+        """
+        Mesmo resultado de motor_difusao.construir_operador_difusao(G): A[v, u] = 1
+        quando v é vizinho (sucessor) de u, sem repetir arestas paralelas.
+        Retorna (A, graus, nos).
+        """
+        n = self.n_nos
+        pares = np.unique(self.origens() * n + np.asarray(self.destinos, dtype=np.int64))
+        origens, destinos = np.divmod(pares, n)
+        graus = np.bincount(origens, minlength=n).astype(np.float64)
+        A = sp.csr_matrix((np.ones(len(pares)), (destinos, origens)), shape=(n, n))
+        return A, graus, list(self.ids)
+
+    def populacoes(self, suavizada=False):
+        """Dicionário {nó: população} a partir da tabela de nós."""
+        coluna = self.populacao_suavizada if suavizada else self.populacao
+        return dict(zip(self.ids, np.asarray(coluna).tolist()))
+
+    def networkx(self):
+        """
+        Reconstrói (uma única vez) o MultiDiGraph com coordenadas, comprimentos
+        e geometrias das arestas, suficiente para ox.plot_graph e o NetworkX.
+        """
+        if self._networkx is None:
+            import networkx as nx
+            from shapely.geometry import LineString
+
+            G = nx.MultiDiGraph(**self.graph)
+            G.add_nodes_from((node, {'x': float(self.x[k]), 'y': float(self.y[k])})
+                             for k, node in enumerate(self.ids))
+            origens = self.origens()
+            for e in range(self.n_arestas):
+                dados = {'length': float(self.comprimentos[e])}
+                inicio, fim = self.geom_inicio[e], self.geom_inicio[e + 1]
+                if fim > inicio:
+                    dados['geometry'] = LineString(np.asarray(self.geom_xy[inicio:fim]))
+                G.add_edge(self.ids[origens[e]], self.ids[self.destinos[e]], key=int(self.chaves[e]), **dados)
+            self._networkx = G
+        return self._networkx
+
+
+def _carregar_pickle(arquivo):
+    if arquivo is None or not os.path.exists(arquivo):
+        return None
+    with open(arquivo, 'rb') as f:
+        return pickle.load(f)
+
+
+def _salvar_atomico(caminho, valores):
+    """np.save num arquivo temporário e renomeia: quem lê nunca vê um arquivo pela metade."""
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, 'wb') as f:
+        np.save(f, valores)
+    os.replace(temporario, caminho)
+
+
+def _gravar_populacoes(arquivos, nos, populacoes, populacoes_suavizadas):
+    for coluna, valores in (('populacao', populacoes), ('populacao_suavizada', populacoes_suavizadas)):
+        valores = valores or {}
+        _salvar_atomico(arquivos[f'nos_{coluna}'], np.array([valores.get(node, 0) for node in nos], dtype=np.int64))
+
+
+def gravar_grafo_compacto(G, caminho_base, populacoes=None, populacoes_suavizadas=None, origens=None):
+    """
+    Grava o grafo do NetworkX (e, se dadas, as populações de cada nó) no
+    formato compacto. 'origens' é o dicionário {'grafo': ..., 'populacao': ...,
+    'populacao_suavizada': ...} com os arquivos de onde os dados vieram; suas
+    impressões digitais ficam nos metadados para saber quando o formato
+    compacto está desatualizado.
+    """
+    arquivos = _arquivos(caminho_base)
+    nos = list(G.nodes())
+    indice = {node: k for k, node in enumerate(nos)}
+
+    origens_arestas, destinos, comprimentos, chaves, geom_inicio, geom_xy = [], [], [], [], [0], []
+    for u, v, k, dados in G.edges(keys=True, data=True):
+        origens_arestas.append(indice[u])
+        destinos.append(indice[v])
+        comprimentos.append(float(dados.get('length', 1.0)))
+        chaves.append(k if isinstance(k, int) else 0)
+        geometria = dados.get('geometry')
+        if geometria is not None:
+            geom_xy.extend(geometria.coords)
+        geom_inicio.append(len(geom_xy))
+
+    # Agrupa as arestas pelo nó de origem (ordem estável: mantém as chaves)
+    origens_arestas = np.asarray(origens_arestas, dtype=np.int64)
+    ordem = np.argsort(origens_arestas, kind='stable')
+    indptr = np.zeros(len(nos) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(origens_arestas, minlength=len(nos)))
+
+    # As geometrias seguem a nova ordem das arestas
+    geom_inicio = np.asarray(geom_inicio, dtype=np.int64)
+    geom_xy = np.asarray(geom_xy, dtype=np.float64).reshape(-1, 2)
+    novo_inicio = np.zeros(len(ordem) + 1, dtype=np.int64)
+    novo_inicio[1:] = np.cumsum(np.diff(geom_inicio)[ordem])
+    partes = [geom_xy[geom_inicio[e]:geom_inicio[e + 1]] for e in ordem]
+
+    np.save(arquivos['indptr'], indptr)
+    np.save(arquivos['destinos'], np.asarray(destinos, dtype=np.int64)[ordem])
+    np.save(arquivos['comprimentos'], np.asarray(comprimentos, dtype=np.float64)[ordem])
+    np.save(arquivos['chaves'], np.asarray(chaves, dtype=np.int64)[ordem])
+    np.save(arquivos['geom_inicio'], novo_inicio)
+    np.save(arquivos['geom_xy'], np.concatenate(partes) if len(geom_xy) else geom_xy)
+
+    np.save(arquivos['nos_id'], np.asarray(nos))
+    np.save(arquivos['nos_x'], np.array([G.nodes[node]['x'] for node in nos], dtype=np.float64))
+    np.save(arquivos['nos_y'], np.array([G.nodes[node]['y'] for node in nos], dtype=np.float64))
+    _gravar_populacoes(arquivos, nos, populacoes, populacoes_suavizadas)
+
+    origens = origens or {}
+    with open(arquivos['meta'], 'w', encoding='utf-8') as f:
+        json.dump({'n_nos': len(nos), 'n_arestas': len(destinos),
+                   'atributos_grafo': {k: str(v) for k, v in G.graph.items()},
+                   'origens': {c: [arquivo, _impressao_arquivo(arquivo)] for c, arquivo in origens.items()}},
+                  f, indent=2)
+    return GrafoCompacto(caminho_base)
+
+
+def abrir_grafo_compacto(caminho_base):
+    """Abre um grafo compacto existente (custo de milissegundos)."""
+    return GrafoCompacto(caminho_base)
+
+
+def existe_grafo_compacto(caminho_base):
+    return all(os.path.exists(f) for f in _arquivos(caminho_base).values())
+
+
+def carregar_grafo(arquivo_graphml, arquivo_populacao=None, arquivo_populacao_suavizada=None, caminho_base=None):
+    """
+    Abre o grafo no formato compacto, gravado ao lado do GraphML com o
+    sufixo '_compacto'. Na primeira vez (ou se o GraphML mudou) o GraphML é
+    lido uma única vez e convertido; se só os pickles de população mudaram,
+    apenas as colunas de população são regravadas.
+
+    Sem arquivos de população, usa 'populacoes_nos.pkl' e
+    'populacoes_suavizadas.pkl' da mesma pasta do GraphML (quando existirem).
+    """
+    pasta = os.path.dirname(arquivo_graphml)
+    if caminho_base is None:
+        caminho_base = os.path.splitext(arquivo_graphml)[0] + '_compacto'
+    origens = {'grafo': arquivo_graphml,
+               'populacao': arquivo_populacao or os.path.join(pasta, 'populacoes_nos.pkl'),
+               'populacao_suavizada': arquivo_populacao_suavizada or os.path.join(pasta, 'populacoes_suavizadas.pkl')}
+    atuais = {c: [arquivo, _impressao_arquivo(arquivo)] for c, arquivo in origens.items()}
+
+    if existe_grafo_compacto(caminho_base):
+        grafo = GrafoCompacto(caminho_base)
+        gravadas = grafo.meta.get('origens', {})
+        if gravadas == atuais:
+            return grafo
+        ids, meta = grafo.ids, grafo.meta
+        # Solta os memmaps antes de regravar os arquivos (no Windows, um
+        # arquivo mapeado não pode ser sobrescrito)
+        del grafo
+        if gravadas.get('grafo') == atuais['grafo']:
+            print("Populações alteradas: atualizando as colunas do grafo compacto...")
+            _gravar_populacoes(_arquivos(caminho_base), ids, _carregar_pickle(origens['populacao']),
+                               _carregar_pickle(origens['populacao_suavizada']))
+            meta['origens'] = atuais
+            temporario = f"{caminho_base}.json.{os.getpid()}.tmp"
+            with open(temporario, 'w', encoding='utf-8') as f:
+                json.dump(meta, f, indent=2)
+            os.replace(temporario, caminho_base + '.json')
+            return GrafoCompacto(caminho_base)
+
+    import osmnx as ox
+
+    print(f"Convertendo '{arquivo_graphml}' para o formato compacto (só na primeira vez)...")
+    G = ox.load_graphml(arquivo_graphml)
+    grafo = gravar_grafo_compacto(G, caminho_base, _carregar_pickle(origens['populacao']),
+                                  _carregar_pickle(origens['populacao_suavizada']), origens)
+    grafo._networkx = G
+    return grafo
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Heurística rápida para o problema das p-medianas (sem solver de PL/PLI).
+
+1. Construção gulosa: abre, um de cada vez, o candidato que mais reduz a
+   distância total ponderada pela população.
+2. Melhoria por trocas (Teitz-Bart com a "troca rápida" de Whitaker):
+   para cada candidato fechado j, avalia de uma vez a troca de j por TODOS
+   os hospitais abertos r, usando os vetores do mais próximo e do segundo
+   mais próximo hospital aberto de cada demanda. Cada candidato custa
+   O(n) e a perda de cada r sai de uma soma agrupada por hospital, sem
+   laço em Python sobre as demandas.
+
+A resposta é um ótimo local (nenhuma troca simples melhora), em geral igual
+ou muito próxima do ótimo do modelo exato.
+"""
+import time
+
+import numpy as np
+
+from instrumentacao import anotar
+
+# Quantidade de valores (demandas x candidatos) avaliados por bloco;
+# limita a memória temporária a ~2^22 floats por matriz.
+VALORES_POR_BLOCO = 2 ** 22
+
+
+def _preparar_distancias(D):
+    """
+    Troca as distâncias infinitas (pares sem caminho) por uma penalidade
+    finita maior que qualquer soma possível de distâncias, evitando inf - inf.
+    """
+    finitas = np.isfinite(D)
+    if finitas.all():
+        return D
+    maior = D[finitas].max() if finitas.any() else 1.0
+    penalidade = (maior + 1.0) * D.shape[0] * 10.0
+    return np.where(finitas, D, penalidade)
+
+
+def _mais_proximos(Dt, abertas):
+    """
+    Para cada demanda, posição (em 'abertas') do hospital aberto mais
+    próximo, sua distância e a distância do segundo mais próximo.
+    """
+    Da = Dt[abertas]
+    n = Da.shape[1]
+    if len(abertas) == 1:
+        return np.zeros(n, dtype=np.int64), Da[0].copy(), np.full(n, np.inf)
+    dois = np.argpartition(Da, 1, axis=0)[:2]
+    d = np.take_along_axis(Da, dois, axis=0)
+    troca = d[1] < d[0]
+    dois[:, troca] = dois[::-1, troca]
+    d[:, troca] = d[::-1, troca]
+    return dois[0], d[0], d[1]
+
+
+def _agrupamento(pesos, posicao, p):
+    """
+    Matriz n x p com o peso de cada demanda na coluna do seu hospital mais
+    próximo: multiplicar por ela soma valores por hospital (como um bincount
+    ponderado aplicado a várias linhas de uma vez).
+    """
+    agrupamento = np.zeros((len(pesos), p))
+    agrupamento[np.arange(len(pesos)), posicao] = pesos
+    return agrupamento
+
+
+def construcao_gulosa(pesos, Dt, n_hospitais):
+    """
+    Abre os hospitais um a um, sempre o que mais reduz o custo total.
+
+    O ganho de abrir um candidato só diminui à medida que outros hospitais
+    são abertos, então os ganhos calculados em passos anteriores servem de
+    limite superior ("guloso preguiçoso"): a cada passo só são recalculados
+    os candidatos do topo, até que o melhor deles esteja atualizado.
+
+    'Dt' é a matriz candidatos x demanda (transposta de D), para que as
+    distâncias de um candidato fiquem contíguas na memória.
+    """
+    m, n = Dt.shape
+    tamanho_bloco = max(1, VALORES_POR_BLOCO // max(n, 1))
+
+    # Primeiro hospital: menor custo total sozinho (1-mediana)
+    abertas = [int(np.argmin(Dt @ pesos))]
+    d1 = Dt[abertas[0]].copy()
+
+    # Ganhos exatos em relação ao primeiro hospital, calculados em blocos
+    ganhos = np.empty(m)
+    buffer = np.empty((tamanho_bloco, n))
+    for inicio in range(0, m, tamanho_bloco):
+        bloco = Dt[inicio:inicio + tamanho_bloco]
+        reducao = buffer[:len(bloco)]
+        np.subtract(d1[None, :], bloco, out=reducao)
+        np.maximum(reducao, 0.0, out=reducao)
+        ganhos[inicio:inicio + len(bloco)] = reducao @ pesos
+    ganhos[abertas] = -np.inf
+    atualizado = np.ones(m, dtype=bool)
+
+    while len(abertas) < n_hospitais:
+        while True:
+            j = int(np.argmax(ganhos))
+            if atualizado[j]:
+                break
+            ganhos[j] = np.maximum(d1 - Dt[j], 0.0) @ pesos
+            atualizado[j] = True
+        abertas.append(j)
+        ganhos[j] = -np.inf
+        np.minimum(d1, Dt[j], out=d1)
+        atualizado[:] = False
+    return abertas
+
+
+def melhoria_por_trocas(pesos, Dt, abertas, max_trocas=None, tolerancia=1e-9):
+    """
+    Aplica trocas (fecha r, abre j) enquanto alguma reduzir o custo total.
+
+    Os candidatos são percorridos em blocos; a melhor troca de cada bloco é
+    aplicada assim que encontrada (primeira melhoria por bloco) e os vetores
+    de mais próximo/segundo mais próximo são recalculados só nesse momento.
+    A busca termina após uma volta completa pelos candidatos sem melhoria.
+
+    'Dt' é a matriz candidatos x demanda, como em construcao_gulosa.
+    Retorna (abertas, trocas).
+    """
+    m, n = Dt.shape
+    p = len(abertas)
+    abertas = list(abertas)
+    tamanho_bloco = max(1, VALORES_POR_BLOCO // max(n, 1))
+    blocos = [(inicio, min(inicio + tamanho_bloco, m)) for inicio in range(0, m, tamanho_bloco)]
+
+    fechada = np.ones(m, dtype=bool)
+    fechada[abertas] = False
+    posicao, d1, d2 = _mais_proximos(Dt, abertas)
+    agrupamento = _agrupamento(pesos, posicao, p)
+    custo = float(pesos @ d1)
+    trocas = 0
+
+    b = 0
+    sem_melhoria = 0
+    while sem_melhoria < len(blocos) and (max_trocas is None or trocas < max_trocas):
+        inicio, fim = blocos[b]
+        b = (b + 1) % len(blocos)
+        bloco = Dt[inicio:fim]
+
+        # Ganho de abrir j: demandas que passam a ser atendidas por j
+        # independentemente de qual hospital feche
+        reducao = d1[None, :] - bloco
+        mais_perto = reducao > 0
+        ganho = np.maximum(reducao, 0.0, out=reducao) @ pesos
+        # Perda de fechar r (com j aberto): as demandas cujo mais próximo
+        # era r vão para o melhor entre j e o segundo mais próximo; a matriz
+        # de agrupamento soma essas perdas por r
+        extra = np.minimum(bloco, d2[None, :])
+        extra -= d1[None, :]
+        extra[mais_perto] = 0.0
+        delta = extra @ agrupamento - ganho[:, None]
+        delta[~fechada[inicio:fim]] = np.inf
+
+        k, r = np.unravel_index(np.argmin(delta), delta.shape)
+        if delta[k, r] < -tolerancia * max(custo, 1.0):
+            j = inicio + int(k)
+            fechada[abertas[r]] = True
+            fechada[j] = False
+            abertas[r] = j
+            posicao, d1, d2 = _mais_proximos(Dt, abertas)
+            agrupamento = _agrupamento(pesos, posicao, p)
+            custo = float(pesos @ d1)
+            trocas += 1
+            sem_melhoria = 0
+        else:
+            sem_melhoria += 1
+
+    return abertas, trocas
+
+
+def resolver_p_mediana_heuristica(pesos, D, n_hospitais, max_trocas=None, abertas_iniciais=None):
+    """
+    Construção gulosa seguida de melhoria por trocas. Com
+    'abertas_iniciais' (posições de n_hospitais candidatos), as trocas
+    partem delas e a construção gulosa é pulada.
+
+    Recebe os mesmos vetor de pesos (n) e matriz demanda x candidatos (n x m)
+    de resolver_p_mediana. Retorna (x, objetivo, trocas), com x um vetor 0/1
+    de tamanho m, ou (None, None, 0) se não houver candidatos suficientes.
+    """
+    pesos = np.asarray(pesos, dtype=np.float64)
+    Dt = np.ascontiguousarray(_preparar_distancias(np.asarray(D, dtype=np.float64)).T)
+    m, n = Dt.shape
+    if m < n_hospitais:
+        print(f"❌ Erro: {m} candidatos para {n_hospitais} hospitais.")
+        return None, None, 0
+
+    start_time = time.time()
+    if abertas_iniciais is None:
+        abertas = construcao_gulosa(pesos, Dt, n_hospitais)
+    else:
+        abertas = np.asarray(abertas_iniciais, dtype=np.int64)
+    custo_guloso = float(Dt[abertas].min(axis=0) @ pesos)
+    if abertas_iniciais is None:
+        print(f"Construção gulosa: custo {custo_guloso:,.2f} em {time.time() - start_time:.2f} segundos.")
+
+    start_time = time.time()
+    abertas, trocas = melhoria_por_trocas(pesos, Dt, abertas, max_trocas=max_trocas)
+    objetivo = float(Dt[abertas].min(axis=0) @ pesos)
+    print(f"Melhoria por trocas: custo {objetivo:,.2f} após {trocas} trocas "
+          f"em {time.time() - start_time:.2f} segundos.")
+
+    anotar(solver={'metodo': 'heuristica', 'objetivo_guloso': custo_guloso, 'objetivo': objetivo, 'trocas': trocas})
+    x = np.zeros(m)
+    x[abertas] = 1.0
+    return x, objetivo, trocas
+
+
+def gap_percentual(objetivo, limite_inferior):
+    """Distância relativa (%) entre a solução e um limite inferior (ex.: o da relaxação linear)."""
+    if limite_inferior is None or objetivo is None:
+        return None
+    return 100.0 * (objetivo - limite_inferior) / max(abs(objetivo), 1e-12)
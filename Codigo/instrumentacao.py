@@ -0,0 +1,375 @@
+# -*- coding: utf-8 -*-
+"""
+Registro estruturado do que cada etapa de uma execução gastou.
+
+Para cada etapa aberta com 'with etapa(nome):' são medidos o tempo de
+relógio, o tempo de CPU (do processo e dos processos filhos já
+encerrados, como os de um mp.Pool) e a memória residente (RSS) no início,
+no pico e no fim. As funções de cálculo acrescentam à etapa em andamento o
+que só elas sabem com anotar(...): tamanho do modelo (variáveis,
+restrições, não-nulos) e estatísticas do solver (iterações, nós do
+branch-and-bound, limite dual, gap, tempo até a primeira solução inteira).
+
+Sem um RegistroExecucao ativo, etapa() e anotar() não fazem nada além de
+medir, então as funções continuam funcionando da mesma forma quando
+chamadas fora de um script instrumentado. Etapas dentro de etapas ficam
+com o nome composto ('localizacao/resolucao').
+
+Ao final, RegistroExecucao.salvar() grava um JSON com tudo (ambiente,
+parâmetros e etapas) e acrescenta uma linha por etapa a um CSV de
+histórico, para acompanhar a evolução entre execuções.
+"""
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import scipy
+
+try:
+    import resource
+except ImportError:
+    # Windows: sem getrusage (CPU dos processos filhos não é medida)
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+PASTA_REGISTROS = os.path.join('Arquivos', 'registros')
+PASTA_CODIGO = os.path.dirname(os.path.abspath(__file__))
+
+
+# --- Memória ---
+
+def _working_set_windows():
+    """Working set do processo (o RSS do Windows), em bytes, pela API do sistema."""
+    import ctypes
+    from ctypes import wintypes
+
+    class ContadoresMemoria(ctypes.Structure):
+        _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+    contadores = ContadoresMemoria()
+    contadores.cb = ctypes.sizeof(contadores)
+    processo = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(processo, ctypes.byref(contadores), contadores.cb):
+        return 0
+    return int(contadores.WorkingSetSize)
+
+
+def _rss_atual():
+    """
+    Memória residente do processo, em bytes: /proc/self/statm no Linux;
+    senão psutil, getrusage (o pico da vida do processo) ou, no Windows
+    sem psutil, o working set.
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    if resource is not None:
+        # O máximo da vida do processo é o que há (KiB no Linux, bytes no macOS)
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico if sys.platform == 'darwin' else pico * 1024
+    if sys.platform == 'win32':
+        return _working_set_windows()
+    return 0
+
+
+def _cpu_filhos():
+    """CPU (s) dos processos filhos já encerrados; None onde não há getrusage."""
+    if resource is None:
+        return None
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return filhos.ru_utime + filhos.ru_stime
+
+
+class MonitorMemoria:
+    """Amostra o RSS numa thread separada e guarda o maior valor visto."""
+
+    def __init__(self, intervalo=0.005):
+        self.intervalo = intervalo
+        self.pico = 0
+        self._parar = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.inicial = _rss_atual()
+        self.pico = self.inicial
+        self._thread = threading.Thread(target=self._amostrar, daemon=True)
+        self._thread.start()
+        return self
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo):
+            self.pico = max(self.pico, _rss_atual())
+
+    def __exit__(self, *excecao):
+        self._parar.set()
+        self._thread.join()
+        self.pico = max(self.pico, _rss_atual())
+        return False
+
+
+def medir(funcao, repeticoes=1):
+    """
+    Executa 'funcao' 'repeticoes' vezes. Retorna (último resultado, medidas),
+    com os tempos de cada execução e o pico de RSS acima do início.
+    """
+    tempos, picos = [], []
+    resultado = None
+    for _ in range(repeticoes):
+        with MonitorMemoria() as monitor:
+            inicio = time.perf_counter()
+            resultado = funcao()
+            tempos.append(time.perf_counter() - inicio)
+        picos.append(monitor.pico - monitor.inicial)
+    return resultado, {
+        'tempo_s': float(np.median(tempos)),
+        'tempo_min_s': float(np.min(tempos)),
+        'tempos_s': tempos,
+        'pico_memoria_mb': float(np.max(picos)) / 2**20,
+    }
+
+
+# --- Solver ---
+
+def estatisticas_highs(h, inteiro=False):
+    """Estatísticas da última execução de um highspy.Highs."""
+    info = h.getInfo()
+    estatisticas = {
+        'status': h.modelStatusToString(h.getModelStatus()),
+        'objetivo': float(info.objective_function_value),
+        # O HiGHS informa -1 para o método que não foi usado
+        'iteracoes_simplex': max(int(info.simplex_iteration_count), 0),
+        'iteracoes_ipm': max(int(info.ipm_iteration_count), 0),
+    }
+    if inteiro:
+        estatisticas.update({'nos_bb': int(info.mip_node_count), 'limite_dual': float(info.mip_dual_bound),
+                             'gap': float(info.mip_gap)})
+    return estatisticas
+
+
+# Nomes dos códigos de status de scipy.optimize.milp, como os do PuLP
+NOMES_STATUS = {0: 'Optimal', 1: 'Not Solved', 2: 'Infeasible', 3: 'Unbounded', 4: 'Not Solved'}
+
+
+def estatisticas_milp(resultado):
+    """Estatísticas de um resultado de scipy.optimize.milp (também HiGHS)."""
+    estatisticas = {'status': resultado.message, 'objetivo': None if resultado.fun is None else float(resultado.fun)}
+    for campo, nome in (('mip_node_count', 'nos_bb'), ('mip_dual_bound', 'limite_dual'), ('mip_gap', 'gap')):
+        valor = getattr(resultado, campo, None)
+        if valor is not None:
+            estatisticas[nome] = float(valor) if nome != 'nos_bb' else int(valor)
+    return estatisticas
+
+
+def acompanhar_incumbentes(h):
+    """
+    Registra, durante h.run(), cada nova melhor solução inteira encontrada
+    pelo HiGHS. Retorna a lista (preenchida durante a execução) de
+    (tempo em segundos desde o início da execução, objetivo).
+    """
+    incumbentes = []
+
+    def ao_melhorar(evento):
+        incumbentes.append((float(evento.data_out.running_time), float(evento.data_out.objective_function_value)))
+
+    h.cbMipImprovingSolution.subscribe(ao_melhorar)
+    return incumbentes
+
+
+def acompanhar_limites(h, inicio=0.0, primal=np.inf, dual=-np.inf, ao_registrar=None):
+    """
+    Registra a evolução dos limites primal (melhor solução inteira) e dual
+    durante h.run() de um MIP. 'inicio' desloca os tempos (ex.: o que já
+    foi gasto antes do branch-and-bound) e 'primal'/'dual' são limites já
+    conhecidos, combinados com os do HiGHS. Retorna a lista (preenchida
+    durante a execução) de (tempo, primal, dual, gap).
+
+    Os eventos de log do MIP só são emitidos com 'output_flag' ligado; a
+    saída no console fica como estava.
+    """
+    limites = [(float(inicio), float(primal), float(dual), _gap(primal, dual))]
+
+    def registrar(evento):
+        dados = evento.data_out
+        melhor_primal = min(limites[-1][1], float(dados.mip_primal_bound))
+        melhor_dual = max(limites[-1][2], float(dados.mip_dual_bound))
+        if (melhor_primal, melhor_dual) == limites[-1][1:3]:
+            return
+        limites.append((inicio + float(dados.running_time), melhor_primal, melhor_dual, _gap(melhor_primal, melhor_dual)))
+        if ao_registrar is not None:
+            ao_registrar(*limites[-1])
+
+    if not h.getOptionValue('output_flag'):
+        h.setOptionValue('log_to_console', False)
+        h.setOptionValue('output_flag', True)
+    h.cbMipLogging.subscribe(registrar)
+    h.cbMipImprovingSolution.subscribe(registrar)
+    return limites
+
+
+def _gap(primal, dual):
+    if not np.isfinite(primal) or not np.isfinite(dual):
+        return np.inf
+    return (primal - dual) / max(abs(primal), 1e-12)
+
+
+def resumir_incumbentes(incumbentes):
+    if not incumbentes:
+        return {'incumbentes': 0}
+    return {'incumbentes': len(incumbentes), 'tempo_primeira_solucao_s': incumbentes[0][0]}
+
+
+def tamanho_modelo(n_variaveis, n_restricoes, nao_nulos):
+    return {'variaveis': int(n_variaveis), 'restricoes': int(n_restricoes), 'nao_nulos': int(nao_nulos)}
+
+
+# --- Registro da execução ---
+
+# Registro ativo (o da execução em andamento) e pilha de etapas abertas
+_ativo = {'registro': None, 'etapas': []}
+
+
+def descrever_ambiente():
+    """Data, commit do repositório, versões e máquina."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=PASTA_CODIGO, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {'data': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': commit, 'python': platform.python_version(),
+            'numpy': np.__version__, 'scipy': scipy.__version__, 'plataforma': platform.platform(),
+            'processador': platform.processor(), 'cpus': os.cpu_count()}
+
+
+class RegistroExecucao:
+    """
+    Registro de uma execução. Fica ativo entre iniciar() e finalizar() (ou
+    dentro de um bloco 'with'): as etapas abertas com etapa() entram nele.
+    """
+
+    def __init__(self, nome, parametros=None):
+        self.nome = nome
+        self.parametros = parametros or {}
+        self.ambiente = descrever_ambiente()
+        self.etapas = []
+        self._anterior = None
+
+    def iniciar(self):
+        self._anterior = _ativo['registro']
+        _ativo['registro'] = self
+        self._inicio = time.perf_counter()
+        return self
+
+    def finalizar(self):
+        _ativo['registro'] = self._anterior
+        self.tempo_total_s = time.perf_counter() - self._inicio
+        return self
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *excecao):
+        self.finalizar()
+        return False
+
+    def para_dict(self):
+        return {'nome': self.nome, 'ambiente': self.ambiente, 'parametros': self.parametros,
+                'tempo_total_s': getattr(self, 'tempo_total_s', None), 'etapas': self.etapas}
+
+    def tabela(self):
+        """Uma linha por etapa; dicionários aninhados viram colunas 'grupo_campo'."""
+        linhas = []
+        for dados in self.etapas:
+            linha = {'execucao': self.ambiente['data'], 'nome': self.nome, 'commit': self.ambiente['commit']}
+            for chave, valor in dados.items():
+                if isinstance(valor, dict):
+                    linha.update({f'{chave}_{k}': v for k, v in valor.items() if not isinstance(v, (list, dict))})
+                elif not isinstance(valor, list):
+                    linha[chave] = valor
+            linhas.append(linha)
+        return pd.DataFrame(linhas)
+
+    def imprimir_resumo(self):
+        print(f"\n--- Registro da execução '{self.nome}' ---")
+        for dados in self.etapas:
+            print(f"{dados['etapa']:<28} {dados['tempo_s']:9.2f} s   CPU {dados['cpu_s'] + (dados['cpu_filhos_s'] or 0.0):9.2f} s"
+                  f"   pico {dados['rss_pico_mb']:9.1f} MB")
+
+    def salvar(self, pasta=PASTA_REGISTROS):
+        """
+        Grava '<pasta>/<nome>_<data>.json' e acrescenta as etapas ao histórico
+        '<pasta>/<nome>.csv'. Retorna (arquivo JSON, arquivo CSV).
+        """
+        os.makedirs(pasta, exist_ok=True)
+        data = self.ambiente['data'].replace('-', '').replace(':', '').replace('T', '_')
+        arquivo_json = os.path.join(pasta, f'{self.nome}_{data}.json')
+        with open(arquivo_json, 'w', encoding='utf-8') as f:
+            json.dump(self.para_dict(), f, indent=2, ensure_ascii=False, default=str)
+
+        arquivo_csv = os.path.join(pasta, f'{self.nome}.csv')
+        tabela = self.tabela()
+        if os.path.exists(arquivo_csv):
+            # Execuções anteriores podem ter outras colunas (outro solver, outro modo)
+            tabela = pd.concat([pd.read_csv(arquivo_csv, sep=';', decimal=','), tabela], ignore_index=True)
+        # convert_dtypes mantém inteiros como inteiros mesmo com colunas vazias
+        tabela.convert_dtypes().to_csv(arquivo_csv, index=False, sep=';', decimal=',')
+        print(f"✅ Registro da execução salvo em '{arquivo_json}' (histórico em '{arquivo_csv}').")
+        return arquivo_json, arquivo_csv
+
+
+def registro_ativo():
+    return _ativo['registro']
+
+
+@contextlib.contextmanager
+def etapa(nome):
+    """
+    Mede o bloco como uma etapa do registro ativo. O dicionário devolvido
+    pode receber dados extras da etapa (também via anotar()).
+    """
+    pilha = _ativo['etapas']
+    dados = {'etapa': '/'.join([e['etapa'] for e in pilha[-1:]] + [nome])}
+    pilha.append(dados)
+    cpu_filhos = _cpu_filhos()
+    inicio_cpu = time.process_time()
+    inicio = time.perf_counter()
+    try:
+        with MonitorMemoria() as monitor:
+            yield dados
+    finally:
+        pilha.pop()
+        filhos = _cpu_filhos()
+        dados.update({
+            'tempo_s': time.perf_counter() - inicio,
+            'cpu_s': time.process_time() - inicio_cpu,
+            'cpu_filhos_s': filhos - cpu_filhos if filhos is not None else None,
+            'rss_inicial_mb': monitor.inicial / 2**20,
+            'rss_pico_mb': monitor.pico / 2**20,
+            'rss_final_mb': _rss_atual() / 2**20,
+        })
+        registro = _ativo['registro']
+        if registro is not None:
+            registro.etapas.append(dados)
+
+
+def anotar(**dados):
+    """Acrescenta dados (ex.: modelo=..., solver=...) à etapa em andamento, se houver."""
+    if _ativo['etapas']:
+        _ativo['etapas'][-1].update(dados)
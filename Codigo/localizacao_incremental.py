@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Localização incremental: os hospitais e UPAs que já existem ficam fixos e
+o modelo escolhe só onde abrir os k novos.
+
+As unidades existentes são ancoradas no nó do grafo mais próximo e entram
+no modelo como um único vetor d0, a distância de cada demanda até a
+unidade existente mais próxima (um Dijkstra com várias origens). Como
+elas estão sempre abertas, o custo de uma demanda i é
+
+    min(d0_i, min_{j novo aberto} D_ij)
+
+e a heurística resolve as p-medianas com k hospitais sobre a matriz
+"cortada" D'_ij = min(D_ij, d0_i), sem nenhum outro ajuste.
+
+No modelo exato, cada demanda ganha uma variável y_i0 ("fica com a
+unidade existente", custo d0_i) e só existem os y_ij com D_ij < d0_i: os
+demais pares nunca são melhores que a unidade existente. Além disso:
+- um candidato que não fica mais perto que d0 de NENHUMA demanda não tem
+  como melhorar a solução e sai;
+- uma demanda que nenhum candidato restante atende melhor que d0 tem
+  custo fixo w_i d0_i e também sai (o custo é somado ao objetivo no fim).
+"""
+import time
+
+import numpy as np
+import scipy.sparse as sp
+import shapely
+
+from avaliacao import avaliar_localizacao
+from heuristica_p_mediana import resolver_p_mediana_heuristica
+from instrumentacao import anotar
+from modelo_matricial import ModeloPMediana, resolver_modelo
+
+
+def ancorar_unidades(G, unidades):
+    """
+    Nó do grafo mais próximo de cada unidade existente.
+
+    'unidades' é um GeoDataFrame com as colunas 'nome' e 'geometry' (em
+    qualquer CRS; é convertido para o do grafo). Retorna {nome: nó}.
+    """
+    unidades = unidades.to_crs(G.graph['crs'])
+    if hasattr(G, 'ids'):
+        nos = list(G.ids)
+        xy = np.column_stack([G.x, G.y]).astype(np.float64)
+    else:
+        nos = list(G.nodes())
+        xy = np.array([(G.nodes[node]['x'], G.nodes[node]['y']) for node in nos], dtype=np.float64)
+
+    # Geocodificações que voltam como polígonos (o terreno do hospital) usam o centróide
+    pontos = shapely.points(xy)
+    _, mais_proximo = shapely.STRtree(pontos).query_nearest(unidades.geometry.centroid.values, all_matches=False)
+    return {nome: nos[k] for nome, k in zip(unidades['nome'], mais_proximo)}
+
+
+def distancia_existentes(G, nos_existentes, demanda, peso='length'):
+    """Vetor com a distância de cada nó de 'demanda' até a unidade existente mais próxima."""
+    return avaliar_localizacao(G, nos_existentes, peso=peso, msg=False).posicoes_e_distancias(demanda)[1]
+
+
+class ReducaoIncremental:
+    """Demandas e candidatos que sobram no modelo incremental, com a matriz cortada."""
+
+    def __init__(self, demandas, candidatos, D, custo_fixo, sem_acesso):
+        self.demandas = demandas
+        self.candidatos = candidatos
+        self.D = D
+        self.custo_fixo = custo_fixo
+        self.sem_acesso = sem_acesso
+
+
+def reduzir_problema(pesos, D, d_existentes):
+    """
+    Retira os candidatos que não melhoram nenhuma demanda e as demandas que
+    nenhum candidato melhora. Retorna uma ReducaoIncremental com as
+    posições que sobraram e a matriz D' = min(D, d0) restrita a elas.
+    """
+    pesos = np.asarray(pesos, dtype=np.float64)
+    D = np.asarray(D, dtype=np.float64)
+    d_existentes = np.asarray(d_existentes, dtype=np.float64)
+
+    melhora = D < d_existentes[:, None]
+    candidatos = np.flatnonzero(melhora.any(axis=0))
+    demandas = np.flatnonzero(melhora[:, candidatos].any(axis=1))
+
+    fora = np.ones(len(pesos), dtype=bool)
+    fora[demandas] = False
+    # Fora do modelo e sem unidade existente alcançável: não há como atender
+    sem_acesso = fora & ~np.isfinite(d_existentes) & (pesos > 0)
+    fixas = fora & ~sem_acesso & (pesos > 0)
+    custo_fixo = float(pesos[fixas] @ d_existentes[fixas])
+
+    D_cortada = np.minimum(D[np.ix_(demandas, candidatos)], d_existentes[demandas, None])
+    return ReducaoIncremental(demandas, candidatos, D_cortada, custo_fixo, np.flatnonzero(sem_acesso))
+
+
+def construir_modelo_incremental(pesos, D_cortada, d_existentes, n_novos):
+    """
+    Modelo exato esparso sobre a matriz cortada (n x m) de reduzir_problema.
+
+    Variáveis: x_j (m), y_i0 (n) e y_ij só nos pares com D_ij < d0_i.
+    Linhas: sum_j x_j = k; y_i0 + sum_j y_ij = 1; y_ij - x_j <= 0.
+    Usa a mesma ordem (x_j primeiro) de modelo_matricial.ModeloPMediana.
+    """
+    n, m = D_cortada.shape
+    i, j = np.nonzero(D_cortada < d_existentes[:, None])
+    n_pares = len(i)
+    # Demandas sem unidade existente alcançável não podem usar y_i0
+    existente_alcancavel = np.isfinite(d_existentes)
+    custos_y0 = pesos * np.where(existente_alcancavel, d_existentes, 0.0)
+    c = np.concatenate([np.zeros(m), custos_y0, pesos[i] * D_cortada[i, j]])
+
+    col_y0 = m + np.arange(n)
+    col_y = m + n + np.arange(n_pares)
+    linha_logica = 1 + n + np.arange(n_pares)
+    linhas = np.concatenate([np.zeros(m, dtype=np.int64), 1 + np.arange(n), 1 + i, linha_logica, linha_logica])
+    colunas = np.concatenate([np.arange(m), col_y0, col_y, col_y, j])
+    valores = np.concatenate([np.ones(m), np.ones(n), np.ones(n_pares), np.ones(n_pares), -np.ones(n_pares)])
+    A = sp.csr_matrix((valores, (linhas, colunas)), shape=(1 + n + n_pares, m + n + n_pares))
+
+    limite_inf = np.concatenate([[n_novos], np.ones(n), np.full(n_pares, -np.inf)])
+    limite_sup = np.concatenate([[n_novos], np.ones(n), np.zeros(n_pares)])
+    limite_sup_colunas = np.concatenate([np.ones(m), existente_alcancavel.astype(np.float64), np.ones(n_pares)])
+    return ModeloPMediana(c, A, limite_inf, limite_sup, limite_sup_colunas, n, m)
+
+
+def resolver_localizacao_incremental(pesos, D, d_existentes, n_novos, modo='exato', inteiro=False, msg=True,
+                                     limite_tempo=None):
+    """
+    Escolhe os 'n_novos' hospitais entre as colunas de D (demanda x
+    candidatos) mantendo as unidades existentes, resumidas em d_existentes.
+
+    modo: 'heuristica' (heuristica_p_mediana.py) ou qualquer outro valor
+    para o modelo exato esparso (construir_modelo_incremental), com x_j
+    contínuo como em resolver_p_mediana, ou binário com inteiro=True.
+    Com inteiro=True e 'limite_tempo' (segundos, contando a redução), o
+    branch-and-bound para nesse tempo com a melhor solução encontrada.
+
+    Retorna (x, objetivo, status), com x do tamanho do número de colunas de
+    D (0 nos candidatos descartados) e o objetivo já somado ao custo das
+    demandas que ficaram com as unidades existentes.
+    """
+    pesos = np.asarray(pesos, dtype=np.float64)
+    d_existentes = np.asarray(d_existentes, dtype=np.float64)
+    m = np.shape(D)[1]
+    inicio = start_time = time.time()
+    reducao = reduzir_problema(pesos, D, d_existentes)
+    n_red, m_red = reducao.D.shape
+    print(f"Modelo incremental: {m_red} de {m} candidatos e {n_red} de {len(pesos)} demandas podem melhorar "
+          f"com hospitais novos ({time.time() - start_time:.2f} segundos).")
+    if len(reducao.sem_acesso):
+        print(f"⚠️ {len(reducao.sem_acesso)} demandas não alcançam nenhuma unidade existente nem candidato.")
+    anotar(incremental={'candidatos': m, 'candidatos_uteis': m_red, 'demandas': len(pesos),
+                        'demandas_afetadas': n_red, 'custo_fixo': reducao.custo_fixo})
+
+    x = np.zeros(m)
+    if m_red <= n_novos:
+        # Todos os candidatos úteis cabem: abrir cada um deles é ótimo
+        print(f"{m_red} candidatos úteis para {n_novos} hospitais novos: todos são abertos.")
+        x[reducao.candidatos] = 1.0
+        custo = float(pesos[reducao.demandas] @ reducao.D.min(axis=1)) if m_red else 0.0
+        return x, reducao.custo_fixo + custo, 'Optimal'
+
+    pesos_red = pesos[reducao.demandas]
+    if modo == 'heuristica':
+        x_red, objetivo, _ = resolver_p_mediana_heuristica(pesos_red, reducao.D, n_novos)
+        status = 'Optimal' if x_red is not None else 'Not Solved'
+    else:
+        start_time = time.time()
+        modelo = construir_modelo_incremental(pesos_red, reducao.D, d_existentes[reducao.demandas], n_novos)
+        print(f"Modelo montado em {time.time() - start_time:.2f} segundos "
+              f"({modelo.n_variaveis} variáveis, {modelo.n_restricoes} restrições, {modelo.A.nnz} não-nulos; "
+              f"o completo teria {m + len(pesos) * m} variáveis).")
+        restante = None
+        if inteiro and limite_tempo is not None:
+            restante = max(float(limite_tempo) - (time.time() - inicio), 1.0)
+        x_red, objetivo, status = resolver_modelo(modelo, inteiro=inteiro, msg=msg, limite_tempo=restante)
+    if x_red is None:
+        return None, None, status
+
+    x[reducao.candidatos] = x_red
+    return x, reducao.custo_fixo + objetivo, status
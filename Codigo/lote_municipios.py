@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+Executa a cadeia população -> difusão -> distâncias -> localização para
+vários municípios de uma vez, um município por processo.
+
+Os arquivos grandes, compartilhados por todos (o CSV nacional do censo e o
+shapefile do estado), são lidos uma única vez, já filtrados para a lista
+de municípios (ver dados_censo.py); cada processo recebe só os setores e a
+população do seu município. Os grafos vêm de arquivos GraphML já baixados,
+então o lote roda sem internet; com 'baixar_faltantes', os que faltarem
+são baixados antes (no processo principal, um de cada vez).
+
+Cada município ganha a pasta '<pasta_saida>/<codigo>/' com as populações
+(original e suavizada), o armazém de distâncias demanda x candidatos, o
+CSV de resultados e o registro da execução (instrumentacao.py). Um erro em
+um município não interrompe os outros: ele aparece na tabela-resumo
+'<pasta_saida>/resumo_municipios.csv', que tem uma linha por município.
+"""
+import importlib
+import multiprocessing as mp
+import os
+import pickle
+import sys
+import time
+
+import pandas as pd
+
+from armazem_distancias import abrir_armazem
+from calculo_distancias import calcular_distancias_restritas
+from dados_censo import carregar_populacao_setores, carregar_setores
+from grafo_compacto import carregar_grafo
+from instrumentacao import RegistroExecucao, etapa
+
+PASTA_LOTE = os.path.join('Arquivos', 'lote')
+PASTA_GRAFOS = os.path.join('Arquivos', 'grafos')
+PASTA_CODIGO = os.path.dirname(os.path.abspath(__file__))
+
+# Os scripts numerados não são nomes válidos para 'import'; são carregados
+# com importlib (o bloco __main__ deles não é executado).
+if PASTA_CODIGO not in sys.path:
+    sys.path.insert(0, PASTA_CODIGO)
+
+
+def _script(nome):
+    return importlib.import_module(nome)
+
+
+def arquivo_grafo(municipio, pasta_grafos=PASTA_GRAFOS):
+    """GraphML do município: o informado em 'grafo' ou '<pasta_grafos>/<codigo>.graphml'."""
+    return municipio.get('grafo') or os.path.join(pasta_grafos, f"{municipio['codigo']}.graphml")
+
+
+def baixar_grafos_faltantes(municipios, pasta_grafos=PASTA_GRAFOS):
+    """Baixa do OpenStreetMap (pelo 'nome') os grafos que ainda não estão em disco."""
+    for municipio in municipios:
+        arquivo = arquivo_grafo(municipio, pasta_grafos)
+        if os.path.exists(arquivo):
+            continue
+        if not municipio.get('nome'):
+            print(f"❌ Erro: O município {municipio['codigo']} não tem grafo nem nome para baixá-lo.")
+            continue
+        os.makedirs(os.path.dirname(arquivo) or '.', exist_ok=True)
+        _script('1_grafo').extrair_e_salvar_grafo(municipio['nome'], arquivo)
+
+
+def processar_municipio(municipio, setores, populacao, parametros, pasta_saida=PASTA_LOTE,
+                        pasta_grafos=PASTA_GRAFOS):
+    """
+    Roda todas as etapas para um município, com os setores (GeoDataFrame) e
+    a tabela de população só dele. Retorna a linha da tabela-resumo.
+    """
+    codigo = municipio['codigo']
+    pasta = os.path.join(pasta_saida, codigo)
+    os.makedirs(pasta, exist_ok=True)
+    arquivo_populacao = os.path.join(pasta, 'populacoes_nos.pkl')
+    arquivo_suavizada = os.path.join(pasta, 'populacoes_suavizadas.pkl')
+    n_hospitais = parametros['n_hospitais']
+    populacao_minima = parametros['populacao_minima']
+
+    resumo = {'codigo': codigo, 'nome': municipio.get('nome', ''), 'status': 'ok'}
+    print(f"\n=== Município {codigo} {municipio.get('nome', '')} ===")
+    start_time = time.time()
+    registro = RegistroExecucao(f'municipio_{codigo}', parametros).iniciar()
+    try:
+        with etapa('grafo'):
+            G = carregar_grafo(arquivo_grafo(municipio, pasta_grafos), arquivo_populacao, arquivo_suavizada,
+                               caminho_base=os.path.join(pasta, 'grafo_compacto'))
+        resumo.update(n_nos=G.n_nos, n_arestas=G.n_arestas, n_setores=len(setores))
+
+        with etapa('populacao'):
+            metodo = parametros['metodo_alocacao']
+            # A busca do nó mais próximo do centróide precisa do grafo do NetworkX
+            G_alocacao = G.networkx() if metodo == 'centroide' else G
+            populacoes = _script('2_densidade').mapear_populacao_para_nos(G_alocacao, setores, populacao, codigo,
+                                                                          metodo)
+            if populacoes is None:
+                raise RuntimeError("nenhum setor censitário do município foi encontrado.")
+            with open(arquivo_populacao, 'wb') as f:
+                pickle.dump(populacoes, f)
+
+        with etapa('difusao'):
+            suavizadas = _script('3_difusao').suavizar_populacao(G, populacoes, parametros['numero_de_iteracoes'],
+                                                                 parametros['fator_de_retencao'])
+            with open(arquivo_suavizada, 'wb') as f:
+                pickle.dump(suavizadas, f)
+
+        # Só as distâncias que o modelo usa: todos os nós x candidatos
+        candidatos = [node for node, pop in suavizadas.items() if pop >= populacao_minima]
+        resumo['n_candidatos'] = len(candidatos)
+        if len(candidatos) < n_hospitais:
+            raise RuntimeError(f"{len(candidatos)} candidatos com população >= {populacao_minima} "
+                               f"para {n_hospitais} hospitais.")
+        with etapa('distancias'):
+            caminho_armazem = os.path.join(pasta, 'matriz_distancias')
+            calcular_distancias_restritas(G, list(G.nodes()), candidatos, caminho_armazem)
+            distancias = abrir_armazem(caminho_armazem)
+
+        with etapa('localizacao'):
+            final = _script('5_final')
+            resultados, objetivo = final.resolver_localizacao_hospitais_com_objetivo(
+                G, suavizadas, distancias, n_hospitais, populacao_minima, parametros['modo'],
+                limite_tempo=parametros.get('limite_tempo_s'))
+            if resultados is None:
+                raise RuntimeError("o modelo de localização não foi resolvido.")
+            final.exportar_resultados_csv(G, resultados, os.path.join(pasta, 'resultados_probabilidades.csv'),
+                                         n_hospitais=n_hospitais)
+
+        populacao_total = sum(suavizadas.values())
+        hospitais = sorted(resultados, key=resultados.get, reverse=True)[:n_hospitais]
+        resumo.update(populacao=populacao_total, objetivo=objetivo,
+                      distancia_media_m=objetivo / populacao_total if populacao_total else None,
+                      hospitais=' '.join(str(node) for node in hospitais))
+    except Exception as e:
+        print(f"❌ Erro no município {codigo}: {e}")
+        resumo.update(status='erro', erro=str(e))
+    finally:
+        registro.finalizar()
+        registro.salvar(pasta)
+
+    resumo['tempo_s'] = time.time() - start_time
+    return resumo
+
+
+# Parâmetros de cada processo do lote, enviados uma única vez pelo
+# inicializador do pool
+_lote = {}
+
+
+def _inicializar_lote(parametros, pasta_saida, pasta_grafos):
+    _lote.update(parametros=parametros, pasta_saida=pasta_saida, pasta_grafos=pasta_grafos)
+
+
+def _processar_tarefa(tarefa):
+    municipio, setores, populacao = tarefa
+    return processar_municipio(municipio, setores, populacao, _lote['parametros'], _lote['pasta_saida'],
+                               _lote['pasta_grafos'])
+
+
+def executar_lote(municipios, arquivo_setores, arquivo_populacao, parametros, pasta_saida=PASTA_LOTE,
+                  pasta_grafos=PASTA_GRAFOS, n_processos=None, baixar_faltantes=False):
+    """
+    Processa a lista de 'municipios' (dicionários com 'codigo' e,
+    opcionalmente, 'nome' e 'grafo') em paralelo, com 'n_processos'
+    processos (None = um por CPU).
+
+    Retorna a tabela-resumo (DataFrame), também gravada em
+    '<pasta_saida>/resumo_municipios.csv'.
+    """
+    start_time = time.time()
+    os.makedirs(pasta_saida, exist_ok=True)
+    if baixar_faltantes:
+        baixar_grafos_faltantes(municipios, pasta_grafos)
+
+    resumos = []
+    prontos = []
+    for municipio in municipios:
+        if os.path.exists(arquivo_grafo(municipio, pasta_grafos)):
+            prontos.append(municipio)
+        else:
+            print(f"❌ Erro: Grafo do município {municipio['codigo']} não encontrado "
+                  f"('{arquivo_grafo(municipio, pasta_grafos)}').")
+            resumos.append({'codigo': municipio['codigo'], 'nome': municipio.get('nome', ''), 'status': 'sem_grafo'})
+
+    # Os arquivos compartilhados são lidos uma única vez para todo o lote;
+    # cada município reprojeta os seus setores para o CRS do próprio grafo
+    codigos = [m['codigo'] for m in prontos]
+    setores = carregar_setores(arquivo_setores, codigos)
+    populacao = carregar_populacao_setores(arquivo_populacao, codigos)
+    municipio_setor = setores['CD_SETOR'].astype(str).str[:7]
+    tarefas = [(m, setores[municipio_setor == m['codigo']].reset_index(drop=True),
+                populacao[populacao['CD_MUN'] == m['codigo']].reset_index(drop=True)) for m in prontos]
+    # Municípios maiores primeiro: o pool não fica esperando um grande no final
+    tarefas.sort(key=lambda t: len(t[1]), reverse=True)
+
+    n_processos = max(1, min(n_processos or os.cpu_count(), len(tarefas)))
+    print(f"\nProcessando {len(tarefas)} município(s) com {n_processos} processo(s)...")
+    if n_processos > 1:
+        with mp.Pool(n_processos, initializer=_inicializar_lote,
+                     initargs=(parametros, pasta_saida, pasta_grafos)) as pool:
+            resumos += list(pool.imap_unordered(_processar_tarefa, tarefas))
+    else:
+        _inicializar_lote(parametros, pasta_saida, pasta_grafos)
+        resumos += [_processar_tarefa(t) for t in tarefas]
+
+    # Mesma ordem da lista de entrada
+    ordem = {m['codigo']: k for k, m in enumerate(municipios)}
+    resumo = pd.DataFrame(sorted(resumos, key=lambda r: ordem[r['codigo']]))
+    arquivo_resumo = os.path.join(pasta_saida, 'resumo_municipios.csv')
+    resumo.convert_dtypes().to_csv(arquivo_resumo, index=False, sep=';', decimal=',')
+
+    ok = int((resumo['status'] == 'ok').sum())
+    print(f"\n✅ Lote concluído em {time.time() - start_time:.1f} segundos: {ok} de {len(municipios)} "
+          f"município(s) resolvido(s). Resumo em '{arquivo_resumo}'.")
+    return resumo
+
+
+# --- Execução Principal ---
+if __name__ == "__main__":
+    path_arquivos = 'Arquivos'
+
+    # --- PARÂMETROS ---
+    # 'grafo' é opcional: sem ele, usa '<PASTA_GRAFOS>/<codigo>.graphml'
+    MUNICIPIOS = [
+        {'codigo': '3548906', 'nome': "São Carlos, São Paulo, Brazil",
+         'grafo': os.path.join(path_arquivos, 'sao_carlos_grafo_preciso.graphml')},
+        {'codigo': '3503208', 'nome': "Araraquara, São Paulo, Brazil"},
+        {'codigo': '3543402', 'nome': "Ribeirão Preto, São Paulo, Brazil"},
+    ]
+    ARQUIVO_SHAPEFILE_SETORES = os.path.join(path_arquivos, 'SP_Setores_CD2022.shp')
+    ARQUIVO_CSV_POPULACAO = os.path.join(path_arquivos, 'Agregados_por_setores_basico_BR_20250417.csv')
+    PARAMETROS = {
+        # 'centroide', 'comprimento' ou 'voronoi' (ver 2_densidade.py)
+        'metodo_alocacao': 'comprimento',
+        'numero_de_iteracoes': 3,
+        'fator_de_retencao': 0.4,
+        'n_hospitais': 9,
+        'populacao_minima': 200,
+        'modo': 'completo',
+    }
+    NUMERO_DE_PROCESSOS = os.cpu_count()
+    # Sem internet, deixe False: municípios sem GraphML aparecem no resumo como 'sem_grafo'
+    BAIXAR_GRAFOS_FALTANTES = False
+
+    for f in [ARQUIVO_SHAPEFILE_SETORES, ARQUIVO_CSV_POPULACAO]:
+        if not os.path.exists(f):
+            print(f"❌ Erro: Arquivo de entrada não encontrado: '{f}'")
+            sys.exit(1)
+
+    executar_lote(MUNICIPIOS, ARQUIVO_SHAPEFILE_SETORES, ARQUIVO_CSV_POPULACAO, PARAMETROS,
+                  n_processos=NUMERO_DE_PROCESSOS, baixar_faltantes=BAIXAR_GRAFOS_FALTANTES)
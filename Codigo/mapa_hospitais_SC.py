@@ -7,11 +7,15 @@ Requisitos:
 
 O script:
 - geocodifica os endereços/nome das unidades (adiciona ", Sao Carlos, SP, Brazil" para precisão)
+- grava as coordenadas em `Arquivos/unidades_existentes.csv` (usado pelo modo
+  incremental do `5_final.py`, que mantém essas unidades fixas)
 - baixa a malha viária da cidade (network_type='drive')
 - plota a malha e marca os pontos com rótulos
 - salva `mapa_hospitais_saocarlos.png`
 
-Observação: a geocodificação e o download de dados OSM dependem de internet.
+Observação: a geocodificação e o download de dados OSM dependem de internet
+na primeira execução; as respostas ficam no cache do OSM (cache_osm.py) e,
+com OFFLINE = True, o script roda só com elas.
 """
 
 import os
@@ -20,6 +24,8 @@ import pandas as pd
 import geopandas as gpd
 import matplotlib.pyplot as plt
 
+from cache_osm import cache_padrao
+
 # ox.config não é mais necessário nas versões novas do OSMnx
 # Apenas removido
 
@@ -35,60 +41,113 @@ places = {
     "UPA Santa Felicia": "UPA Santa Felicia, Sao Carlos, SP, Brazil",
 }
 
-# Geocodifica cada local e armazena em um GeoDataFrame
-geocoded = []
-for key, query in places.items():
+ARQUIVO_UNIDADES = os.path.join('Arquivos', 'unidades_existentes.csv')
+
+
+def geocodificar_unidades(locais=places, cache=None):
+    """
+    Geocodifica cada local e retorna um GeoDataFrame (EPSG:4326) com as
+    colunas 'nome' e 'geometry' (o ponto, ou o centróide do polígono).
+    """
+    cache = cache or cache_padrao()
+    geocoded = []
+    for key, query in locais.items():
+        try:
+            gdf = cache.geocodificar(query)
+            gdf = gdf.assign(nome=key)
+            geocoded.append(gdf)
+            print(f"Geocodificado: {key} -> {gdf.geometry.iloc[0].centroid.y:.6f}, {gdf.geometry.iloc[0].centroid.x:.6f}")
+        except Exception as e:
+            print(f"Falha ao geocodificar {key}: {e}")
+
+    if not geocoded:
+        raise SystemExit("Nenhum ponto foi geocodificado. Verifique a conexão de internet e as dependências.")
+
+    points_gdf = gpd.GeoDataFrame(pd.concat(geocoded, ignore_index=True)) if len(geocoded) > 1 else geocoded[0]
+    points_gdf = points_gdf.set_crs(epsg=4326, allow_override=True)
+    # Usa centróide caso a geometria não seja ponto (ex.: o terreno do hospital)
+    centroides = points_gdf.to_crs(points_gdf.estimate_utm_crs()).geometry.centroid.to_crs(epsg=4326)
+    return gpd.GeoDataFrame({'nome': points_gdf['nome']}, geometry=centroides.values, crs='EPSG:4326')
+
+
+def gravar_unidades(unidades, arquivo=ARQUIVO_UNIDADES):
+    """Grava nome, latitude e longitude das unidades em CSV."""
+    tabela = pd.DataFrame({'nome': unidades['nome'], 'latitude': unidades.geometry.y,
+                           'longitude': unidades.geometry.x})
+    tabela.to_csv(arquivo, index=False, sep=';', decimal=',')
+    print(f"✅ {len(tabela)} unidades gravadas em '{arquivo}'.")
+
+
+def carregar_unidades(arquivo=ARQUIVO_UNIDADES, locais=places, cache=None):
+    """
+    Unidades existentes como GeoDataFrame (EPSG:4326). Lê o CSV gravado por
+    este script; se ele não existir, geocodifica os locais e o grava.
+    """
+    if not os.path.exists(arquivo):
+        print(f"'{arquivo}' não encontrado; geocodificando as unidades existentes...")
+        unidades = geocodificar_unidades(locais, cache)
+        gravar_unidades(unidades, arquivo)
+        return unidades
+    tabela = pd.read_csv(arquivo, sep=';', decimal=',')
+    return gpd.GeoDataFrame({'nome': tabela['nome']},
+                            geometry=gpd.points_from_xy(tabela['longitude'], tabela['latitude']), crs='EPSG:4326')
+
+
+def desenhar_mapa(points_gdf, place_name="São Carlos, São Paulo, Brazil", outfn=None, cache=None):
+    """Baixa a malha viária, desenha as unidades com rótulos e salva a figura em 'outfn'."""
+    cache = cache or cache_padrao()
+    print("Baixando malha viária de São Carlos (pode demorar alguns segundos)...")
+    G = cache.grafo_lugar(place_name, network_type="drive", simplify=True)
+
+    # Converte o grafo para GeoDataFrames (nodes/edges) e projeta tudo para coordenadas métricas
+    nodes, edges = ox.graph_to_gdfs(G, nodes=True, edges=True)
+    nodes_proj = ox.projection.project_gdf(nodes)
+    edges_proj = ox.projection.project_gdf(edges)
+    points_proj = points_gdf.to_crs(nodes_proj.crs)
+
+    # Plot
+    fig, ax = plt.subplots(figsize=(12, 12))
+
+    # desenha as vias
+    edges_proj.plot(ax=ax, linewidth=0.4)
+
+    # desenha os pontos (hospitais e UPAs)
+    points_proj.plot(ax=ax, markersize=80, marker='o', zorder=3, color='red')
+
+    # anota os pontos
+    for idx, row in points_proj.iterrows():
+        pt = row.geometry.centroid if row.geometry.geom_type != 'Point' else row.geometry
+        x, y = pt.x, pt.y
+        ax.annotate(row['nome'], xy=(x, y), xytext=(3, 3), textcoords='offset points', fontsize=9)
+
+    ax.set_title('Hospitais e UPAs - São Carlos (SP)')
+    ax.axis('off')
+
     try:
-        gdf = ox.geocoder.geocode_to_gdf(query)
-        gdf = gdf.assign(name=key)
-        geocoded.append(gdf)
-        print(f"Geocodificado: {key} -> {gdf.geometry.iloc[0].y:.6f}, {gdf.geometry.iloc[0].x:.6f}")
-    except Exception as e:
-        print(f"Falha ao geocodificar {key}: {e}")
-
-if not geocoded:
-    raise SystemExit("Nenhum ponto foi geocodificado. Verifique a conexão de internet e as dependências.")
-
-points_gdf = gpd.GeoDataFrame(pd.concat(geocoded, ignore_index=True)) if len(geocoded) > 1 else geocoded[0]
-points_gdf = points_gdf.set_crs(epsg=4326)
-
-# Baixa o grafo de ruas de São Carlos
-place_name = "São Carlos, São Paulo, Brazil"
-print("Baixando malha viária de São Carlos (pode demorar alguns segundos)...")
-G = ox.graph_from_place(place_name, network_type="drive")
-
-# Converte o grafo para GeoDataFrames (nodes/edges) e projeta tudo para coordenadas métricas
-nodes, edges = ox.graph_to_gdfs(G, nodes=True, edges=True)
-nodes_proj = ox.projection.project_gdf(nodes)
-edges_proj = ox.projection.project_gdf(edges)
-points_proj = points_gdf.to_crs(nodes_proj.crs)
-
-# Plot
-fig, ax = plt.subplots(figsize=(12, 12))
-
-# desenha as vias
-edges_proj.plot(ax=ax, linewidth=0.4)
-
-# desenha os pontos (hospitais e UPAs)
-points_proj.plot(ax=ax, markersize=80, marker='o', zorder=3, color='red')
-
-# anota os pontos
-for idx, row in points_proj.iterrows():
-    # Usa centróide caso a geometria não seja ponto
-    pt = row.geometry.centroid if row.geometry.geom_type != 'Point' else row.geometry
-    x, y = pt.x, pt.y
-    ax.annotate(row['name'], xy=(x, y), xytext=(3, 3), textcoords='offset points', fontsize=9)
-
-ax.set_title('Hospitais e UPAs - S\u00e3o Carlos (SP)')
-ax.axis('off')
-
-try:
-    ax.set_box_aspect(1)  # Matplotlib >= 3.3
-except Exception:
-    ax.set_aspect('equal', adjustable='box')
-
-outfn = os.path.join('..','Relatorio', 'Imagens', 'mapa_hospitais_saocarlos.pdf')
-plt.tight_layout()
-plt.savefig(outfn, dpi=300)
-print(f"Mapa salvo em: {os.path.abspath(outfn)}")
-plt.show()
+        ax.set_box_aspect(1)  # Matplotlib >= 3.3
+    except Exception:
+        ax.set_aspect('equal', adjustable='box')
+
+    plt.tight_layout()
+    if outfn:
+        plt.savefig(outfn, dpi=300)
+        print(f"Mapa salvo em: {os.path.abspath(outfn)}")
+    return fig, ax
+
+
+if __name__ == "__main__":
+    # --- PARÂMETROS ---
+    # Sem internet: usa só as respostas do cache ('Arquivos/cache_osm/' ou
+    # PASTA_RESPOSTAS_OSM, uma cópia de um cache feito com internet)
+    OFFLINE = False
+    PASTA_RESPOSTAS_OSM = None
+
+    cache = cache_padrao(offline=OFFLINE, pasta_respostas=PASTA_RESPOSTAS_OSM)
+    # Geocodifica cada local e armazena em um GeoDataFrame
+    points_gdf = geocodificar_unidades(places, cache)
+    gravar_unidades(points_gdf)
+
+    desenhar_mapa(points_gdf, outfn=os.path.join('..', 'Relatorio', 'Imagens', 'mapa_hospitais_saocarlos.pdf'),
+                  cache=cache)
+    cache.imprimir_estatisticas()
+    plt.show()
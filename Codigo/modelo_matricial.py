@@ -0,0 +1,679 @@
+# -*- coding: utf-8 -*-
+"""
+Montagem matricial do modelo de localização de hospitais (p-medianas).
+
+Em vez de criar um objeto do PuLP para cada variável e cada restrição, o
+vetor de custos e a matriz de restrições são montados diretamente como
+arrays NumPy/SciPy esparsos a partir da matriz de distâncias e do vetor de
+população, e enviados ao HiGHS (scipy.optimize.milp) na própria memória,
+sem gravar arquivo .lp/.mps.
+
+Para o modelo do grafo completo há também um modo "preguiçoso": as
+restrições y_ij <= x_j só entram no modelo quando são violadas, e o HiGHS
+(via highspy) reaproveita a base da rodada anterior a cada re-solução.
+A varredura de p (varrer_p_mediana) também usa um único modelo no highspy,
+mudando só o número de hospitais entre uma solução e a seguinte.
+
+Ordem das variáveis: x_j (um por candidato), seguidos de y_ij na ordem
+(i, j) = (0, 0), (0, 1), ..., isto é, a coluna de y_ij é m + i*m + j.
+
+Ordem das linhas:
+    0                      -> Num_Hospitais:          sum_j x_j = p
+    1 .. n                 -> Atendimento_Garantido:  sum_j y_ij = 1
+    n+1 .. n+n*m           -> Logica_Atendimento:     y_ij - x_j <= 0
+"""
+import multiprocessing as mp
+import time
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.optimize import Bounds, LinearConstraint, milp
+
+from heuristica_p_mediana import resolver_p_mediana_heuristica
+from instrumentacao import (NOMES_STATUS, acompanhar_incumbentes, acompanhar_limites, anotar, estatisticas_highs,
+                            estatisticas_milp, resumir_incumbentes, tamanho_modelo)
+
+# Quantidade de distâncias (demandas x candidatos) ordenadas de uma vez na
+# separação do modo preguiçoso; limita a memória temporária a ~2^22 floats.
+VALORES_POR_BLOCO = 2 ** 22
+
+
+def _highspy():
+    """
+    O pacote highspy só é importado pelos modos que falam direto com o
+    HiGHS (preguiçoso, inteiro e a varredura); resolver_p_mediana usa o
+    HiGHS que já vem com o SciPy.
+    """
+    try:
+        import highspy
+    except ImportError as erro:
+        raise ImportError("Este modo precisa do pacote 'highspy' (pip install highspy); "
+                          "resolver_p_mediana funciona só com o SciPy.") from erro
+    return highspy
+
+
+class ModeloPMediana:
+    """Vetores e matrizes esparsas do modelo, prontos para o solver."""
+
+    def __init__(self, c, A, limite_inf_linhas, limite_sup_linhas, limite_sup_colunas, n, m):
+        self.c = c
+        self.A = A
+        self.limite_inf_linhas = limite_inf_linhas
+        self.limite_sup_linhas = limite_sup_linhas
+        self.limite_sup_colunas = limite_sup_colunas
+        self.n = n
+        self.m = m
+
+    @property
+    def n_variaveis(self):
+        return self.A.shape[1]
+
+    @property
+    def n_restricoes(self):
+        return self.A.shape[0]
+
+
+def _demandas_necessarias(pesos, D):
+    """
+    Máscara das demandas que precisam estar no modelo. Uma demanda sem
+    população que alcança todos os candidatos não muda o objetivo nem a
+    escolha (y_ij = x_j / n_hospitais a atende) e pode sair. Sem população
+    mas sem caminho até algum candidato, ela continua: obriga a abrir um
+    hospital ao seu alcance, ou torna o modelo inviável.
+    """
+    return (pesos > 0) | ~np.isfinite(D).all(axis=1)
+
+
+def construir_modelo_p_mediana(pesos, D, n_hospitais):
+    """
+    Monta o modelo a partir do vetor de pesos (população de cada nó de
+    demanda, tamanho n) e da matriz de distâncias demanda x candidatos (n x m).
+
+    Pares sem caminho (distância infinita) ficam proibidos: y_ij <= 0.
+    Demandas que não restringem o modelo ficam de fora (ver
+    _demandas_necessarias).
+    """
+    pesos = np.asarray(pesos, dtype=np.float64)
+    D = np.asarray(D, dtype=np.float64)
+    necessarias = _demandas_necessarias(pesos, D)
+    pesos, D = pesos[necessarias], D[necessarias]
+    n, m = D.shape
+
+    alcancavel = np.isfinite(D)
+    custos_y = pesos[:, None] * np.where(alcancavel, D, 0.0)
+    c = np.concatenate([np.zeros(m), custos_y.ravel()])
+
+    i = np.repeat(np.arange(n), m)
+    j = np.tile(np.arange(m), n)
+    col_y = m + np.arange(n * m)
+
+    # Num_Hospitais
+    linhas = [np.zeros(m, dtype=np.int64)]
+    colunas = [np.arange(m)]
+    valores = [np.ones(m)]
+    # Atendimento_Garantido
+    linhas.append(1 + i)
+    colunas.append(col_y)
+    valores.append(np.ones(n * m))
+    # Logica_Atendimento: y_ij - x_j <= 0
+    linha_logica = 1 + n + np.arange(n * m)
+    linhas += [linha_logica, linha_logica]
+    colunas += [col_y, j]
+    valores += [np.ones(n * m), -np.ones(n * m)]
+
+    A = sp.csr_matrix((np.concatenate(valores), (np.concatenate(linhas), np.concatenate(colunas))),
+                      shape=(1 + n + n * m, m + n * m))
+
+    limite_inf = np.concatenate([[n_hospitais], np.ones(n), np.full(n * m, -np.inf)])
+    limite_sup = np.concatenate([[n_hospitais], np.ones(n), np.zeros(n * m)])
+    limite_sup_colunas = np.concatenate([np.ones(m), alcancavel.ravel().astype(np.float64)])
+
+    return ModeloPMediana(c, A, limite_inf, limite_sup, limite_sup_colunas, n, m)
+
+
+def resolver_modelo(modelo, inteiro=False, msg=True, limite_tempo=None):
+    """
+    Resolve o modelo com o HiGHS. Com inteiro=False (padrão, como no modelo
+    original) as variáveis x_j são contínuas em [0, 1]. Com 'limite_tempo'
+    (segundos), o solver para nesse tempo e devolve a melhor solução
+    encontrada até lá, se houver, com o status 'Not Solved'.
+
+    Retorna (x, objetivo, status), com x = valores de x_j (ou None).
+    """
+    opcoes = {'disp': msg}
+    if limite_tempo is not None:
+        opcoes['time_limit'] = float(limite_tempo)
+    integralidade = np.zeros(modelo.n_variaveis)
+    if inteiro:
+        integralidade[:modelo.m] = 1
+
+    resultado = milp(
+        c=modelo.c,
+        constraints=LinearConstraint(modelo.A, modelo.limite_inf_linhas, modelo.limite_sup_linhas),
+        bounds=Bounds(np.zeros(modelo.n_variaveis), modelo.limite_sup_colunas),
+        integrality=integralidade,
+        options=opcoes,
+    )
+    status = NOMES_STATUS.get(resultado.status, 'Undefined')
+    anotar(modelo=tamanho_modelo(modelo.n_variaveis, modelo.n_restricoes, modelo.A.nnz),
+           solver=dict(estatisticas_milp(resultado), status=status))
+    if resultado.x is None:
+        return None, None, status
+    if resultado.status != 0:
+        gap = getattr(resultado, 'mip_gap', None)
+        print(f"⚠️ Solver interrompido ('{resultado.message}'): devolvendo a melhor solução"
+              + (f", com gap de {100.0 * gap:.4f}%." if gap is not None else "."))
+    # Somar 0.0 troca os -0.0 do solver por 0.0 (evita '-0,0' no CSV)
+    return resultado.x[:modelo.m] + 0.0, float(resultado.fun), status
+
+
+def resolver_p_mediana(pesos, D, n_hospitais, inteiro=False, msg=True):
+    """
+    Monta e resolve o modelo; retorna (x, objetivo, status) como resolver_modelo.
+    """
+    start_time = time.time()
+    modelo = construir_modelo_p_mediana(pesos, D, n_hospitais)
+    print(f"Modelo montado em {time.time() - start_time:.2f} segundos "
+          f"({modelo.n_variaveis} variáveis, {modelo.n_restricoes} restrições, {modelo.A.nnz} não-nulos).")
+    return resolver_modelo(modelo, inteiro=inteiro, msg=msg)
+
+
+# --- Modo preguiçoso (geração de restrições sob demanda) ---
+
+def _criar_highs(c, A, limite_inf_colunas, limite_sup_colunas, limite_inf_linhas, limite_sup_linhas,
+                 inteiras=None, msg=False):
+    """Carrega um modelo (matriz esparsa A) direto na memória do HiGHS."""
+    highspy = _highspy()
+    A = sp.csc_matrix(A)
+    lp = highspy.HighsLp()
+    lp.num_col_ = A.shape[1]
+    lp.num_row_ = A.shape[0]
+    lp.col_cost_ = np.asarray(c, dtype=np.float64)
+    lp.col_lower_ = np.asarray(limite_inf_colunas, dtype=np.float64)
+    lp.col_upper_ = np.asarray(limite_sup_colunas, dtype=np.float64)
+    lp.row_lower_ = np.asarray(limite_inf_linhas, dtype=np.float64)
+    lp.row_upper_ = np.asarray(limite_sup_linhas, dtype=np.float64)
+    lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+    lp.a_matrix_.start_ = A.indptr
+    lp.a_matrix_.index_ = A.indices
+    lp.a_matrix_.value_ = A.data
+    if inteiras is not None:
+        lp.integrality_ = [highspy.HighsVarType.kInteger if v else highspy.HighsVarType.kContinuous
+                           for v in inteiras]
+
+    h = highspy.Highs()
+    h.setOptionValue('output_flag', bool(msg))
+    h.passModel(lp)
+    return h
+
+
+def resolver_p_mediana_preguicoso(pesos, D, n_hospitais, inteiro=False, msg=False,
+                                  tolerancia=1e-6, max_rodadas=100):
+    """
+    Resolve o mesmo modelo de resolver_p_mediana sem criar as n*m linhas
+    y_ij <= x_j de uma vez.
+
+    Parte da forma agregada (sum_i y_ij <= n * x_j, uma linha por
+    candidato), resolve, separa as restrições y_ij <= x_j violadas, adiciona
+    essas linhas e re-resolve com partida a quente até que nenhuma esteja
+    violada. Nesse ponto a solução é viável para o modelo completo e,
+    como é ótima para uma relaxação dele, também é ótima para o completo.
+
+    Retorna (x, objetivo, status, rodadas), onde 'rodadas' é uma lista com
+    as linhas adicionadas, o tempo e o objetivo de cada rodada.
+    """
+    highspy = _highspy()
+    pesos = np.asarray(pesos, dtype=np.float64)
+    D = np.asarray(D, dtype=np.float64)
+
+    # As mesmas demandas que construir_modelo_p_mediana deixa de fora
+    necessarias = _demandas_necessarias(pesos, D)
+    pesos, D = pesos[necessarias], D[necessarias]
+    n, m = D.shape
+
+    alcancavel = np.isfinite(D)
+    c = np.zeros(m + n * m)
+    np.multiply(pesos[:, None], D, out=c[m:].reshape(n, m), where=alcancavel)
+    limite_sup_colunas = np.ones(m + n * m)
+    limite_sup_colunas[m:] = alcancavel.ravel()
+
+    # Num_Hospitais, Atendimento_Garantido e a forma agregada
+    # (sum_i y_ij - n * x_j <= 0) no lugar das n*m linhas de Logica_Atendimento.
+    # Cada coluna tem exatamente dois não-nulos, então o CSC é montado direto:
+    # x_j nas linhas 0 e 1+n+j, y_ij nas linhas 1+i e 1+n+j.
+    linhas = np.empty((m + n * m, 2), dtype=np.int32)
+    linhas[:m, 0] = 0
+    linhas[:m, 1] = 1 + n + np.arange(m)
+    linhas_y = linhas[m:].reshape(n, m, 2)
+    linhas_y[:, :, 0] = 1 + np.arange(n)[:, None]
+    linhas_y[:, :, 1] = 1 + n + np.arange(m)[None, :]
+    valores = np.ones((m + n * m, 2))
+    valores[:m, 1] = -float(n)
+    A = sp.csc_matrix((valores.ravel(), linhas.ravel(), np.arange(0, 2 * (m + n * m) + 1, 2)),
+                      shape=(1 + n + m, m + n * m))
+    del linhas, linhas_y, valores
+    limite_inf = np.concatenate([[n_hospitais], np.ones(n), np.full(m, -np.inf)])
+    limite_sup = np.concatenate([[n_hospitais], np.ones(n), np.zeros(m)])
+
+    inteiras = None
+    if inteiro:
+        inteiras = np.concatenate([np.ones(m, dtype=bool), np.zeros(n * m, dtype=bool)])
+    h = _criar_highs(c, A, np.zeros(m + n * m), limite_sup_colunas, limite_inf, limite_sup, inteiras, msg)
+    incumbentes = acompanhar_incumbentes(h) if inteiro else None
+
+    # Para cada demanda i, as linhas já adicionadas são sempre as dos
+    # candidatos a até 'raio_i' dela (k_i candidatos). Quando i viola uma
+    # restrição, o raio cresce até o candidato violado e até o 2k_i-ésimo
+    # mais próximo, o que antecipa as linhas das rodadas seguintes: o número
+    # de rodadas cai para ~log(m). Só as demandas violadas são ordenadas.
+    raio = np.full(n, -np.inf)
+    k = np.zeros(n, dtype=np.int64)
+
+    rodadas = []
+    solver = {'iteracoes_simplex': 0, 'iteracoes_ipm': 0}
+
+    def anotar_solver(status, objetivo):
+        # O relógio do HiGHS acumula todas as execuções do mesmo objeto
+        solver.update(status=status, objetivo=objetivo, rodadas=len(rodadas), tempo_solver_s=h.getRunTime())
+        if inteiro:
+            solver.update(resumir_incumbentes(incumbentes))
+        anotar(modelo=dict(tamanho_modelo(h.getNumCol(), h.getNumRow(), h.getNumNz()),
+                           restricoes_completo=1 + n + n * m),
+               solver=solver)
+
+    print(f"Modelo inicial: {m + n * m} variáveis, {1 + n + m} restrições "
+          f"(o completo teria {1 + n + n * m}).")
+    for rodada in range(1, max_rodadas + 1):
+        start_time = time.time()
+        h.run()
+        status = h.modelStatusToString(h.getModelStatus())
+        estatisticas = estatisticas_highs(h, inteiro)
+        for campo in ('iteracoes_simplex', 'iteracoes_ipm'):
+            solver[campo] += estatisticas[campo]
+        if inteiro:
+            solver.update({campo: estatisticas[campo] for campo in ('nos_bb', 'limite_dual', 'gap')})
+        if h.getModelStatus() != highspy.HighsModelStatus.kOptimal:
+            print(f"❌ Rodada {rodada}: o solver terminou com status '{status}'.")
+            anotar_solver(status, None)
+            return None, None, status, rodadas
+
+        valores = np.asarray(h.getSolution().col_value)
+        x, y = valores[:m], valores[m:].reshape(n, m)
+        objetivo = h.getInfo().objective_function_value
+
+        # Separação: linhas y_ij <= x_j violadas pela solução atual
+        vi, vj = np.nonzero(y - x[None, :] > tolerancia)
+        novas_i, novas_j = _ampliar_raios(D, alcancavel, raio, k, vi, vj)
+
+        n_novas = len(novas_i)
+        if n_novas:
+            inicios = np.arange(0, 2 * n_novas, 2, dtype=np.int32)
+            indices = np.column_stack([m + novas_i * m + novas_j, novas_j]).ravel().astype(np.int32)
+            coeficientes = np.tile([1.0, -1.0], n_novas)
+            h.addRows(n_novas, np.full(n_novas, -highspy.kHighsInf), np.zeros(n_novas),
+                      2 * n_novas, inicios, indices, coeficientes)
+
+        tempo = time.time() - start_time
+        rodadas.append({'rodada': rodada, 'violadas': int(len(vi)), 'linhas_adicionadas': int(n_novas),
+                        'tempo': tempo, 'objetivo': objetivo})
+        print(f"Rodada {rodada}: objetivo {objetivo:,.2f} | {len(vi)} violadas | "
+              f"{n_novas} linhas adicionadas | {tempo:.2f} s")
+        if not len(vi):
+            total = int(k.sum())
+            print(f"✅ Nenhuma restrição violada. {total} de {n * m} linhas y_ij <= x_j foram necessárias.")
+            anotar_solver(status, float(objetivo))
+            return x + 0.0, float(objetivo), status, rodadas
+
+    print(f"⚠️ Atenção: limite de {max_rodadas} rodadas atingido sem eliminar todas as violações.")
+    anotar_solver('Not Solved', None)
+    return None, None, 'Not Solved', rodadas
+
+
+def _ampliar_raios(D, alcancavel, raio, k, vi, vj):
+    """
+    Amplia 'raio' e 'k' (no lugar) das demandas com violações (vi, vj) e
+    retorna os pares (i, j) das linhas y_ij <= x_j que passam a valer.
+    As demandas são processadas em blocos de até VALORES_POR_BLOCO
+    distâncias, e só elas são ordenadas.
+    """
+    demandas = np.unique(vi)
+    if not len(demandas):
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    m = D.shape[1]
+    novo_raio = np.full(D.shape[0], -np.inf)
+    np.maximum.at(novo_raio, vi, D[vi, vj])
+
+    novas_i, novas_j = [], []
+    tamanho_bloco = max(1, VALORES_POR_BLOCO // m)
+    for inicio in range(0, len(demandas), tamanho_bloco):
+        bloco = demandas[inicio:inicio + tamanho_bloco]
+        Db = np.where(alcancavel[bloco], D[bloco], np.inf)
+        ordenadas = np.sort(Db, axis=1)
+        alvo = np.minimum(np.maximum(2 * k[bloco], 1), m) - 1
+        novo = np.maximum(novo_raio[bloco], ordenadas[np.arange(len(bloco)), alvo])
+        # Sem caminho não há linha: o raio para no candidato alcançável mais distante
+        novo = np.minimum(novo, np.where(np.isfinite(ordenadas), ordenadas, -np.inf).max(axis=1))
+        bi, bj = np.nonzero((Db > raio[bloco, None]) & (Db <= novo[:, None]))
+        novas_i.append(bloco[bi])
+        novas_j.append(bj)
+        raio[bloco] = np.maximum(raio[bloco], novo)
+    novas_i, novas_j = np.concatenate(novas_i), np.concatenate(novas_j)
+    np.add.at(k, novas_i, 1)
+    return novas_i, novas_j
+
+
+# --- Modo inteiro exato ---
+
+def _imprimir_limites(tempo, primal, dual, gap):
+    print(f"  {tempo:8.2f} s | primal {primal:18,.2f} | dual {dual:18,.2f} | gap {100.0 * gap:8.4f}%")
+
+
+def _gap(primal, dual):
+    return max((primal - dual) / max(abs(primal), 1e-12), 0.0)
+
+
+def limite_lagrangiano(pesos, D, n_hospitais, primal, max_iteracoes=300, passo_inicial=2.0):
+    """
+    Limite inferior por relaxação lagrangiana das restrições
+    sum_j y_ij = 1 (multiplicadores l_i), otimizado por subgradiente:
+
+        L(l) = sum_i l_i + (soma dos p menores rho_j),
+        rho_j = sum_i min(0, w_i d_ij - l_i).
+
+    Os rho_j fazem o papel de custos reduzidos: com S os p candidatos
+    escolhidos, toda solução que abre j fora de S custa pelo menos
+    L - rho_(p) + rho_j, e toda que fecha j em S, pelo menos
+    L - rho_j + rho_(p+1). Quando esse valor passa do custo 'primal' de
+    uma solução conhecida, j fica fixo (fechado ou aberto). Cada S também
+    é avaliado como solução, o que pode melhorar 'primal'.
+
+    Retorna (limite, primal, abertas, fixos_em_0, fixos_em_1), com
+    'abertas' o S de menor custo. Se o primal devolvido for menor que o
+    recebido, ele é o custo de 'abertas', e a fixação vale contra ele: quem
+    chama deve adotar 'abertas' como incumbente.
+    """
+    custos = pesos[:, None] * np.where(np.isfinite(D), D, 0.0)
+    # Pares sem caminho: custo maior que qualquer solução, em vez de inf
+    custos[~np.isfinite(D)] = 10.0 * max(primal, 1.0)
+    n, m = custos.shape
+    p = n_hospitais
+
+    multiplicadores = custos.min(axis=1)
+    melhor_limite, melhores_abertas, custo_abertas = -np.inf, None, np.inf
+    fixos_em_0 = np.zeros(m, dtype=bool)
+    fixos_em_1 = np.zeros(m, dtype=bool)
+    passo, sem_melhora = passo_inicial, 0
+    for _ in range(max_iteracoes):
+        reduzidos = np.minimum(custos - multiplicadores[:, None], 0.0)
+        rho = reduzidos.sum(axis=0)
+        ordem = np.argsort(rho, kind='stable')
+        escolhidos = ordem[:p]
+        limite = float(multiplicadores.sum() + rho[escolhidos].sum())
+
+        if limite > melhor_limite + 1e-9 * max(abs(limite), 1.0):
+            melhor_limite, sem_melhora = limite, 0
+        else:
+            sem_melhora += 1
+            if sem_melhora >= 15:
+                passo, sem_melhora = passo / 2.0, 0
+
+        custo = float(custos[:, escolhidos].min(axis=1).sum())
+        if custo < custo_abertas:
+            custo_abertas, melhores_abertas = custo, escolhidos.copy()
+            primal = min(primal, custo)
+
+        rho_p = rho[ordem[p - 1]]
+        rho_p1 = rho[ordem[p]] if p < m else np.inf
+        fora = np.ones(m, dtype=bool)
+        fora[escolhidos] = False
+        fixos_em_0 |= fora & (limite - rho_p + rho > primal)
+        fixos_em_1[escolhidos] |= limite - rho[escolhidos] + rho_p1 > primal
+
+        if primal - melhor_limite <= 1e-9 * max(abs(primal), 1.0) or passo < 1e-4:
+            break
+        # Subgradiente: 1 - (a quantos candidatos escolhidos i se atribui)
+        g = 1.0 - (reduzidos[:, escolhidos] < 0).sum(axis=1)
+        norma = float(g @ g)
+        if norma == 0:
+            break
+        multiplicadores = multiplicadores + passo * (primal - limite) / norma * g
+
+    return melhor_limite, primal, melhores_abertas, fixos_em_0, fixos_em_1
+
+
+def resolver_p_mediana_inteiro(pesos, D, n_hospitais, limite_tempo=None, gap_relativo=0.0, msg=False):
+    """
+    Resolve o modelo com x_j binário, em vez de arredondar os x_j
+    contínuos pelos n maiores valores:
+
+    1. A heurística (gulosa + trocas) dá a incumbente inicial, de custo UB.
+    2. A relaxação lagrangiana (limite_lagrangiano) dá um limite inferior
+       e fixa, pelos custos reduzidos, os candidatos que comprovadamente
+       não podem entrar (ou sair) de uma solução melhor que a incumbente.
+       Os fixos em 0 saem do modelo.
+    3. Se o limite inferior já alcança UB, a incumbente é ótima.
+    4. Senão, o HiGHS faz o branch-and-bound no modelo reduzido, partindo
+       da incumbente. Com 'limite_tempo' (segundos, contando as etapas
+       anteriores), devolve a melhor solução encontrada até lá.
+
+    Os limites primal e dual e o gap são impressos à medida que mudam.
+    Retorna (x, objetivo, status, limites), com 'limites' a lista de
+    (tempo, primal, dual, gap) ao longo da execução.
+    """
+    highspy = _highspy()
+    pesos = np.asarray(pesos, dtype=np.float64)
+    D = np.asarray(D, dtype=np.float64)
+    # Demandas sem população não mudam o objetivo nem a escolha
+    com_populacao = pesos > 0
+    pesos, D = pesos[com_populacao], D[com_populacao]
+    m = D.shape[1]
+    inicio = time.time()
+
+    # 1. Incumbente heurística
+    x, primal, _ = resolver_p_mediana_heuristica(pesos, D, n_hospitais)
+    if x is None:
+        return None, None, 'Infeasible', []
+    print("Limites ao longo da execução:")
+    limites = [(time.time() - inicio, primal, -np.inf, np.inf)]
+    _imprimir_limites(*limites[-1])
+
+    # 2. Limite lagrangiano e fixação por custos reduzidos. A fixação é
+    # feita contra o melhor custo que a relaxação encontrou, então o S
+    # correspondente passa a ser a incumbente. As trocas partindo dele
+    # costumam melhorá-la; como a fixação depende dela, a relaxação é refeita
+    dual, primal_lagrangiano, abertas, fixos_em_0, fixos_em_1 = limite_lagrangiano(pesos, D, n_hospitais, primal)
+    if primal_lagrangiano < primal:
+        x, primal = np.zeros(m), primal_lagrangiano
+        x[abertas] = 1.0
+    if abertas is not None and _gap(primal, dual) > max(gap_relativo, 1e-9):
+        x_trocas, primal_trocas, _ = resolver_p_mediana_heuristica(pesos, D, n_hospitais, abertas_iniciais=abertas)
+        if primal_trocas < primal * (1.0 - 1e-12):
+            x, primal = x_trocas, primal_trocas
+            limites.append((time.time() - inicio, primal, dual, _gap(primal, dual)))
+            _imprimir_limites(*limites[-1])
+            dual_refeito, primal_lagrangiano, abertas, fixos_em_0, fixos_em_1 = limite_lagrangiano(
+                pesos, D, n_hospitais, primal)
+            dual = max(dual, dual_refeito)
+            if primal_lagrangiano < primal:
+                x, primal = np.zeros(m), primal_lagrangiano
+                x[abertas] = 1.0
+    # Desfazer uma fixação só enfraquece o modelo: garante que erros de
+    # arredondamento nunca excluam a própria incumbente
+    incumbente = x > 0.5
+    fixos_em_0 &= ~incumbente
+    fixos_em_1 &= incumbente
+    limites.append((time.time() - inicio, primal, dual, _gap(primal, dual)))
+    _imprimir_limites(*limites[-1])
+    livres = np.flatnonzero(~fixos_em_0)
+    print(f"Fixação por custos reduzidos: {fixos_em_0.sum()} candidatos fora, {fixos_em_1.sum()} fixos em 1; "
+          f"restam {len(livres) - fixos_em_1.sum()} de {m} livres.")
+
+    status, bnb = 'Optimal', {}
+    if _gap(primal, dual) <= max(gap_relativo, 1e-9):
+        # 3. A incumbente já é comprovadamente ótima
+        print("✅ O limite inferior alcança a incumbente: ela é ótima.")
+    else:
+        # 4. Branch-and-bound no modelo reduzido, partindo da incumbente
+        modelo = construir_modelo_p_mediana(pesos, D[:, livres], n_hospitais)
+        m_red = modelo.m
+        limite_inf_colunas = np.zeros(modelo.n_variaveis)
+        limite_inf_colunas[:m_red] = fixos_em_1[livres]
+        inteiras = np.concatenate([np.ones(m_red, dtype=bool), np.zeros(modelo.n_variaveis - m_red, dtype=bool)])
+        h = _criar_highs(modelo.c, modelo.A, limite_inf_colunas, modelo.limite_sup_colunas,
+                         modelo.limite_inf_linhas, modelo.limite_sup_linhas, inteiras, msg)
+        h.setOptionValue('mip_rel_gap', float(gap_relativo))
+        if limite_tempo is not None:
+            h.setOptionValue('time_limit', max(float(limite_tempo) - (time.time() - inicio), 1.0))
+        posicao = {j: k for k, j in enumerate(livres)}
+        inicial = highspy.HighsSolution()
+        inicial.col_value = _solucao_inicial(pesos, D[:, livres], [posicao[j] for j in np.flatnonzero(x > 0.5)],
+                                             n_hospitais).tolist()
+        h.setSolution(inicial)
+        limites_bnb = acompanhar_limites(h, time.time() - inicio, primal, dual, _imprimir_limites)
+        print(f"Branch-and-bound: {modelo.n_variaveis} variáveis, {modelo.n_restricoes} restrições.")
+        h.run()
+        limites += limites_bnb[1:]
+
+        status = h.modelStatusToString(h.getModelStatus())
+        bnb = estatisticas_highs(h, inteiro=True)
+        info = h.getInfo()
+        if info.primal_solution_status == 2 and info.objective_function_value < primal:
+            x = np.zeros(m)
+            x[livres] = np.round(np.asarray(h.getSolution().col_value)[:m_red])
+            primal = float(info.objective_function_value)
+        if np.isfinite(bnb['limite_dual']):
+            dual = max(dual, bnb['limite_dual'])
+        limites.append((time.time() - inicio, primal, dual, _gap(primal, dual)))
+        _imprimir_limites(*limites[-1])
+        if h.getModelStatus() != highspy.HighsModelStatus.kOptimal:
+            print(f"⚠️ Branch-and-bound interrompido ('{status}'): devolvendo a melhor solução, "
+                  f"com gap de {100.0 * limites[-1][3]:.4f}%.")
+
+    anotar(solver=dict(bnb, metodo='inteiro', status=status, objetivo=primal, limite_dual=dual,
+                       gap=limites[-1][3], objetivo_heuristica=limites[0][1], fixos_em_0=int(fixos_em_0.sum()),
+                       fixos_em_1=int(fixos_em_1.sum()), tempo_solver_s=time.time() - inicio),
+           limites=[list(l) for l in limites])
+    return x + 0.0, primal, status, limites
+
+
+# --- Varredura do número de hospitais (p = 1..P) ---
+
+def _solucao_inicial(pesos, D, abertas, n_hospitais):
+    """
+    Completa a solução anterior até n_hospitais abrindo, um a um, o
+    candidato que mais reduz o custo, e atribui cada demanda ao hospital
+    aberto mais próximo. Retorna o vetor com todas as colunas (x e y).
+    """
+    n, m = D.shape
+    abertas = list(abertas)
+    d1 = D[:, abertas].min(axis=1) if abertas else np.full(n, np.inf)
+    while len(abertas) < n_hospitais:
+        # fmax descarta os NaN de inf - inf (demanda sem caminho a nenhum dos dois)
+        ganhos = pesos @ np.fmax(d1[:, None] - D, 0.0)
+        ganhos[abertas] = -np.inf
+        j = int(np.argmax(ganhos))
+        abertas.append(j)
+        d1 = np.minimum(d1, D[:, j])
+
+    valores = np.zeros(m + n * m)
+    valores[abertas] = 1.0
+    mais_proximo = np.asarray(abertas)[np.argmin(D[:, abertas], axis=1)]
+    valores[m + np.arange(n) * m + mais_proximo] = 1.0
+    return valores
+
+
+def _varrer(pesos, D, valores_p, inteiro, msg):
+    """
+    Monta o modelo uma única vez e o resolve para cada p em 'valores_p',
+    mudando só o lado direito de Num_Hospitais. No modo contínuo o HiGHS
+    parte da base ótima do p anterior; no inteiro, recebe como solução
+    inicial a do p anterior completada de forma gulosa.
+    """
+    highspy = _highspy()
+    pesos = np.asarray(pesos, dtype=np.float64)
+    D = np.asarray(D, dtype=np.float64)
+    modelo = construir_modelo_p_mediana(pesos, D, valores_p[0])
+    m = modelo.m
+
+    inteiras = None
+    if inteiro:
+        inteiras = np.concatenate([np.ones(m, dtype=bool), np.zeros(modelo.n_variaveis - m, dtype=bool)])
+    h = _criar_highs(modelo.c, modelo.A, np.zeros(modelo.n_variaveis), modelo.limite_sup_colunas,
+                     modelo.limite_inf_linhas, modelo.limite_sup_linhas, inteiras, msg)
+    incumbentes = acompanhar_incumbentes(h) if inteiro else None
+
+    resultados = []
+    abertas = []
+    for p in valores_p:
+        start_time = time.time()
+        h.changeRowBounds(0, p, p)
+        if inteiro and len(abertas) <= p:
+            inicial = highspy.HighsSolution()
+            inicial.col_value = _solucao_inicial(pesos, D, abertas, p).tolist()
+            h.setSolution(inicial)
+        if inteiro:
+            incumbentes.clear()
+        h.run()
+
+        status = h.modelStatusToString(h.getModelStatus())
+        solver = estatisticas_highs(h, inteiro)
+        if inteiro:
+            solver.update(resumir_incumbentes(incumbentes))
+        if h.getModelStatus() != highspy.HighsModelStatus.kOptimal:
+            resultados.append({'p': p, 'x': None, 'objetivo': None, 'status': status,
+                               'tempo': time.time() - start_time, 'solver': solver})
+            continue
+        x = np.asarray(h.getSolution().col_value)[:m] + 0.0
+        abertas = np.flatnonzero(x > 0.5).tolist()
+        resultados.append({'p': p, 'x': x, 'objetivo': float(h.getInfo().objective_function_value),
+                           'status': status, 'tempo': time.time() - start_time, 'solver': solver})
+    return resultados
+
+
+# Dados de cada processo da varredura paralela, enviados uma única vez
+# pelo inicializador do pool
+_varredura = {}
+
+
+def _inicializar_varredura(pesos, D, inteiro):
+    _varredura.update(pesos=pesos, D=D, inteiro=inteiro)
+
+
+def _varrer_fatia(valores_p):
+    return _varrer(_varredura['pesos'], _varredura['D'], valores_p, _varredura['inteiro'], False)
+
+
+def varrer_p_mediana(pesos, D, valores_p, inteiro=False, n_processos=1, msg=False):
+    """
+    Resolve o modelo para vários números de hospitais em uma só execução.
+
+    Com n_processos > 1, 'valores_p' é dividido em fatias contíguas, uma por
+    processo; cada processo monta seu próprio modelo e varre a sua fatia
+    com partida a quente.
+
+    Retorna uma lista (na ordem de 'valores_p') de dicionários com 'p',
+    'x', 'objetivo', 'status', 'tempo' e 'solver' (estatísticas do HiGHS).
+    """
+    valores_p = list(valores_p)
+    n_processos = max(1, min(n_processos, len(valores_p)))
+    start_time = time.time()
+    if n_processos == 1:
+        resultados = _varrer(pesos, D, valores_p, inteiro, msg)
+    else:
+        fatias = [list(f) for f in np.array_split(valores_p, n_processos)]
+        with mp.Pool(n_processos, initializer=_inicializar_varredura,
+                     initargs=(np.asarray(pesos), np.asarray(D), inteiro)) as pool:
+            resultados = [r for parte in pool.map(_varrer_fatia, fatias) for r in parte]
+
+    n, m = np.shape(D)
+    anotar(modelo=tamanho_modelo(m + n * m, 1 + n + n * m, m + 3 * n * m),
+           solver={'valores_p': len(valores_p),
+                   'iteracoes_simplex': sum(r['solver']['iteracoes_simplex'] for r in resultados),
+                   'iteracoes_ipm': sum(r['solver']['iteracoes_ipm'] for r in resultados),
+                   'tempo_solver_s': sum(r['tempo'] for r in resultados)},
+           varredura=[{'p': int(r['p']), 'status': r['status'], 'tempo': r['tempo'], **r['solver']} for r in resultados])
+    for r in resultados:
+        objetivo = f"{r['objetivo']:,.2f}" if r['objetivo'] is not None else '-'
+        print(f"p = {r['p']:3d}: objetivo {objetivo} | {r['status']} | {r['tempo']:.2f} s")
+    print(f"✅ Varredura de {len(valores_p)} valores de p em {time.time() - start_time:.2f} segundos.")
+    return resultados
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Motor de difusão populacional baseado em matrizes esparsas.
+
+O operador de vizinhança é montado uma única vez a partir do grafo e cada
+iteração da suavização vira um produto matriz esparsa × vetor (ou × matriz
+densa, quando vários fatores de retenção são calculados de uma só vez).
+
+Para reproduzir bit a bit o algoritmo original (laços sobre dicionários),
+a normalização pelo número de vizinhos é aplicada ao vetor ANTES do produto
+e as parcelas são somadas na mesma ordem em que o laço as acumulava: para
+cada nó de origem, primeiro a parte retida e depois a parte enviada aos
+vizinhos.
+"""
+import numpy as np
+import scipy.sparse as sp
+
+
+def construir_operador_difusao(G, nos=None):
+    """
+    Monta a matriz de adjacência esparsa A (n x n), com A[v, u] = 1 quando
+    v está em G.neighbors(u), e o vetor com o número de vizinhos de cada nó.
+    Dividir a população de u pelo seu grau e multiplicar por A equivale a
+    aplicar o operador de vizinhança normalizado por linha.
+
+    Aceita também um GrafoCompacto (grafo_compacto.py), que monta o mesmo
+    operador direto dos vetores CSR, sem percorrer o grafo nó a nó.
+
+    Retorna (A, graus, nos), onde 'nos' define a ordem das linhas/colunas.
+    """
+    if hasattr(G, 'operador_difusao') and nos is None:
+        return G.operador_difusao()
+    if nos is None:
+        nos = list(G.nodes())
+    indice = {node: k for k, node in enumerate(nos)}
+
+    destinos, origens = [], []
+    graus = np.zeros(len(nos), dtype=np.float64)
+    for node in nos:
+        # G.neighbors não repete vizinhos, mesmo em multigrafos
+        u = indice[node]
+        for vizinho in G.neighbors(node):
+            destinos.append(indice[vizinho])
+            origens.append(u)
+            graus[u] += 1
+
+    n = len(nos)
+    dados = np.ones(len(destinos), dtype=np.float64)
+    A = sp.csr_matrix((dados, (destinos, origens)), shape=(n, n))
+    return A, graus, nos
+
+
+def _operador_intercalado(A, ordem):
+    """
+    Monta a matriz B (n x 2n) que soma, para cada destino, as parcelas na
+    ordem de processamento das origens: a coluna 2k recebe a parte retida da
+    k-ésima origem e a coluna 2k+1 a parte que ela envia a cada vizinho.
+    """
+    n = A.shape[0]
+    posicao = np.empty(n, dtype=np.int64)
+    posicao[ordem] = np.arange(n)
+
+    coo = A.tocoo()
+    linhas = np.concatenate([np.arange(n), coo.row])
+    colunas = np.concatenate([2 * posicao, 2 * posicao[coo.col] + 1])
+    dados = np.ones(len(linhas), dtype=np.float64)
+    B = sp.csr_matrix((dados, (linhas, colunas)), shape=(n, 2 * n))
+    # Índices ordenados garantem a ordem de soma do laço original
+    B.sum_duplicates()
+    return B
+
+
+def difundir(A, graus, populacao, numero_de_iteracoes, fatores_de_retencao, ordem_inicial=None):
+    """
+    Aplica a difusão sobre um vetor de população.
+
+    Em cada iteração, cada nó mantém 'fator' da sua população e distribui o
+    restante igualmente entre os vizinhos (a parte de nós sem vizinhos se
+    perde, como no algoritmo original).
+
+    'fatores_de_retencao' pode ser um número (retorna um vetor n) ou uma
+    sequência de k fatores (retorna uma matriz n x k, uma coluna por fator),
+    calculada em uma única passada com produtos matriz esparsa × matriz densa.
+    'populacao' também pode ser uma matriz n x k, com a população de
+    partida de cada coluna (ex.: cenários com populações perturbadas).
+
+    'ordem_inicial' é a ordem (índices) em que as origens eram percorridas na
+    primeira iteração, isto é, a ordem das chaves do dicionário de entrada.
+    Nas iterações seguintes a ordem é a de 'nos'.
+    """
+    fatores = np.atleast_1d(np.asarray(fatores_de_retencao, dtype=np.float64))
+    populacao = np.asarray(populacao, dtype=np.float64)
+    n = populacao.shape[0]
+
+    ordem_padrao = np.arange(n)
+    if ordem_inicial is None:
+        ordem_inicial = ordem_padrao
+    ordem_inicial = np.asarray(ordem_inicial, dtype=np.int64)
+
+    B_padrao = _operador_intercalado(A, ordem_padrao)
+    if np.array_equal(ordem_inicial, ordem_padrao):
+        B_inicial = B_padrao
+    else:
+        B_inicial = _operador_intercalado(A, ordem_inicial)
+
+    # Nós sem vizinhos não distribuem nada; evita divisão por zero
+    divisor = np.where(graus > 0, graus, 1.0)[:, None]
+
+    # Uma coluna por fator de retenção, todas partindo da mesma população
+    # (ou cada uma da sua, se 'populacao' já vier como matriz)
+    if populacao.ndim == 2:
+        X = populacao
+    else:
+        X = np.repeat(populacao[:, None], len(fatores), axis=1)
+    Z = np.empty((2 * n, len(fatores)), dtype=np.float64)
+    for i in range(numero_de_iteracoes):
+        B, ordem = (B_inicial, ordem_inicial) if i == 0 else (B_padrao, ordem_padrao)
+        Z[0::2] = (X * fatores)[ordem]
+        Z[1::2] = ((X * (1.0 - fatores)) / divisor)[ordem]
+        X = B @ Z
+
+    if np.ndim(fatores_de_retencao) == 0 and populacao.ndim == 1:
+        return X[:, 0]
+    return X
+
+
+def arredondar_conservando(nos, valores, populacao_total_original):
+    """
+    Arredonda os valores para inteiros e corrige a diferença de arredondamento
+    no nó mais populoso, garantindo que a soma seja EXATAMENTE a original.
+
+    Retorna um dicionário {nó: int} na ordem de 'nos'.
+    """
+    # np.rint arredonda .5 para o par mais próximo, como o round() do Python
+    inteiros = np.rint(valores).astype(np.int64)
+
+    diferenca = round(populacao_total_original - int(inteiros.sum()))
+    if diferenca != 0:
+        # argmax devolve a primeira ocorrência, como max() sobre o dicionário
+        inteiros[np.argmax(inteiros)] += diferenca
+
+    return dict(zip(nos, inteiros.tolist()))
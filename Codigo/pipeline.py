@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+"""
+Executa a cadeia completa de scripts numerados em um único processo:
+
+    grafo (1) -> populacao (2) -> difusao (3) -> distancias (4) -> localizacao (5)
+
+Cada etapa é um nó de um grafo de dependências. O resultado de cada etapa é
+guardado em 'Arquivos/cache/' sob uma CHAVE que é o hash de tudo o que o
+determina: os parâmetros da etapa, as chaves das etapas anteriores, a
+impressão digital (tamanho + data de modificação) dos arquivos externos que
+ela lê e o conteúdo dos módulos que fazem o cálculo (e de todos os módulos
+desta pasta que eles importam, ver modulos_da_etapa). Se a chave não mudou,
+o resultado em cache é reaproveitado; se mudou, a etapa roda de novo e as
+seguintes também (suas chaves dependem dela).
+
+Assim, mudar só o número de hospitais muda apenas a chave da etapa
+'localizacao': o grafo, as populações e a matriz de distâncias vêm do cache.
+Os objetos já carregados ficam em memória e são passados direto de uma
+etapa para a seguinte, sem reler GraphML/pickles a cada script.
+"""
+import ast
+import hashlib
+import importlib
+import json
+import os
+import pickle
+import shutil
+import sys
+import time
+
+import osmnx as ox
+
+import instrumentacao
+from armazem_distancias import abrir_armazem, existe_armazem
+from dados_censo import carregar_populacao_setores, carregar_setores
+from grafo_compacto import GrafoCompacto, carregar_grafo
+
+PASTA_CACHE = os.path.join('Arquivos', 'cache')
+PASTA_CODIGO = os.path.dirname(os.path.abspath(__file__))
+
+# Os scripts numerados não são nomes válidos para 'import'; são carregados
+# com importlib (o bloco __main__ deles não é executado).
+if PASTA_CODIGO not in sys.path:
+    sys.path.insert(0, PASTA_CODIGO)
+
+
+def _script(nome):
+    return importlib.import_module(nome)
+
+
+def _impressao_arquivo(caminho):
+    """Identifica um arquivo externo (grande) sem lê-lo inteiro."""
+    if not os.path.exists(caminho):
+        return None
+    info = os.stat(caminho)
+    return [info.st_size, info.st_mtime_ns]
+
+
+def _hash_codigo(nome_arquivo):
+    with open(os.path.join(PASTA_CODIGO, nome_arquivo), 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _importados(nome_arquivo):
+    """Nomes de módulo que o arquivo importa (também dentro de funções e por _script/import_module)."""
+    with open(os.path.join(PASTA_CODIGO, nome_arquivo), 'rb') as f:
+        arvore = ast.parse(f.read(), filename=nome_arquivo)
+    nomes = set()
+    for no in ast.walk(arvore):
+        if isinstance(no, ast.Import):
+            nomes.update(alias.name.split('.')[0] for alias in no.names)
+        elif isinstance(no, ast.ImportFrom) and no.module and not no.level:
+            nomes.add(no.module.split('.')[0])
+        elif (isinstance(no, ast.Call) and no.args and isinstance(no.args[0], ast.Constant)
+              and isinstance(no.args[0].value, str)
+              and getattr(no.func, 'id', getattr(no.func, 'attr', None)) in ('_script', 'import_module')):
+            nomes.add(no.args[0].value)
+    return nomes
+
+
+def modulos_da_etapa(arquivos_codigo):
+    """
+    Os arquivos de código dados e todos os módulos desta pasta que eles
+    importam, direta ou indiretamente: é o que entra na chave da etapa.
+    """
+    vistos, pendentes = set(), list(arquivos_codigo)
+    while pendentes:
+        arquivo = pendentes.pop()
+        if arquivo in vistos:
+            continue
+        vistos.add(arquivo)
+        for nome in _importados(arquivo):
+            if os.path.exists(os.path.join(PASTA_CODIGO, nome + '.py')):
+                pendentes.append(nome + '.py')
+    return sorted(vistos)
+
+
+class Etapa:
+    """
+    Uma etapa do pipeline.
+
+    'executar(parametros, *objetos_das_dependencias)' devolve o objeto da
+    etapa. 'salvar(objeto, caminho)' e 'carregar(caminho)' gravam/leem o
+    artefato do cache; sem 'salvar', a etapa roda sempre (ex.: só carrega
+    um arquivo existente, o que é barato).
+    """
+
+    def __init__(self, nome, dependencias, executar, salvar=None, carregar=None, extensao='.pkl',
+                 arquivos=(), codigo=(), valido=None):
+        self.nome = nome
+        self.dependencias = dependencias
+        self.executar = executar
+        self.salvar = salvar
+        self.carregar = carregar
+        self.extensao = extensao
+        self.arquivos = arquivos
+        self.codigo = codigo
+        self.valido = valido or os.path.exists
+
+
+def _salvar_pickle(objeto, caminho):
+    with open(caminho, 'wb') as f:
+        pickle.dump(objeto, f)
+
+
+def _carregar_pickle(caminho):
+    with open(caminho, 'rb') as f:
+        return pickle.load(f)
+
+
+# --- Etapas ---
+
+def _etapa_grafo(parametros):
+    if parametros.get('arquivo') and os.path.exists(parametros['arquivo']):
+        print(f"Carregando o grafo de '{parametros['arquivo']}'...")
+        return carregar_grafo(parametros['arquivo'])
+    return _script('1_grafo').baixar_grafo(parametros['nome_cidade'])
+
+
+def _salvar_grafo(G, caminho):
+    ox.save_graphml(G, filepath=caminho)
+
+
+def _etapa_populacao(parametros, G):
+    if parametros.get('arquivo') and os.path.exists(parametros['arquivo']):
+        print(f"Carregando a população de '{parametros['arquivo']}'...")
+        return _carregar_pickle(parametros['arquivo'])
+    print(f"Carregando o shapefile dos setores de '{parametros['arquivo_setores']}'...")
+    gdf_setores = carregar_setores(parametros['arquivo_setores'], parametros['codigo_municipio'], crs=G.graph['crs'])
+    print(f"Carregando os dados de população de '{parametros['arquivo_populacao']}'...")
+    df_pop = carregar_populacao_setores(parametros['arquivo_populacao'], parametros['codigo_municipio'])
+    metodo = parametros.get('metodo_alocacao', 'centroide')
+    # A busca do nó mais próximo do centróide precisa do grafo do NetworkX
+    if metodo == 'centroide' and isinstance(G, GrafoCompacto):
+        G = G.networkx()
+    return _script('2_densidade').mapear_populacao_para_nos(G, gdf_setores, df_pop, parametros['codigo_municipio'],
+                                                            metodo)
+
+
+def _etapa_difusao(parametros, G, populacoes):
+    return _script('3_difusao').suavizar_populacao(G, populacoes, parametros['numero_de_iteracoes'],
+                                                   parametros['fator_de_retencao'])
+
+
+def _etapa_localizacao(parametros, G, populacoes, distancias):
+    populacoes_filtradas = {node: pop for node, pop in populacoes.items() if node in G.nodes()}
+    resultados, objetivo = _script('5_final').resolver_localizacao_hospitais_com_objetivo(
+        G, populacoes_filtradas, distancias, parametros['n_hospitais'], parametros['populacao_minima'],
+        parametros['modo'], limite_tempo=parametros.get('limite_tempo_s'))
+    return {'resultados': resultados, 'objetivo': objetivo}
+
+
+def _armazem_completo(caminho_base):
+    # A pasta de checkpoints só some quando todas as linhas foram gravadas
+    return existe_armazem(caminho_base) and not os.path.isdir(caminho_base + '_checkpoints')
+
+
+def criar_etapas(parametros, n_processos=None):
+    """Monta o grafo de dependências das etapas a partir dos parâmetros."""
+    calculo_distancias = _script('calculo_distancias')
+
+    def executar_distancias(p, G):
+        # O armazém é gravado direto no caminho do cache da etapa
+        calculo_distancias.calcular_todos_pares_paralelo(G, p['_caminho'],
+                                                         n_processos=n_processos,
+                                                         triangular=p['triangular'])
+        return abrir_armazem(p['_caminho'])
+
+    # Grafo e população podem vir de arquivos já prontos (GraphML baixado
+    # antes, 'populacoes_nos.pkl'): nesse caso a etapa só os carrega, sem
+    # cache, e a chave passa a depender da impressão digital do arquivo.
+    grafo = parametros['grafo']
+    if grafo.get('arquivo') and os.path.exists(grafo['arquivo']):
+        etapa_grafo = Etapa('grafo', [], _etapa_grafo, arquivos=[grafo['arquivo']], codigo=['grafo_compacto.py'])
+    else:
+        etapa_grafo = Etapa('grafo', [], _etapa_grafo, _salvar_grafo, ox.load_graphml, extensao='.graphml',
+                            codigo=['1_grafo.py', 'grafo_compacto.py'])
+
+    populacao = parametros['populacao']
+    if populacao.get('arquivo') and os.path.exists(populacao['arquivo']):
+        etapa_populacao = Etapa('populacao', ['grafo'], _etapa_populacao, arquivos=[populacao['arquivo']])
+    else:
+        etapa_populacao = Etapa('populacao', ['grafo'], _etapa_populacao, _salvar_pickle, _carregar_pickle,
+                                arquivos=[populacao['arquivo_setores'], populacao['arquivo_populacao']],
+                                codigo=['2_densidade.py', 'alocacao_populacao.py', 'dados_censo.py',
+                                        'grafo_compacto.py'])
+
+    return {
+        'grafo': etapa_grafo,
+        'populacao': etapa_populacao,
+        'difusao': Etapa('difusao', ['grafo', 'populacao'], _etapa_difusao, _salvar_pickle, _carregar_pickle,
+                         codigo=['3_difusao.py', 'motor_difusao.py']),
+        # O armazém já é gravado pela própria etapa; 'salvar' não tem o que fazer
+        'distancias': Etapa('distancias', ['grafo'], executar_distancias,
+                            salvar=lambda armazem, caminho: None, carregar=abrir_armazem, extensao='',
+                            codigo=['calculo_distancias.py', 'armazem_distancias.py'], valido=_armazem_completo),
+        'localizacao': Etapa('localizacao', ['grafo', 'difusao', 'distancias'], _etapa_localizacao,
+                             _salvar_pickle, _carregar_pickle,
+                             codigo=['5_final.py', 'modelo_matricial.py']),
+    }
+
+
+class Pipeline:
+    """Resolve as etapas sob demanda, reaproveitando o cache e os objetos em memória."""
+
+    def __init__(self, parametros, pasta_cache=PASTA_CACHE, n_processos=None):
+        self.parametros = parametros
+        self.pasta_cache = pasta_cache
+        self.etapas = criar_etapas(parametros, n_processos)
+        self._chaves = {}
+        self._objetos = {}
+        self.relatorio = []
+        os.makedirs(pasta_cache, exist_ok=True)
+
+    def chave(self, nome):
+        """Hash dos parâmetros, dependências, arquivos externos e código da etapa."""
+        if nome not in self._chaves:
+            etapa = self.etapas[nome]
+            conteudo = {
+                'etapa': nome,
+                'parametros': self.parametros.get(nome, {}),
+                'dependencias': {dep: self.chave(dep) for dep in etapa.dependencias},
+                'arquivos': {f: _impressao_arquivo(f) for f in etapa.arquivos},
+                'codigo': {c: _hash_codigo(c) for c in modulos_da_etapa(etapa.codigo)},
+            }
+            texto = json.dumps(conteudo, sort_keys=True, default=str)
+            self._chaves[nome] = hashlib.sha256(texto.encode('utf-8')).hexdigest()
+        return self._chaves[nome]
+
+    def caminho(self, nome):
+        return os.path.join(self.pasta_cache, f"{nome}_{self.chave(nome)[:16]}{self.etapas[nome].extensao}")
+
+    def obter(self, nome):
+        """Devolve o objeto da etapa: da memória, do cache ou executando-a."""
+        if nome in self._objetos:
+            return self._objetos[nome]
+
+        etapa = self.etapas[nome]
+        caminho = self.caminho(nome)
+        start_time = time.time()
+        if etapa.salvar is not None and etapa.valido(caminho):
+            print(f"♻️  Etapa '{nome}': usando o cache '{caminho}'.")
+            with instrumentacao.etapa(nome) as medida:
+                objeto = etapa.carregar(caminho)
+            origem = 'cache'
+        else:
+            entradas = [self.obter(dep) for dep in etapa.dependencias]
+            start_time = time.time()
+            print(f"⚙️  Etapa '{nome}': executando...")
+            parametros = dict(self.parametros.get(nome, {}), _caminho=caminho)
+            with instrumentacao.etapa(nome) as medida:
+                objeto = etapa.executar(parametros, *entradas)
+                if objeto is None:
+                    raise RuntimeError(f"A etapa '{nome}' não produziu resultado.")
+                if etapa.salvar is not None:
+                    etapa.salvar(objeto, caminho)
+                    self._gravar_manifesto(nome)
+            origem = 'executada'
+        medida.update(origem=origem, chave=self.chave(nome))
+
+        tempo = time.time() - start_time
+        self.relatorio.append({'etapa': nome, 'origem': origem, 'tempo': tempo, 'chave': self.chave(nome)})
+        self._objetos[nome] = objeto
+        return objeto
+
+    def _gravar_manifesto(self, nome):
+        """Registro legível de como o artefato foi gerado (ao lado dele, em JSON)."""
+        etapa = self.etapas[nome]
+        manifesto = {
+            'etapa': nome,
+            'chave': self.chave(nome),
+            'parametros': self.parametros.get(nome, {}),
+            'dependencias': {dep: self.chave(dep) for dep in etapa.dependencias},
+            'criado_em': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        with open(self.caminho(nome) + '.manifesto.json', 'w', encoding='utf-8') as f:
+            json.dump(manifesto, f, indent=2, ensure_ascii=False, default=str)
+
+    def limpar_cache(self):
+        """Apaga os artefatos que não correspondem às chaves atuais."""
+        validos = {os.path.basename(self.caminho(nome)) for nome in self.etapas}
+        for arquivo in os.listdir(self.pasta_cache):
+            if not any(arquivo.startswith(v) for v in validos):
+                alvo = os.path.join(self.pasta_cache, arquivo)
+                if os.path.isdir(alvo):
+                    shutil.rmtree(alvo)
+                else:
+                    os.remove(alvo)
+
+
+# --- Execução Principal ---
+if __name__ == "__main__":
+    path_arquivos = 'Arquivos'
+
+    # --- PARÂMETROS (cada bloco entra só na chave da sua etapa) ---
+    PARAMETROS = {
+        'grafo': {
+            'nome_cidade': "São Carlos, São Paulo, Brazil",
+            # Com um GraphML já baixado, ele é usado em vez de baixar de novo
+            'arquivo': os.path.join(path_arquivos, 'sao_carlos_grafo_preciso.graphml'),
+        },
+        'populacao': {
+            'arquivo_setores': os.path.join(path_arquivos, 'SP_Setores_CD2022.shp'),
+            'arquivo_populacao': os.path.join(path_arquivos, 'Agregados_por_setores_basico_BR_20250417.csv'),
+            'codigo_municipio': '3548906',
+            # 'centroide', 'comprimento' ou 'voronoi' (ver 2_densidade.py)
+            'metodo_alocacao': 'comprimento',
+            # Opcional: um 'populacoes_nos.pkl' já calculado, usado no lugar dos dados do censo
+            'arquivo': None,
+        },
+        'difusao': {
+            'numero_de_iteracoes': 3,
+            'fator_de_retencao': 0.4,
+        },
+        'distancias': {
+            'triangular': True,
+        },
+        'localizacao': {
+            'n_hospitais': 9,
+            'populacao_minima': 200,
+            'modo': 'completo',
+        },
+    }
+    # Não muda o resultado, então não faz parte de nenhuma chave
+    NUMERO_DE_PROCESSOS = os.cpu_count()
+    # Apaga do cache os artefatos de parâmetros antigos ao final
+    LIMPAR_CACHE_ANTIGO = False
+    # Grava tempo, CPU, memória e estatísticas do solver de cada etapa em
+    # 'Arquivos/registros/' (JSON da execução + histórico em CSV)
+    REGISTRAR_EXECUCAO = True
+
+    pipeline = Pipeline(PARAMETROS, n_processos=NUMERO_DE_PROCESSOS)
+    registro = instrumentacao.RegistroExecucao('pipeline', PARAMETROS).iniciar()
+    start_time = time.time()
+    try:
+        final = pipeline.obter('localizacao')
+    except RuntimeError as e:
+        print(f"❌ Erro: {e}")
+        sys.exit(1)
+    finally:
+        registro.finalizar()
+        if REGISTRAR_EXECUCAO:
+            registro.salvar()
+
+    print("\n--- Resumo do pipeline ---")
+    for r in pipeline.relatorio:
+        print(f"{r['etapa']:<12} {r['origem']:<10} {r['tempo']:8.2f} s   {r['chave'][:16]}")
+    print(f"Total: {time.time() - start_time:.2f} segundos.")
+
+    if final['resultados']:
+        _script('5_final').exportar_resultados_csv(pipeline.obter('grafo'), final['resultados'],
+                                                  n_hospitais=PARAMETROS['localizacao']['n_hospitais'])
+    if LIMPAR_CACHE_ANTIGO:
+        pipeline.limpar_cache()
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+Exportação dos mapas de resultados para arquivos, sem abrir janelas.
+
+Os scripts 5_* desenham a malha viária inteira (ox.plot_graph) em cada
+figura e param em plt.show(). Aqui a malha é desenhada uma única vez numa
+imagem de fundo (raster) ou numa lista de segmentos (vetor), e cada cenário
+só acrescenta os nós e os hospitais por cima. As figuras são montadas com
+matplotlib.figure.Figure e o canvas Agg, sem pyplot, então funcionam em
+qualquer backend (e em servidores sem tela); vários cenários podem ser
+gravados em paralelo, cada processo recebendo o fundo uma única vez.
+
+Um cenário é um dicionário com:
+- 'nome': nome do arquivo de saída (sem extensão);
+- 'tipo': 'resultados' (nós coloridos pela população e hospitais como
+  estrelas) ou 'probabilidades' (candidatos coloridos pelo valor de x_j);
+- 'resultados': {nó: valor de x_j} e 'n_hospitais';
+- 'populacoes': {nó: população} (só no tipo 'resultados');
+- opcionais: 'nos' (nós desenhados; padrão: todos, ou os candidatos),
+  'titulo' e 'rotulo_cor' (legenda da barra de cores).
+"""
+import multiprocessing as mp
+import os
+import time
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+
+# Largura, em pixels, da imagem de fundo com a malha viária
+LARGURA_FUNDO_PX = 3000
+# Folga em volta da malha, como fração do tamanho dela
+MARGEM = 0.02
+
+
+def segmentos_ruas(G):
+    """Lista de vértices (k x 2) de cada aresta, pronta para uma LineCollection."""
+    if hasattr(G, 'geom_inicio'):
+        xy = np.column_stack([G.x, G.y])
+        origens, destinos = G.origens(), np.asarray(G.destinos)
+        inicio = np.asarray(G.geom_inicio)
+        geom_xy = np.asarray(G.geom_xy)
+        retas = np.stack([xy[origens], xy[destinos]], axis=1)
+        return [geom_xy[inicio[e]:inicio[e + 1]] if inicio[e + 1] > inicio[e] else retas[e]
+                for e in range(len(destinos))]
+
+    segmentos = []
+    for u, v, dados in G.edges(data=True):
+        if dados.get('geometry') is not None:
+            segmentos.append(np.asarray(dados['geometry'].coords))
+        else:
+            segmentos.append(np.array([(G.nodes[u]['x'], G.nodes[u]['y']), (G.nodes[v]['x'], G.nodes[v]['y'])]))
+    return segmentos
+
+
+class FundoRuas:
+    """Malha viária pré-processada: segmentos, limites e, se pedido, a imagem (raster)."""
+
+    def __init__(self, G, modo='raster', largura_px=LARGURA_FUNDO_PX, cor='gray', espessura=0.5):
+        self.modo = modo
+        self.cor = cor
+        self.espessura = espessura
+        self.segmentos = segmentos_ruas(G)
+
+        todos = np.concatenate(self.segmentos) if self.segmentos else np.zeros((1, 2))
+        x0, y0 = todos.min(axis=0)
+        x1, y1 = todos.max(axis=0)
+        folga = MARGEM * max(x1 - x0, y1 - y0, 1.0)
+        self.extensao = (x0 - folga, x1 + folga, y0 - folga, y1 + folga)
+
+        self.imagem = None
+        if modo == 'raster':
+            self.imagem = self._rasterizar(largura_px)
+            # Com o raster pronto, os segmentos não precisam ir para os processos
+            self.segmentos = None
+
+    def _rasterizar(self, largura_px):
+        x0, x1, y0, y1 = self.extensao
+        altura_px = max(1, int(round(largura_px * (y1 - y0) / (x1 - x0))))
+        dpi = 100
+        fig = Figure(figsize=(largura_px / dpi, altura_px / dpi), dpi=dpi)
+        canvas = FigureCanvasAgg(fig)
+        ax = fig.add_axes([0, 0, 1, 1])
+        ax.set_axis_off()
+        ax.add_collection(LineCollection(self.segmentos, colors=self.cor, linewidths=self.espessura))
+        ax.set_xlim(x0, x1)
+        ax.set_ylim(y0, y1)
+        canvas.draw()
+        return np.asarray(canvas.buffer_rgba()).copy()
+
+    def desenhar(self, ax):
+        x0, x1, y0, y1 = self.extensao
+        if self.imagem is not None:
+            ax.imshow(self.imagem, extent=self.extensao, origin='upper', interpolation='antialiased', zorder=0)
+        else:
+            ax.add_collection(LineCollection(self.segmentos, colors=self.cor, linewidths=self.espessura, zorder=0))
+        ax.set_xlim(x0, x1)
+        ax.set_ylim(y0, y1)
+        ax.set_aspect('equal')
+        ax.set_axis_off()
+
+
+def desenhar_cenario(fundo, coordenadas, cenario, arquivo_saida, dpi=150):
+    """
+    Desenha um cenário sobre o fundo e grava em 'arquivo_saida' (o formato
+    vem da extensão: .png, .pdf, .svg...). 'coordenadas' é {nó: (x, y)}.
+    """
+    resultados = cenario['resultados']
+    n_hospitais = cenario['n_hospitais']
+    locais_otimos = sorted(resultados, key=resultados.get, reverse=True)[:n_hospitais]
+
+    fig = Figure(figsize=(15, 15))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    fundo.desenhar(ax)
+
+    if cenario['tipo'] == 'resultados':
+        populacoes = cenario['populacoes']
+        nos = cenario.get('nos') or list(coordenadas)
+        xy = np.array([coordenadas[node] for node in nos])
+        pontos = ax.scatter(xy[:, 0], xy[:, 1], c=[populacoes.get(node, 0) for node in nos], cmap='viridis', s=15,
+                            zorder=2)
+        xy = np.array([coordenadas[node] for node in locais_otimos])
+        ax.scatter(xy[:, 0], xy[:, 1], c='red', marker='*', s=250, zorder=3, label='Hospitais')
+        ax.set_title(cenario.get('titulo', f'Locais Ótimos para {n_hospitais} Hospitais em São Carlos'), fontsize=16)
+        fig.colorbar(pontos, ax=ax, label=cenario.get('rotulo_cor', 'População Atribuída ao Nó'), shrink=0.7)
+        ax.legend()
+    else:
+        nos = cenario.get('nos') or list(resultados)
+        xy = np.array([coordenadas[node] for node in nos])
+        pontos = ax.scatter(xy[:, 0], xy[:, 1], c=[resultados[node] for node in nos], cmap='plasma', s=30, zorder=2)
+        xy = np.array([coordenadas[node] for node in locais_otimos])
+        ax.scatter(xy[:, 0], xy[:, 1], c=[resultados[node] for node in locais_otimos], cmap='plasma', s=30,
+                   vmin=pontos.norm.vmin, vmax=pontos.norm.vmax, edgecolors='black', linewidths=1.5, zorder=3)
+        ax.set_title(cenario.get('titulo', 'Mapa de Aptidão (Probabilidade) dos Locais Candidatos'), fontsize=16)
+        fig.colorbar(pontos, ax=ax, label=cenario.get('rotulo_cor', 'Probabilidade (Aptidão) do Local'), shrink=0.7)
+
+    fig.savefig(arquivo_saida, dpi=dpi, bbox_inches='tight')
+    return arquivo_saida
+
+
+# --- Exportação em paralelo ---
+# Fundo e coordenadas são enviados uma vez a cada processo pelo initializer
+_renderizacao = {}
+
+
+def _inicializar_renderizacao(fundo, coordenadas, dpi):
+    _renderizacao['fundo'] = fundo
+    _renderizacao['coordenadas'] = coordenadas
+    _renderizacao['dpi'] = dpi
+
+
+def _desenhar_tarefa(tarefa):
+    cenario, arquivo_saida = tarefa
+    return desenhar_cenario(_renderizacao['fundo'], _renderizacao['coordenadas'], cenario, arquivo_saida,
+                            _renderizacao['dpi'])
+
+
+def exportar_cenarios(G, cenarios, pasta_saida, formato='png', n_processos=1, dpi=150, fundo='raster'):
+    """
+    Grava cada cenário em '<pasta_saida>/<nome>.<formato>' sem abrir janelas.
+
+    fundo='raster' desenha a malha uma vez numa imagem (mais rápido);
+    fundo='vetor' mantém as ruas como linhas (melhor para PDF ampliado).
+    Retorna a lista de arquivos gravados.
+    """
+    print(f"\nExportando {len(cenarios)} figura(s) para '{pasta_saida}'...")
+    start_time = time.time()
+    os.makedirs(pasta_saida, exist_ok=True)
+
+    fundo = FundoRuas(G, modo=fundo)
+    coordenadas = {node: (dados['x'], dados['y']) for node, dados in G.nodes(data=True)}
+    tarefas = [(c, os.path.join(pasta_saida, f"{c['nome']}.{formato}")) for c in cenarios]
+
+    if n_processos is None or n_processos > 1:
+        with mp.Pool(n_processos, initializer=_inicializar_renderizacao, initargs=(fundo, coordenadas, dpi)) as pool:
+            arquivos = pool.map(_desenhar_tarefa, tarefas)
+    else:
+        _inicializar_renderizacao(fundo, coordenadas, dpi)
+        arquivos = [_desenhar_tarefa(t) for t in tarefas]
+
+    print(f"✅ {len(arquivos)} figura(s) gravada(s) em {time.time() - start_time:.2f} segundos.")
+    return arquivos
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Robustez de uma localização diante da incerteza da população.
+
+As contagens do censo e os parâmetros da difusão (3_difusao.py) são
+incertos. Em vez de uma única população, a localização escolhida (um ou
+mais conjuntos de hospitais fixos) é avaliada em milhares de cenários,
+gerados de duas formas:
+- cenarios_perturbados: a população de cada nó multiplicada por um erro
+  aleatório (lognormal de média 1) ou sorteada por Poisson;
+- cenarios_difusao: a difusão refeita com o número de iterações e o fator
+  de retenção sorteados (e, opcionalmente, a contagem de partida
+  perturbada).
+
+A distância de cada nó ao hospital mais próximo de cada conjunto não
+depende do cenário: é calculada uma vez (Dijkstra com várias origens) e
+vira uma matriz D (conjuntos x nós). As populações dos cenários formam
+uma matriz P (cenários x nós), processada em blocos para limitar a
+memória; em cada bloco, o objetivo de todos os cenários e conjuntos é um
+único produto P @ D.T, e a cobertura, P @ (D <= raio).T. As distâncias
+do pior atendido e do quantil (ex.: a distância que 10% da população
+ultrapassa) saem da soma acumulada de P com os nós em ordem de D.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from avaliacao import avaliar_localizacao
+from calculo_distancias import grafo_para_csr
+from motor_difusao import construir_operador_difusao, difundir
+
+# Valores (cenários x nós) de cada bloco; limita a memória temporária a
+# ~2^22 floats por matriz.
+VALORES_POR_BLOCO = 2 ** 22
+METRICAS = ['objetivo', 'distancia_media', 'distancia_maxima', 'distancia_quantil', 'cobertura',
+            'populacao_sem_acesso']
+
+
+def _tamanho_bloco(n, tamanho_bloco=None):
+    return int(tamanho_bloco) if tamanho_bloco else max(1, VALORES_POR_BLOCO // max(n, 1))
+
+
+def vetor_populacao(populacoes, nos):
+    """Vetor com a população ({nó: pop}) de cada nó de 'nos', 0 nos ausentes."""
+    return np.array([populacoes.get(node, 0) for node in nos], dtype=np.float64)
+
+
+def _perturbar(rng, base, n_linhas, desvio_relativo, modelo):
+    if modelo == 'poisson':
+        return rng.poisson(base, size=(n_linhas, len(base))).astype(np.float64)
+    if modelo != 'lognormal':
+        raise ValueError(f"Modelo de perturbação desconhecido: '{modelo}'.")
+    # Fator lognormal de média 1 e desvio padrão 'desvio_relativo'
+    sigma2 = np.log1p(desvio_relativo ** 2)
+    fatores = rng.lognormal(-sigma2 / 2.0, np.sqrt(sigma2), size=(n_linhas, len(base)))
+    return fatores * base
+
+
+def cenarios_perturbados(populacao, n_cenarios, desvio_relativo=0.1, modelo='lognormal', conservar_total=False,
+                         semente=None, tamanho_bloco=None):
+    """
+    Gera, em blocos, populações perturbadas a partir do vetor 'populacao':
+    - modelo='lognormal': cada nó multiplicado por um fator de média 1 e
+      desvio 'desvio_relativo' (erro proporcional à contagem);
+    - modelo='poisson': cada nó sorteado com média na sua população
+      ('desvio_relativo' não é usado).
+    Com conservar_total=True, cada cenário é reescalado para a população
+    total original (só a distribuição espacial muda).
+
+    Cada bloco é (P, parametros): P (cenários x nós) e um DataFrame com o
+    número de cada cenário.
+    """
+    base = np.asarray(populacao, dtype=np.float64)
+    rng = np.random.default_rng(semente)
+    total = base.sum()
+    bloco = _tamanho_bloco(len(base), tamanho_bloco)
+    for inicio in range(0, n_cenarios, bloco):
+        n_linhas = min(bloco, n_cenarios - inicio)
+        P = _perturbar(rng, base, n_linhas, desvio_relativo, modelo)
+        if conservar_total:
+            P *= total / np.maximum(P.sum(axis=1, keepdims=True), 1e-12)
+        yield P, pd.DataFrame({'cenario': np.arange(inicio, inicio + n_linhas)})
+
+
+def cenarios_difusao(G, populacoes, nos, n_cenarios, iteracoes=(2, 5), retencao=(0.3, 0.6), desvio_relativo=0.0,
+                     semente=None, tamanho_bloco=None):
+    """
+    Gera, em blocos, populações obtidas pela difusão de 'populacoes'
+    ({nó: pop}, a contagem do censo por nó) com parâmetros sorteados por
+    cenário: o número de iterações, inteiro uniforme em 'iteracoes'
+    (mínimo, máximo), e o fator de retenção, uniforme em 'retencao'. Com
+    desvio_relativo > 0, a contagem de partida de cada cenário também é
+    perturbada (lognormal, como em cenarios_perturbados).
+
+    O operador de vizinhança é montado uma vez; em cada bloco, os cenários
+    com o mesmo número de iterações são difundidos juntos, uma coluna por
+    cenário. Cada bloco é (P, parametros): P (cenários x nós, na ordem de
+    'nos') e um DataFrame com o cenário e os parâmetros sorteados.
+    """
+    A, graus, nos_operador = construir_operador_difusao(G)
+    indice = {node: k for k, node in enumerate(nos_operador)}
+    posicao = np.array([indice[node] for node in nos], dtype=np.int64)
+    base = vetor_populacao(populacoes, nos_operador)
+
+    rng = np.random.default_rng(semente)
+    bloco = _tamanho_bloco(max(len(nos), len(nos_operador)), tamanho_bloco)
+    for inicio in range(0, n_cenarios, bloco):
+        n_linhas = min(bloco, n_cenarios - inicio)
+        n_iteracoes = rng.integers(iteracoes[0], iteracoes[1] + 1, size=n_linhas)
+        fatores = rng.uniform(retencao[0], retencao[1], size=n_linhas)
+        partida = _perturbar(rng, base, n_linhas, desvio_relativo, 'lognormal').T if desvio_relativo > 0 else None
+
+        P = np.empty((n_linhas, len(nos)), dtype=np.float64)
+        for k in np.unique(n_iteracoes):
+            colunas = np.flatnonzero(n_iteracoes == k)
+            X = difundir(A, graus, base if partida is None else partida[:, colunas], int(k), fatores[colunas])
+            P[colunas] = X[posicao].T
+        yield P, pd.DataFrame({'cenario': np.arange(inicio, inicio + n_linhas), 'iteracoes': n_iteracoes,
+                               'fator_de_retencao': fatores})
+
+
+def distancias_aos_hospitais(G, conjuntos, nos, peso='length'):
+    """
+    Matriz (conjuntos x nós) com a distância de cada nó de 'nos' ao
+    hospital mais próximo de cada conjunto, pela malha viária.
+    """
+    csr = grafo_para_csr(G, peso=peso)
+    return np.vstack([avaliar_localizacao(G, hospitais, csr=csr, msg=False).posicoes_e_distancias(nos)[1]
+                      for hospitais in conjuntos])
+
+
+def avaliar_cenarios(distancias, blocos, nomes=None, raio=None, quantil=0.9):
+    """
+    Avalia os conjuntos de hospitais (linhas de 'distancias', de
+    distancias_aos_hospitais) em cada cenário dos 'blocos' (de
+    cenarios_perturbados ou cenarios_difusao).
+
+    Por cenário e conjunto:
+    - objetivo: população x distância ao hospital mais próximo;
+    - distancia_media: objetivo / população que alcança algum hospital;
+    - distancia_maxima: distância do nó com população pior atendido;
+    - distancia_quantil: distância até a qual vive a fração 'quantil' da
+      população (o restante é o grupo pior atendido);
+    - cobertura: fração da população a até 'raio' metros (se dado);
+    - populacao_sem_acesso: população sem caminho até nenhum hospital.
+
+    Retorna um DataFrame com uma linha por (cenário, conjunto), junto com
+    os parâmetros de cada cenário.
+    """
+    D = np.atleast_2d(np.asarray(distancias, dtype=np.float64))
+    n_conjuntos, n = D.shape
+    nomes = list(nomes) if nomes is not None else list(range(n_conjuntos))
+    finitas = np.isfinite(D)
+    D_finita = np.where(finitas, D, 0.0)
+    sem_caminho = (~finitas).astype(np.float64)
+    cobre = (D <= raio).astype(np.float64) if raio is not None else None
+    # Nós em ordem crescente de distância (os sem caminho ficam no fim)
+    ordens = [np.argsort(D[c], kind='stable') for c in range(n_conjuntos)]
+    n_finitas = finitas.sum(axis=1)
+
+    start_time = time.time()
+    tabelas, n_cenarios = [], 0
+    for P, parametros in blocos:
+        total = P.sum(axis=1)
+        objetivo = P @ D_finita.T
+        sem_acesso = P @ sem_caminho.T
+        alcancavel = total[:, None] - sem_acesso
+        with np.errstate(invalid='ignore', divide='ignore'):
+            distancia_media = objetivo / alcancavel
+            cobertura = (P @ cobre.T) / total[:, None] if cobre is not None else np.full_like(objetivo, np.nan)
+
+        distancia_maxima = np.full_like(objetivo, np.nan)
+        distancia_quantil = np.full_like(objetivo, np.nan)
+        for c in range(n_conjuntos):
+            m = n_finitas[c]
+            if m == 0:
+                continue
+            ordem = ordens[c][:m]
+            d_ordenada = D[c, ordem]
+            P_ordenada = P[:, ordem]
+            # Último nó (em ordem de distância) com população
+            com_populacao = P_ordenada > 0
+            ultimo = m - 1 - np.argmax(com_populacao[:, ::-1], axis=1)
+            existe = com_populacao.any(axis=1)
+            distancia_maxima[existe, c] = d_ordenada[ultimo[existe]]
+            # Primeiro nó em que a população acumulada alcança o quantil
+            acumulada = np.cumsum(P_ordenada, axis=1)
+            k = (acumulada < quantil * acumulada[:, -1:]).sum(axis=1)
+            distancia_quantil[existe, c] = d_ordenada[np.minimum(k, m - 1)[existe]]
+
+        b = len(P)
+        tabela = pd.DataFrame({
+            'cenario': np.repeat(parametros['cenario'].to_numpy(), n_conjuntos),
+            'conjunto': np.tile(nomes, b),
+            'populacao_total': np.repeat(total, n_conjuntos),
+            'objetivo': objetivo.ravel(), 'distancia_media': distancia_media.ravel(),
+            'distancia_maxima': distancia_maxima.ravel(), 'distancia_quantil': distancia_quantil.ravel(),
+            'cobertura': cobertura.ravel(), 'populacao_sem_acesso': sem_acesso.ravel(),
+        })
+        tabelas.append(tabela.merge(parametros, on='cenario', how='left'))
+        n_cenarios += b
+
+    print(f"{n_cenarios} cenários x {n_conjuntos} conjunto(s) de hospitais avaliados em "
+          f"{time.time() - start_time:.2f} segundos.")
+    return pd.concat(tabelas, ignore_index=True) if tabelas else pd.DataFrame(columns=['cenario', 'conjunto', *METRICAS])
+
+
+def resumir_robustez(tabela):
+    """
+    Resume a tabela de avaliar_cenarios por conjunto: média, desvio e
+    percentis 5 e 95 de cada métrica. Com mais de um conjunto, inclui a
+    fração dos cenários em que cada um tem o menor objetivo ('vitorias') e
+    o arrependimento (quanto o objetivo passa do melhor conjunto do
+    cenário, em %).
+    """
+    tabela = tabela.copy()
+    melhor = tabela.groupby('cenario')['objetivo'].transform('min')
+    tabela['arrependimento_pct'] = 100.0 * (tabela['objetivo'] - melhor) / melhor
+    tabela['vitoria'] = tabela['objetivo'] <= melhor
+
+    metricas = [m for m in METRICAS if tabela[m].notna().any()]
+    grupos = tabela.groupby('conjunto', sort=False)
+    resumo = pd.concat({
+        'media': grupos[metricas].mean(), 'desvio': grupos[metricas].std(),
+        'p5': grupos[metricas].quantile(0.05), 'p95': grupos[metricas].quantile(0.95),
+    }, axis=1).swaplevel(axis=1).sort_index(axis=1, level=0, sort_remaining=False)
+    resumo.columns = [f"{metrica}_{estatistica}" for metrica, estatistica in resumo.columns]
+    if tabela['conjunto'].nunique() > 1:
+        resumo['vitorias'] = grupos['vitoria'].mean()
+        resumo['arrependimento_medio_pct'] = grupos['arrependimento_pct'].mean()
+        resumo['arrependimento_max_pct'] = grupos['arrependimento_pct'].max()
+    return resumo
+
+
+def imprimir_robustez(resumo):
+    print("\n--- Robustez nos cenários de população ---")
+    for conjunto, linha in resumo.iterrows():
+        print(f"Conjunto {conjunto}:")
+        print(f"  distância média    {linha['distancia_media_media']:10,.1f} m  "
+              f"(p5 {linha['distancia_media_p5']:,.1f} | p95 {linha['distancia_media_p95']:,.1f})")
+        print(f"  quantil (piores)   {linha['distancia_quantil_media']:10,.1f} m  "
+              f"(p95 {linha['distancia_quantil_p95']:,.1f})")
+        print(f"  pior atendido      {linha['distancia_maxima_media']:10,.1f} m  "
+              f"(p95 {linha['distancia_maxima_p95']:,.1f})")
+        if 'cobertura_media' in linha:
+            print(f"  cobertura          {100.0 * linha['cobertura_media']:10.2f} %  "
+                  f"(p5 {100.0 * linha['cobertura_p5']:.2f}%)")
+        if 'vitorias' in linha:
+            print(f"  melhor em {100.0 * linha['vitorias']:.1f}% dos cenários; arrependimento médio "
+                  f"{linha['arrependimento_medio_pct']:.3f}% (máx. {linha['arrependimento_max_pct']:.3f}%)")
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""Repartição da população dos setores entre os nós do grafo."""
+import numpy as np
+import pytest
+import shapely
+
+from alocacao_populacao import alocar_populacao, celulas_voronoi_ordenadas
+from benchmark import grafo_sintetico
+
+
+def test_voronoi_sem_ordered_casa_as_celulas(monkeypatch):
+    pontos = np.random.default_rng(0).random((300, 2)) * 1000
+    contorno = shapely.box(-100, -100, 1100, 1100)
+    esperado = celulas_voronoi_ordenadas(pontos, contorno)
+
+    # Simula o shapely 2.0, que não aceita 'ordered'
+    original = shapely.voronoi_polygons
+    def sem_ordered(geometria, extend_to=None, **kwargs):
+        if 'ordered' in kwargs:
+            raise TypeError("voronoi_polygons() got an unexpected keyword argument 'ordered'")
+        return original(geometria, extend_to=extend_to, **kwargs)
+    monkeypatch.setattr(shapely, 'voronoi_polygons', sem_ordered)
+
+    obtido = celulas_voronoi_ordenadas(pontos, contorno)
+    assert shapely.equals(obtido, esperado).all()
+    assert shapely.contains_xy(obtido, pontos[:, 0], pontos[:, 1]).all()
+
+
+@pytest.mark.parametrize('metodo', ['comprimento', 'voronoi'])
+def test_populacao_de_cada_setor_conservada(metodo):
+    G = grafo_sintetico(400, tipo='perturbado', semente=4)
+    # Setores em faixas verticais de 450 m; a última não tem nenhum nó
+    setores = np.array([shapely.box(x, -100, x + 450, 2000) for x in range(-100, 2600, 450)])
+    populacao_setores = np.random.default_rng(4).integers(0, 5000, len(setores))
+
+    populacoes = alocar_populacao(G, setores, populacao_setores, metodo=metodo)
+    assert list(populacoes) == list(G.nodes())
+    assert sum(populacoes.values()) == populacao_setores.sum()
+    assert all(isinstance(v, int) and v >= 0 for v in populacoes.values())
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Atualização incremental da matriz de distâncias contra o recálculo completo."""
+import networkx as nx
+import numpy as np
+import pytest
+from scipy.sparse.csgraph import dijkstra
+
+from armazem_distancias import abrir_armazem
+from atualizacao_distancias import atualizar_distancias
+from benchmark import grafo_sintetico
+from calculo_distancias import calcular_todos_pares_paralelo, grafo_para_csr
+
+
+def _armazem(G, pasta, triangular):
+    caminho_base = str(pasta / 'distancias')
+    calcular_todos_pares_paralelo(G, caminho_base, n_processos=1, triangular=triangular)
+    return abrir_armazem(caminho_base, modo='r+')
+
+
+@pytest.mark.parametrize('triangular', [False, True])
+def test_atualizacao_igual_ao_recalculo(tmp_path, triangular):
+    G = grafo_sintetico(64, tipo='grade')
+    armazem = _armazem(G, tmp_path, triangular)
+
+    alteracoes = [('remover', 9, 10), ('inserir', 0, 63, 50.0), ('alterar', 18, 26, 400.0),
+                  ('alterar', 18, 26, 20.0), ('remover', 0, 63)]
+    assert atualizar_distancias(G, armazem, alteracoes) is not None
+
+    A, nos = grafo_para_csr(G)
+    assert list(armazem.linhas) == nos
+    np.testing.assert_allclose(armazem.submatriz(nos, nos), dijkstra(A, directed=True).astype(np.float32))
+
+
+@pytest.mark.parametrize('triangular', [False, True])
+def test_linhas_alteradas_contadas(tmp_path, triangular):
+    # Caminho 0-1-2-3-4: o atalho 0-4 muda as linhas 0, 1, 3 e 4
+    G = nx.MultiDiGraph()
+    G.add_edges_from((k, k + 1, {'length': 1.0}) for k in range(4))
+    armazem = _armazem(G, tmp_path, triangular)
+    nos = list(G.nodes())
+    antes = armazem.submatriz(nos, nos)
+
+    relatorio = atualizar_distancias(G, armazem, [('inserir', 0, 4, 1.5)])
+    mudaram = np.any(armazem.submatriz(nos, nos) != antes, axis=1).sum()
+    assert mudaram == 4
+    assert relatorio[0]['linhas_alteradas'] == mudaram
+
+    # Remover o atalho desfaz as mesmas 4 linhas
+    relatorio = atualizar_distancias(G, armazem, [('remover', 0, 4)])
+    np.testing.assert_array_equal(armazem.submatriz(nos, nos), antes)
+    assert relatorio[0]['linhas_alteradas'] == 4
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""Heurística gulosa + trocas contra a relaxação linear."""
+import numpy as np
+import pytest
+
+from heuristica_p_mediana import construcao_gulosa, resolver_p_mediana_heuristica, _preparar_distancias
+from modelo_matricial import resolver_p_mediana
+
+
+@pytest.mark.parametrize('n_hospitais', [2, 4, 7])
+def test_nao_fica_abaixo_da_relaxacao(instancia_p_mediana, n_hospitais):
+    pesos, D = instancia_p_mediana(150, 20)
+    _, limite_inferior, _ = resolver_p_mediana(pesos, D, n_hospitais, msg=False)
+    x, objetivo, _ = resolver_p_mediana_heuristica(pesos, D, n_hospitais)
+    assert x.sum() == n_hospitais
+    assert objetivo >= limite_inferior * (1 - 1e-9)
+    assert pesos @ D[:, x > 0.5].min(axis=1) == pytest.approx(objetivo, rel=1e-9)
+
+
+def test_trocas_nao_pioram_a_construcao_gulosa(instancia_p_mediana):
+    pesos, D = instancia_p_mediana(150, 20, semente=1)
+    Dt = np.ascontiguousarray(_preparar_distancias(D).T)
+    abertas = construcao_gulosa(pesos, Dt, 5)
+    _, objetivo, _ = resolver_p_mediana_heuristica(pesos, D, 5)
+    assert objetivo <= pesos @ D[:, abertas].min(axis=1) * (1 + 1e-12)
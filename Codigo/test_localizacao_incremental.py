@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Localização incremental com as unidades existentes fixas."""
+import itertools
+
+import numpy as np
+import pytest
+
+import modelo_matricial
+from localizacao_incremental import resolver_localizacao_incremental
+
+
+def _existentes(D):
+    """Distância de cada demanda às duas primeiras colunas, tratadas como unidades existentes."""
+    return D[:, :2].min(axis=1), D[:, 2:]
+
+
+def test_inteiro_igual_a_forca_bruta(instancia_p_mediana):
+    pesos, D = instancia_p_mediana(60, 10, semente=2)
+    d_existentes, candidatos = _existentes(D)
+    n_novos = 2
+    melhor = min(pesos @ np.minimum(d_existentes, candidatos[:, list(novos)].min(axis=1))
+                 for novos in itertools.combinations(range(candidatos.shape[1]), n_novos))
+
+    x, objetivo, status = resolver_localizacao_incremental(pesos, candidatos, d_existentes, n_novos,
+                                                           inteiro=True, msg=False)
+    assert status == 'Optimal'
+    assert x.sum() == n_novos
+    assert objetivo == pytest.approx(melhor, rel=1e-9)
+
+
+def test_limite_de_tempo_chega_ao_solver(instancia_p_mediana, monkeypatch):
+    pesos, D = instancia_p_mediana(60, 10, semente=3)
+    d_existentes, candidatos = _existentes(D)
+    opcoes = []
+    milp = modelo_matricial.milp
+    def milp_registrando(*args, **kwargs):
+        opcoes.append(kwargs['options'])
+        return milp(*args, **kwargs)
+    monkeypatch.setattr(modelo_matricial, 'milp', milp_registrando)
+
+    resolver_localizacao_incremental(pesos, candidatos, d_existentes, 2, inteiro=True, msg=False, limite_tempo=30)
+    assert 0 < opcoes[-1]['time_limit'] <= 30
+    # Sem inteiro=True (relaxação linear) o limite não se aplica
+    resolver_localizacao_incremental(pesos, candidatos, d_existentes, 2, msg=False, limite_tempo=30)
+    assert 'time_limit' not in opcoes[-1]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""Modo inteiro exato (incumbente heurística + lagrangiano + branch-and-bound)."""
+import itertools
+
+import pytest
+
+from modelo_matricial import resolver_p_mediana_inteiro
+
+pytest.importorskip('highspy')
+
+
+@pytest.mark.parametrize('semente', range(5))
+def test_igual_a_forca_bruta(instancia_p_mediana, semente):
+    pesos, D = instancia_p_mediana(40, 8, semente=semente)
+    n_hospitais = 3
+    melhor = min(pesos @ D[:, list(abertas)].min(axis=1)
+                 for abertas in itertools.combinations(range(D.shape[1]), n_hospitais))
+
+    x, objetivo, status, limites = resolver_p_mediana_inteiro(pesos, D, n_hospitais)
+    assert status == 'Optimal'
+    assert x.sum() == n_hospitais
+    assert objetivo == pytest.approx(melhor, rel=1e-9)
+    assert pesos @ D[:, x > 0.5].min(axis=1) == pytest.approx(objetivo, rel=1e-9)
+    # Os limites nunca se cruzam
+    assert all(dual <= primal * (1 + 1e-9) for _, primal, dual, _ in limites)
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""Modelo matricial da p-mediana contra a formulação original em PuLP."""
+import numpy as np
+import pytest
+
+from modelo_matricial import construir_modelo_p_mediana, resolver_p_mediana
+
+
+def _resolver_com_pulp(pesos, D, n_hospitais):
+    """A formulação do '5_final.py' original, termo a termo, com o CBC."""
+    pulp = pytest.importorskip('pulp')
+    n, m = D.shape
+    prob = pulp.LpProblem("Localizacao_Hospitais", pulp.LpMinimize)
+    x = pulp.LpVariable.dicts("Hospital", range(m), 0, 1, pulp.LpContinuous)
+    y = pulp.LpVariable.dicts("Atende", (range(n), range(m)), 0, 1, pulp.LpContinuous)
+    prob += pulp.lpSum([pesos[i] * D[i, j] * y[i][j] for i in range(n) for j in range(m)])
+    prob += pulp.lpSum([x[j] for j in range(m)]) == n_hospitais
+    for i in range(n):
+        prob += pulp.lpSum([y[i][j] for j in range(m)]) == 1
+        for j in range(m):
+            prob += y[i][j] <= x[j]
+    prob.solve(pulp.PULP_CBC_CMD(msg=False))
+    return pulp.LpStatus[prob.status], pulp.value(prob.objective)
+
+
+@pytest.mark.parametrize('n_hospitais', [1, 3, 5])
+def test_objetivo_igual_ao_do_pulp(instancia_p_mediana, n_hospitais):
+    pesos, D = instancia_p_mediana(60, 12, semente=n_hospitais)
+    status_pulp, objetivo_pulp = _resolver_com_pulp(pesos, D, n_hospitais)
+
+    x, objetivo, status = resolver_p_mediana(pesos, D, n_hospitais, msg=False)
+    assert status == status_pulp == 'Optimal'
+    assert objetivo == pytest.approx(objetivo_pulp, rel=1e-6)
+    assert x.sum() == pytest.approx(n_hospitais)
+
+
+def test_modelo_tem_o_tamanho_do_original(instancia_p_mediana):
+    pesos, D = instancia_p_mediana(60, 12)
+    # Só as demandas com população entram (todas alcançam todos os candidatos)
+    n, m = int((pesos > 0).sum()), D.shape[1]
+    modelo = construir_modelo_p_mediana(pesos, D, 3)
+    assert modelo.n_variaveis == m + n * m
+    assert modelo.n_restricoes == 1 + n + n * m
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Modo preguiçoso (restrições y_ij <= x_j sob demanda) contra o modelo completo."""
+import numpy as np
+import pytest
+
+from modelo_matricial import resolver_p_mediana, resolver_p_mediana_preguicoso
+
+pytest.importorskip('highspy')
+
+
+@pytest.mark.parametrize('n_hospitais', [1, 4, 9])
+def test_mesmo_objetivo_do_completo(instancia_p_mediana, n_hospitais):
+    pesos, D = instancia_p_mediana(150, 20)
+    _, objetivo_completo, status_completo = resolver_p_mediana(pesos, D, n_hospitais, msg=False)
+    _, objetivo, status, rodadas = resolver_p_mediana_preguicoso(pesos, D, n_hospitais)
+    assert status == status_completo == 'Optimal'
+    assert objetivo == pytest.approx(objetivo_completo, rel=1e-7)
+    assert rodadas[-1]['violadas'] == 0
+
+
+def test_demanda_sem_populacao_e_sem_caminho():
+    # A última demanda não tem população nem caminho até nenhum candidato:
+    # o modelo completo é inviável, e o preguiçoso também tem de ser
+    D = np.random.default_rng(0).random((30, 6)) * 1000
+    pesos = np.random.default_rng(1).integers(1, 50, 30).astype(np.float64)
+    D[-1], pesos[-1] = np.inf, 0.0
+    x, _, status_completo = resolver_p_mediana(pesos, D, 2, msg=False)
+    assert x is None and status_completo == 'Infeasible'
+    x, _, status, _ = resolver_p_mediana_preguicoso(pesos, D, 2)
+    assert x is None and status == status_completo
+
+
+def test_demanda_sem_populacao_alcancando_so_parte():
+    # Sem população, mas só alcança o candidato 0: obriga a abri-lo
+    D = np.random.default_rng(2).random((30, 6)) * 1000
+    pesos = np.random.default_rng(3).integers(1, 50, 30).astype(np.float64)
+    D[-1, 1:], pesos[-1] = np.inf, 0.0
+    x_completo, objetivo_completo, _ = resolver_p_mediana(pesos, D, 2, msg=False)
+    x, objetivo, status, _ = resolver_p_mediana_preguicoso(pesos, D, 2)
+    assert status == 'Optimal'
+    assert objetivo == pytest.approx(objetivo_completo, rel=1e-7)
+    assert x[0] == pytest.approx(1.0) and x_completo[0] == pytest.approx(1.0)
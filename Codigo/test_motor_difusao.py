@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Motor de difusão esparso contra o laço original do '3_difusao.py'."""
+import numpy as np
+
+from benchmark import grafo_sintetico, populacoes_sinteticas
+from motor_difusao import construir_operador_difusao, difundir
+
+
+def _difundir_com_dicionarios(G, populacoes, numero_de_iteracoes, fator):
+    """O laço original do '3_difusao.py', sobre dicionários."""
+    for _ in range(numero_de_iteracoes):
+        novas = {node: 0.0 for node in G.nodes()}
+        for node, pop in populacoes.items():
+            if pop == 0:
+                continue
+            novas[node] += pop * fator
+            vizinhos = list(G.neighbors(node))
+            if vizinhos:
+                parte = pop * (1.0 - fator) / len(vizinhos)
+                for vizinho in vizinhos:
+                    novas[vizinho] += parte
+        populacoes = novas
+    return populacoes
+
+
+def test_difusao_igual_ao_laco_original():
+    G = grafo_sintetico(200, tipo='perturbado', semente=1)
+    A, graus, nos = construir_operador_difusao(G)
+    populacoes = populacoes_sinteticas(nos, semente=1)
+
+    esperado = _difundir_com_dicionarios(G, populacoes, 3, 0.4)
+    obtido = difundir(A, graus, [populacoes[node] for node in nos], 3, 0.4)
+    np.testing.assert_array_equal(obtido, [esperado[node] for node in nos])
+
+
+def test_varios_fatores_igual_a_um_por_vez():
+    G = grafo_sintetico(200, tipo='perturbado', semente=2)
+    A, graus, nos = construir_operador_difusao(G)
+    populacoes = populacoes_sinteticas(nos, semente=2)
+    vetor = [populacoes[node] for node in nos]
+
+    fatores = [0.3, 0.4, 0.6]
+    juntos = difundir(A, graus, vetor, 4, fatores)
+    for k, fator in enumerate(fatores):
+        np.testing.assert_array_equal(juntos[:, k], difundir(A, graus, vetor, 4, fator))
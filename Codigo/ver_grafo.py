@@ -2,6 +2,8 @@ import osmnx as ox
 import matplotlib.pyplot as plt
 from os import path
 
+from grafo_compacto import carregar_grafo
+
 path_arquivos = 'Arquivos'
 
 ARQUIVO_GRAFO = path.join(path_arquivos,'sao_carlos_grafo_preciso.graphml')
@@ -25,7 +27,7 @@ def visualizar_grafo(G):
 # --- Execução Principal ---
 if __name__ == "__main__":
 
-    G = ox.load_graphml(ARQUIVO_GRAFO)
+    G = carregar_grafo(ARQUIVO_GRAFO).networkx()
 
     # A visualização é opcional, mas útil para confirmar que tudo correu bem
     visualizar_grafo(G)
\ No newline at end of file
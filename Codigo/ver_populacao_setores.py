@@ -6,11 +6,12 @@ diretamente nos seus setores censitários.
 Ele gera um mapa onde cada polígono (setor) é colorido de acordo
 com a sua população total, criando um mapa coroplético da cidade.
 """
-import geopandas as gpd
 import pandas as pd
 import matplotlib.pyplot as plt
 import os
 
+from dados_censo import carregar_populacao_setores, carregar_setores
+
 
 path_arquivos = 'Arquivos'
 def gerar_mapa_coropletico_sao_carlos():
@@ -33,10 +34,10 @@ def gerar_mapa_coropletico_sao_carlos():
     # --- 2. CARREGAR E PREPARAR OS DADOS ---
     try:
         print(f"A carregar o shapefile dos setores de '{ARQUIVO_SHAPEFILE_SETORES}'...")
-        gdf_setores = gpd.read_file(ARQUIVO_SHAPEFILE_SETORES)
+        gdf_setores = carregar_setores(ARQUIVO_SHAPEFILE_SETORES, CODIGO_MUNICIPIO_SAO_CARLOS)
         
         print(f"A carregar os dados de população de '{ARQUIVO_CSV_POPULACAO}'...")
-        df_pop = pd.read_csv(ARQUIVO_CSV_POPULACAO, sep=';', encoding='latin-1', dtype=str)
+        df_pop = carregar_populacao_setores(ARQUIVO_CSV_POPULACAO, CODIGO_MUNICIPIO_SAO_CARLOS)
     except Exception as e:
         print(f"❌ Erro ao carregar os ficheiros: {e}")
         return
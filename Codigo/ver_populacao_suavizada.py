@@ -13,6 +13,8 @@ import matplotlib.pyplot as plt
 import networkx as nx
 import os
 
+from grafo_compacto import carregar_grafo
+
 path_arquivos = 'Arquivos'
 
 def visualizar_mapas_comparativos():
@@ -34,7 +36,7 @@ def visualizar_mapas_comparativos():
         print("❌ Erro: Arquivos de entrada não encontrados.")
         return
 
-    G = ox.load_graphml(ARQUIVO_GRAFO)
+    G = carregar_grafo(ARQUIVO_GRAFO).networkx()
     with open(ARQUIVO_POPULACAO, 'rb') as f:
         populacoes = pickle.load(f)
 